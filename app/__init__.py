@@ -0,0 +1,65 @@
+"""User manager application factory.
+
+``create_app`` only builds the app: the database engine connects on first
+use and the schema is managed with ``flask db init`` / ``flask db upgrade``,
+so creating an app (in every gunicorn worker, test or CLI call) never
+touches the database.
+"""
+from dotenv import load_dotenv
+from flask import Flask
+
+from app.api import api
+from app.assets import install_static_fingerprints
+from app.cache import create_cache
+from app.cli import db_cli, users_cli, worker_command
+from app.compression import install_compression
+from app.config import load_config
+from app.database import install_statement_timeout
+from app.events import install_change_hub
+from app.group_commit import install_group_commit
+from app.metrics import metrics
+from app.models import db
+from app.profiler import install_profiler
+from app.routing import install_replica_router
+from app.views import users
+
+
+def create_app(config=None):
+    """Create the Flask app.
+
+    Settings come from the environment (see :mod:`app.config`); ``config``
+    is an optional mapping applied on top, mainly for tests.
+    """
+    # Load environment variables
+    load_dotenv()
+
+    app = Flask(__name__)
+    app.config.update(load_config())
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)
+    if app.config["DB_PGBOUNCER"]:
+        with app.app_context():
+            install_statement_timeout(db.engine, app.config["DB_STATEMENT_TIMEOUT_MS"])
+    if app.config["SQL_PROFILER"]:
+        install_profiler(app)
+    if app.config["DB_REPLICA_URLS"]:
+        install_replica_router(app)
+
+    if app.config["USERS_GROUP_COMMIT_MS"] > 0:
+        install_group_commit(app)
+
+    install_static_fingerprints(app)
+    if app.config["COMPRESS_RESPONSES"]:
+        install_compression(app)
+
+    app.register_blueprint(users)
+    app.register_blueprint(api)
+    app.register_blueprint(metrics)
+    install_change_hub(app)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(db_cli)
+    app.cli.add_command(worker_command)
+    app.extensions["page_cache"] = create_cache(app.config)
+    return app
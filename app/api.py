@@ -0,0 +1,494 @@
+"""JSON API for users, including batch operations for sync jobs."""
+from flask import Blueprint, abort, current_app, jsonify, request, url_for
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from werkzeug.exceptions import HTTPException
+
+from app.archive import restore_user
+from app.bulk import delete_users, rename_role, set_role, validate_filters, validate_role
+from app.changes import FeedReset, changes_since
+from app.conditional import add_validators, make_etag, not_modified
+from app.jobs import cancel, enqueue, enqueue_if_large, job_to_dict
+from app.models import (
+    CONFLICT_ERROR,
+    DATA_TOO_LONG_ERROR,
+    DUPLICATE_EMAIL_ERROR,
+    USER_SORT_KEYS,
+    ArchivedUser,
+    Job,
+    User,
+    bump_table_version,
+    db,
+    get_table_version,
+    select_user_rows,
+    validate_user_fields,
+)
+from app.pagination import keyset_page
+from app.search import filter_users, parse_filters
+from app.summary import user_summary
+from app.transfer import FORMATS, INVALID_ENCODING_ERROR, format_for
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+NOT_FOUND_ERROR = "Error: User not found."
+INVALID_ID_ERROR = "Error: id must be an integer."
+JOB_NOT_FOUND_ERROR = "Error: Job not found."
+ARCHIVED_NOT_FOUND_ERROR = "Error: Archived user not found."
+RESTORE_CONFLICT_ERROR = "Error: A newer user has taken this user's email or id."
+
+
+def user_to_dict(user):
+    return {"id": user.id, "name": user.name, "email": user.email, "role": user.role}
+
+
+def _is_id(value):
+    # JSON true and false are ints to Python
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _json_body():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(400, description="Error: Expected a JSON object.")
+    return body
+
+
+def _error(status, message):
+    return {"status": status, "error": message}
+
+
+@api.errorhandler(HTTPException)
+def _http_error(exc):
+    return jsonify(error=exc.description), exc.code
+
+
+def _write(values, user=None):
+    """Create or update one user inside a savepoint.
+
+    Returns ``(status, user_or_error_message)`` so single and batch
+    endpoints report constraint violations the same way.
+    """
+    try:
+        with db.session.begin_nested():
+            if user is None:
+                user = User(**values)
+                db.session.add(user)
+            else:
+                for name, value in values.items():
+                    setattr(user, name, value)
+        return 200, user
+    except DataError:
+        return 400, DATA_TOO_LONG_ERROR
+    except IntegrityError:
+        return 409, DUPLICATE_EMAIL_ERROR
+    except StaleDataError:
+        # The row changed (or vanished) between loading and flushing
+        return 409, CONFLICT_ERROR
+
+
+# Single user endpoints
+@api.get('/users')
+def list_users():
+    sort = request.args.get('sort', 'id')
+    if sort not in USER_SORT_KEYS:
+        abort(400, description="Error: Unknown sort key.")
+    per_page = request.args.get('per_page', current_app.config['USERS_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['USERS_MAX_PER_PAGE']))
+    after = request.args.get('after')
+    before = request.args.get('before')
+    filters = parse_filters(request.args)
+
+    state = get_table_version(db.session)
+    etag = make_etag('api-list', state.token, sort, per_page, after, before, sorted(filters.items()))
+    response = not_modified(etag, state.updated_at)
+    if response is not None:
+        return response
+
+    try:
+        page = keyset_page(
+            db.session,
+            filter_users(select_user_rows(), db.engine.dialect.name, filters),
+            USER_SORT_KEYS[sort],
+            per_page,
+            after=after,
+            before=before,
+        )
+    except ValueError:
+        abort(400, description="Error: Invalid cursor.")
+    response = jsonify(
+        users=[user_to_dict(row) for row in page.items],
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor,
+    )
+    return add_validators(response, etag, state.updated_at)
+
+
+@api.get('/users/<int:id>')
+def get_user(id):
+    user = db.session.get(User, id)
+    if user is None:
+        abort(404, description=NOT_FOUND_ERROR)
+    etag = make_etag('api-user', id, user.updated_at.isoformat())
+    response = not_modified(etag, user.updated_at)
+    if response is not None:
+        return response
+    return add_validators(jsonify(user_to_dict(user)), etag, user.updated_at)
+
+
+@api.get('/users/summary')
+def users_summary():
+    """Total and per-role user counts; ``approximate=1`` for planner estimates."""
+    default = '1' if current_app.config['USERS_COUNT_APPROXIMATE'] else '0'
+    approximate = request.args.get('approximate', default) == '1'
+    if approximate:
+        return jsonify(user_summary(db.session, approximate=True))
+
+    state = get_table_version(db.session)
+    etag = make_etag('api-summary', state.token)
+    response = not_modified(etag, state.updated_at)
+    if response is not None:
+        return response
+    return add_validators(jsonify(user_summary(db.session)), etag, state.updated_at)
+
+
+# Change feed
+@api.get('/users/changes')
+def user_changes():
+    """Inserted, updated and deleted users after the ``since`` cursor.
+
+    Returns ``{"changes": [...], "next_cursor": ..., "has_more": ...}``;
+    pass ``next_cursor`` as ``since`` to continue, also once ``has_more``
+    is false, to poll for new changes. A 410 means the cursor is from
+    before the table was recreated, or before tombstones that have been
+    pruned, and the client must sync from scratch.
+    """
+    since = request.args.get('since')
+    per_page = request.args.get('per_page', current_app.config['USERS_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['USERS_MAX_PER_PAGE']))
+
+    state = get_table_version(db.session)
+    etag = make_etag('api-changes', state.token, since, per_page)
+    response = not_modified(etag, state.updated_at)
+    if response is not None:
+        return response
+
+    try:
+        page = changes_since(db.session, since, per_page)
+    except FeedReset:
+        abort(410, description="Error: The change feed was reset. Sync again without a cursor.")
+    except (TypeError, ValueError):
+        abort(400, description="Error: Invalid cursor.")
+    response = jsonify(changes=page.changes, next_cursor=page.next_cursor, has_more=page.has_more)
+    return add_validators(response, etag, state.updated_at)
+
+
+@api.post('/users')
+def create_user():
+    values, error = validate_user_fields(_json_body())
+    if error:
+        abort(400, description=error)
+    status, result = _write(values)
+    if status != 200:
+        db.session.rollback()
+        abort(status, description=result)
+    db.session.commit()
+    response = jsonify(user_to_dict(result))
+    response.headers['Location'] = url_for('api.get_user', id=result.id)
+    return response, 201
+
+
+@api.route('/users/<int:id>', methods=['PUT', 'PATCH'])
+def update_user(id):
+    user = db.session.get(User, id)
+    if user is None:
+        abort(404, description=NOT_FOUND_ERROR)
+    values, error = validate_user_fields(_json_body(), partial=request.method == 'PATCH')
+    if error:
+        abort(400, description=error)
+    status, result = _write(values, user)
+    if status != 200:
+        db.session.rollback()
+        abort(status, description=result)
+    db.session.commit()
+    return jsonify(user_to_dict(result))
+
+
+@api.delete('/users/<int:id>')
+def delete_user(id):
+    deleted = db.session.execute(db.delete(User).where(User.id == id)).rowcount
+    if not deleted:
+        abort(404, description=NOT_FOUND_ERROR)
+    bump_table_version(db.session)
+    db.session.commit()
+    return '', 204
+
+
+# Batch endpoint
+@api.post('/users/batch')
+def batch_users():
+    """Apply many creates, updates and deletes in one transaction.
+
+    Body: ``{"create": [{...}], "update": [{"id": 1, ...}], "delete": [1, 2],
+    "atomic": false}``. Every item runs in its own savepoint and gets its
+    own result; failed items are skipped and the rest is committed, unless
+    ``atomic`` is true, in which case any failure rolls back everything.
+    """
+    body = _json_body()
+    creates = body.get('create') or []
+    updates = body.get('update') or []
+    deletes = body.get('delete') or []
+    if not all(isinstance(items, list) for items in (creates, updates, deletes)):
+        abort(400, description="Error: create, update and delete must be arrays.")
+    if len(creates) + len(updates) + len(deletes) > current_app.config['API_MAX_BATCH_SIZE']:
+        abort(413, description="Error: Too many items in one batch.")
+
+    results = {"create": [], "update": [], "delete": []}
+
+    for item in creates:
+        values, error = validate_user_fields(item if isinstance(item, dict) else {})
+        if error:
+            results["create"].append(_error(400, error))
+            continue
+        status, result = _write(values)
+        if status != 200:
+            results["create"].append(_error(status, result))
+        else:
+            results["create"].append({"status": 201, "user": user_to_dict(result)})
+
+    # Load every user to update with a single query
+    ids = [item.get('id') for item in updates if isinstance(item, dict) and _is_id(item.get('id'))]
+    users = {u.id: u for u in db.session.scalars(db.select(User).where(User.id.in_(ids)))}
+    for item in updates:
+        if isinstance(item, dict) and not _is_id(item.get('id')):
+            results["update"].append(_error(400, INVALID_ID_ERROR))
+            continue
+        user = users.get(item.get('id')) if isinstance(item, dict) else None
+        if user is None:
+            results["update"].append(_error(404, NOT_FOUND_ERROR))
+            continue
+        values, error = validate_user_fields(item, partial=True)
+        if error:
+            results["update"].append(_error(400, error))
+            continue
+        status, result = _write(values, user)
+        if status != 200:
+            results["update"].append(_error(status, result))
+        else:
+            results["update"].append({"status": 200, "user": user_to_dict(result)})
+
+    # One DELETE for every id that exists
+    existing = set(db.session.scalars(db.select(User.id).where(User.id.in_([id for id in deletes if _is_id(id)]))))
+    if existing:
+        db.session.execute(
+            db.delete(User).where(User.id.in_(existing)), execution_options={"synchronize_session": False}
+        )
+        bump_table_version(db.session)
+    for id in deletes:
+        if not _is_id(id):
+            results["delete"].append(_error(400, INVALID_ID_ERROR))
+        elif id in existing:
+            results["delete"].append({"status": 204, "id": id})
+        else:
+            results["delete"].append(_error(404, NOT_FOUND_ERROR))
+
+    failed = any(r["status"] >= 400 for items in results.values() for r in items)
+    if failed and body.get('atomic'):
+        db.session.rollback()
+        return jsonify(results=results, committed=False), 409
+    db.session.commit()
+    return jsonify(results=results, committed=True)
+
+
+# Set-based bulk operations (see app/bulk.py)
+def _target(body):
+    """``{"ids": [...]}`` or ``{"filters": {...}}`` of a bulk request, validated."""
+    if ('ids' in body) == ('filters' in body):
+        abort(400, description="Error: Expected either ids or filters.")
+    if 'filters' in body:
+        error = validate_filters(body['filters'])
+        if error:
+            abort(400, description=error)
+        return {"filters": {name: value.strip() for name, value in body['filters'].items()}}
+    ids = body['ids']
+    if not isinstance(ids, list) or not all(_is_id(id) for id in ids):
+        abort(400, description="Error: ids must be an array of integers.")
+    return {"ids": ids}
+
+
+@api.post('/users/bulk/delete')
+def bulk_delete_users():
+    """Delete ``{"ids": [...]}`` or every user matching ``{"filters": {...}}``.
+
+    A filter that matches more than ``USERS_BULK_CHUNK_SIZE`` users is
+    handed to ``flask worker``: 202 with the queued job, like ``/jobs``.
+    """
+    target = _target(_json_body())
+    chunk_size = current_app.config['USERS_BULK_CHUNK_SIZE']
+    if 'filters' in target:
+        job = enqueue_if_large(db.session, 'delete_users', target, chunk_size)
+        if job is not None:
+            return _queued(job)
+    deleted = delete_users(db.session, chunk_size, **target)
+    return jsonify(deleted=deleted)
+
+
+@api.post('/users/bulk/role')
+def bulk_set_role():
+    """Give ``role`` to ``{"ids": [...]}`` or every user matching ``{"filters": {...}}``.
+
+    Queued as a job, like a large delete, above ``USERS_BULK_CHUNK_SIZE`` users.
+    """
+    body = _json_body()
+    target = _target(body)
+    error = validate_role(body.get('role'))
+    if error:
+        abort(400, description=error)
+    role = body['role'].strip()
+    chunk_size = current_app.config['USERS_BULK_CHUNK_SIZE']
+    if 'filters' in target:
+        job = enqueue_if_large(db.session, 'set_role', {**target, "role": role}, chunk_size)
+        if job is not None:
+            return _queued(job)
+    updated = set_role(db.session, role, chunk_size, **target)
+    return jsonify(updated=updated)
+
+
+@api.post('/users/bulk/rename-role')
+def bulk_rename_role():
+    """Move every user from role ``from`` to role ``to`` (queued when there are many)."""
+    body = _json_body()
+    error = validate_role(body.get('from'), 'from') or validate_role(body.get('to'), 'to')
+    if error:
+        abort(400, description=error)
+    old, new = body['from'].strip(), body['to'].strip()
+    chunk_size = current_app.config['USERS_BULK_CHUNK_SIZE']
+    job = enqueue_if_large(db.session, 'set_role', {"filters": {"role": old}, "role": new}, chunk_size)
+    if job is not None:
+        return _queued(job)
+    updated = rename_role(db.session, old, new, chunk_size)
+    return jsonify(updated=updated)
+
+
+# Deleted users (see app/archive.py)
+def archived_to_dict(archived):
+    return {
+        "id": archived.id,
+        "user_id": archived.user_id,
+        "name": archived.name,
+        "email": archived.email,
+        "role": archived.role,
+        "deleted_at": archived.deleted_at.isoformat(),
+    }
+
+
+@api.get('/users/archived')
+def list_archived_users():
+    """Deleted users in the order they were archived, a page at a time."""
+    per_page = request.args.get('per_page', current_app.config['USERS_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['USERS_MAX_PER_PAGE']))
+    stmt = db.select(
+        ArchivedUser.id, ArchivedUser.user_id, ArchivedUser.name, ArchivedUser.email,
+        ArchivedUser.role, ArchivedUser.deleted_at,
+    )
+    if request.args.get('email'):
+        stmt = stmt.where(db.func.lower(ArchivedUser.email) == request.args['email'].strip().lower())
+    try:
+        page = keyset_page(
+            db.session, stmt, (ArchivedUser.id,), per_page,
+            after=request.args.get('after'), before=request.args.get('before'),
+        )
+    except ValueError:
+        abort(400, description="Error: Invalid cursor.")
+    return jsonify(
+        users=[archived_to_dict(row) for row in page.items],
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor,
+    )
+
+
+@api.post('/users/archived/<int:id>/restore')
+def restore_archived_user(id):
+    """Bring a deleted user back under its old id."""
+    archived = db.session.get(ArchivedUser, id)
+    if archived is None:
+        abort(404, description=ARCHIVED_NOT_FOUND_ERROR)
+    try:
+        user = restore_user(db.session, archived)
+    except IntegrityError:
+        db.session.rollback()
+        abort(409, description=RESTORE_CONFLICT_ERROR)
+    db.session.commit()
+    return jsonify(user_to_dict(user)), 201
+
+
+# Background jobs (run by `flask worker`, see app/jobs.py)
+def _queued(job):
+    db.session.commit()
+    response = jsonify(job_to_dict(job))
+    response.headers['Location'] = url_for('api.get_job', id=job.id)
+    return response, 202
+
+
+@api.post('/jobs')
+def create_job():
+    """Queue a bulk operation: ``{"kind": "set_role", "params": {...}}``.
+
+    Kinds: ``set_role`` (``{"filters": {...}, "role": "..."}``) and
+    ``delete_users`` (``{"filters": {...}}``, at least one filter), with
+    the filters of ``GET /api/users``. Returns 202 and the queued job.
+    """
+    body = _json_body()
+    try:
+        job = enqueue(db.session, body.get('kind'), body.get('params', {}))
+    except ValueError as exc:
+        abort(400, description=str(exc))
+    return _queued(job)
+
+
+@api.post('/jobs/import')
+def create_import_job():
+    """Queue an import of the uploaded ``file`` (CSV or JSON Lines)."""
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        abort(400, description="Error: Missing file to import.")
+    fmt = request.form.get('format') or format_for(upload.filename)
+    if fmt not in FORMATS:
+        abort(400, description=f"Error: format must be one of {', '.join(FORMATS)}.")
+    try:
+        payload = upload.read().decode('utf-8')
+    except UnicodeDecodeError:
+        abort(400, description=INVALID_ENCODING_ERROR)
+    job = enqueue(db.session, 'import_users', {"format": fmt, "filename": upload.filename}, payload)
+    return _queued(job)
+
+
+@api.get('/jobs')
+def list_jobs():
+    """The most recent jobs, optionally only those with ``?status=``."""
+    per_page = min(
+        request.args.get('per_page', current_app.config['USERS_PER_PAGE'], type=int),
+        current_app.config['USERS_MAX_PER_PAGE'],
+    )
+    stmt = db.select(Job).order_by(Job.id.desc()).limit(max(per_page, 1))
+    if request.args.get('status'):
+        stmt = stmt.where(Job.status == request.args['status'])
+    return jsonify(jobs=[job_to_dict(job) for job in db.session.scalars(stmt)])
+
+
+@api.get('/jobs/<int:id>')
+def get_job(id):
+    job = db.session.get(Job, id)
+    if job is None:
+        abort(404, description=JOB_NOT_FOUND_ERROR)
+    return jsonify(job_to_dict(job))
+
+
+@api.post('/jobs/<int:id>/cancel')
+def cancel_job(id):
+    """Cancel a job; a running one stops at its next chunk."""
+    job = db.session.get(Job, id)
+    if job is None:
+        abort(404, description=JOB_NOT_FOUND_ERROR)
+    if not cancel(db.session, job):
+        abort(409, description=f"Error: Job already {job.status}.")
+    return jsonify(job_to_dict(job))
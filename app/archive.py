@@ -0,0 +1,87 @@
+"""Deleted users: restore and compaction of the ``users_archive`` table.
+
+Deleting a user moves its row to :class:`~app.models.ArchivedUser` (see
+``USER_ARCHIVE_DDL``), so nothing on the hot path ever reads history.
+The archive only grows, though: ``flask users compact-archive``, run on
+a schedule, purges the users archived more than
+``USERS_ARCHIVE_RETENTION_DAYS`` ago, optionally writing them to a CSV or
+JSON Lines file first.
+"""
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from app.models import ArchivedUser, User, utcnow
+from app.transfer import iter_export
+
+# Columns of an exported archive, in file order
+ARCHIVE_EXPORT_COLUMNS = (
+    ArchivedUser.user_id,
+    ArchivedUser.name,
+    ArchivedUser.email,
+    ArchivedUser.role,
+    ArchivedUser.created_at,
+    ArchivedUser.updated_at,
+    ArchivedUser.deleted_at,
+)
+
+
+def restore_user(session, archived):
+    """Move ``archived`` back into ``users`` under its old id.
+
+    Returns the :class:`~app.models.User`. The caller commits; flushing
+    raises ``IntegrityError`` when the email, or on SQLite the id, has
+    been taken by a newer user since.
+    """
+    user = User(
+        id=archived.user_id,
+        name=archived.name,
+        email=archived.email,
+        role=archived.role,
+        created_at=archived.created_at,
+    )
+    session.add(user)
+    session.delete(archived)
+    session.flush()
+    return user
+
+
+def _row(row):
+    return [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+
+
+def compact_archive(session, older_than_days, chunk_size, export=None, fmt="csv"):
+    """Purge the users archived more than ``older_than_days`` ago.
+
+    Each chunk of ``chunk_size`` rows is one ``DELETE ... RETURNING`` and
+    one transaction. With ``export``, a text file, the chunk's rows are
+    written to it before the chunk commits, so a failed run may export a
+    chunk again but never purges one it did not write. Returns the number
+    of users purged.
+    """
+    cutoff = utcnow() - timedelta(days=older_than_days)
+    archive = ArchivedUser.__table__
+    expired = (
+        select(ArchivedUser.id).where(ArchivedUser.deleted_at < cutoff)
+        .order_by(ArchivedUser.id).limit(chunk_size)
+    )
+    purged = 0
+    while True:
+        rows = session.execute(
+            archive.delete().where(ArchivedUser.id.in_(expired))
+            .returning(ArchivedUser.id, *ARCHIVE_EXPORT_COLUMNS)
+        ).all()
+        if export is not None and rows:
+            rows.sort(key=lambda row: row[0])
+            columns = [column.key for column in ARCHIVE_EXPORT_COLUMNS]
+            chunks = iter_export(
+                (_row(row[1:]) for row in rows), fmt, chunk_rows=chunk_size, columns=columns,
+                header=purged == 0,
+            )
+            for chunk in chunks:
+                export.write(chunk)
+            export.flush()
+        session.commit()
+        purged += len(rows)
+        if len(rows) < chunk_size:
+            return purged
@@ -0,0 +1,52 @@
+"""Fingerprinted static asset URLs.
+
+Every file under ``app/static`` is hashed when the app is created, and
+``url_for('static', filename=...)`` adds the hash as ``?v=<hash>``. A
+request carrying the current hash is answered with a one-year
+``Cache-Control: public, immutable``, so browsers stop revalidating the
+stylesheet on every page; a changed file gets a new URL on the next
+deploy. Requests without a hash, or with an old one, keep Flask's
+default revalidation.
+"""
+import hashlib
+import os
+
+from flask import request
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def hash_static_files(folder):
+    """Map every file under ``folder`` (by its URL path) to a content hash."""
+    hashes = {}
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, "rb") as file:
+                digest = hashlib.sha256(file.read()).hexdigest()[:12]
+            hashes[os.path.relpath(path, folder).replace(os.sep, "/")] = digest
+    return hashes
+
+
+def install_static_fingerprints(app):
+    hashes = hash_static_files(app.static_folder) if app.static_folder else {}
+    app.extensions["static_hashes"] = hashes
+
+    @app.url_defaults
+    def _add_static_version(endpoint, values):
+        if endpoint == "static" and values.get("filename") in hashes:
+            values.setdefault("v", hashes[values["filename"]])
+
+    @app.after_request
+    def _cache_fingerprinted(response):
+        if (
+            request.endpoint == "static"
+            and response.status_code == 200
+            and request.args.get("v")
+            and request.args.get("v") == hashes.get(request.view_args.get("filename"))
+        ):
+            response.cache_control.no_cache = False
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
@@ -0,0 +1,130 @@
+"""Set-based writes to many users at once.
+
+Changing the role of thousands of users through ``/edit`` costs a SELECT
+and an UPDATE per user. The operations here write a whole set with one
+UPDATE or DELETE ... WHERE instead: deleting a list of ids, giving every
+user that matches the filters of :mod:`app.search` a role, and renaming
+a role.
+
+A set of up to ``USERS_BULK_CHUNK_SIZE`` users is written by a single
+statement in a single transaction. A larger one is written one chunk of
+that many users at a time, each chunk one statement and one transaction,
+so that no transaction holds the row locks of a huge set (or, on SQLite,
+blocks every other writer) for long. The statement picks its chunk itself
+with a subquery::
+
+    UPDATE users SET role = 'staff', ...
+    WHERE id IN (SELECT id FROM users WHERE role = 'intern' ORDER BY id LIMIT 1000)
+
+Users that already have the new role do not match, so every chunk makes
+progress, no ids travel to the application and back, and a run that
+failed halfway is finished by running the same operation again.
+"""
+from sqlalchemy import func, select, update
+
+from app.models import DATA_TOO_LONG_ERROR, User, bump_table_version, utcnow
+from app.search import FILTERS, filter_users
+
+
+def validate_filters(filters, required=True):
+    """Return an error message for malformed ``filters``, or None."""
+    if not isinstance(filters, dict) or set(filters) - set(FILTERS):
+        return f"Error: filters must be an object with keys from {', '.join(FILTERS)}."
+    if not all(isinstance(value, str) and value.strip() for value in filters.values()):
+        return "Error: Filter values must be non-empty strings."
+    if required and not filters:
+        return "Error: At least one filter is required."
+    return None
+
+
+def validate_role(role, field="role"):
+    """Return an error message unless ``role`` fits the users table, or None."""
+    if not isinstance(role, str) or not role.strip():
+        return f"Error: Missing required field '{field}'."
+    if len(role.strip()) > User.__table__.c.role.type.length:
+        return DATA_TOO_LONG_ERROR
+    return None
+
+
+def _set_role(role):
+    return update(User.__table__).values(role=role, version=User.version + 1, updated_at=utcnow())
+
+
+def _matching(session, filters, *conditions):
+    # Never correlated with the UPDATE or DELETE of the same table
+    stmt = select(User.id).where(*conditions).correlate(None)
+    return filter_users(stmt, session.get_bind().dialect.name, filters)
+
+
+def _drain(session, statement, matching, chunk_size):
+    # Written rows stop matching, so the same statement moves on by itself
+    while True:
+        chunk = matching.order_by(User.id).limit(chunk_size)
+        count = session.execute(statement.where(User.id.in_(chunk))).rowcount
+        if count:
+            bump_table_version(session)
+        yield count
+        if count < chunk_size:
+            return
+
+
+def _by_id(session, statement, ids, chunk_size):
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), chunk_size):
+        count = session.execute(statement.where(User.id.in_(ids[start:start + chunk_size]))).rowcount
+        if count:
+            bump_table_version(session)
+        yield count
+
+
+def iter_delete(session, chunk_size, ids=None, filters=None):
+    """Delete the users with ``ids`` or matching ``filters``, one chunk at a time.
+
+    Yields the number of users each chunk deleted; the caller commits
+    after each one.
+    """
+    statement = User.__table__.delete()
+    if ids is not None:
+        return _by_id(session, statement, ids, chunk_size)
+    return _drain(session, statement, _matching(session, filters), chunk_size)
+
+
+def iter_set_role(session, role, chunk_size, ids=None, filters=None):
+    """Give ``role`` to the users with ``ids`` or matching ``filters``, one chunk at a time.
+
+    Yields the number of users each chunk changed; users that already
+    have ``role`` are left alone. The caller commits after each chunk.
+    """
+    statement = _set_role(role).where(User.role != role)
+    if ids is not None:
+        return _by_id(session, statement, ids, chunk_size)
+    return _drain(session, statement, _matching(session, filters, User.role != role), chunk_size)
+
+
+def count_matches(session, filters, role=None):
+    """Users matching ``filters`` that :func:`iter_set_role` (with ``role``) would write."""
+    conditions = [User.role != role] if role is not None else []
+    return session.scalar(select(func.count()).select_from(_matching(session, filters, *conditions).subquery()))
+
+
+def _commit_each(session, chunks):
+    total = 0
+    for count in chunks:
+        session.commit()
+        total += count
+    return total
+
+
+def delete_users(session, chunk_size, ids=None, filters=None):
+    """Delete users by ``ids`` or ``filters``; returns how many were deleted."""
+    return _commit_each(session, iter_delete(session, chunk_size, ids=ids, filters=filters))
+
+
+def set_role(session, role, chunk_size, ids=None, filters=None):
+    """Give users ``role`` by ``ids`` or ``filters``; returns how many changed."""
+    return _commit_each(session, iter_set_role(session, role, chunk_size, ids=ids, filters=filters))
+
+
+def rename_role(session, old, new, chunk_size):
+    """Move every user with role ``old`` to ``new``; returns how many moved."""
+    return set_role(session, new, chunk_size, filters={"role": old})
@@ -0,0 +1,131 @@
+"""Rendered page cache with pluggable backends.
+
+Entries are keyed by the change version of the data they were rendered
+from (see ``models.get_table_version``), so a write never has to find and
+delete stale entries: it bumps the version and old keys are simply never
+asked for again. The TTL only bounds how long dead entries use memory.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheBackend:
+    """Base class: counts hits and misses around ``_get``."""
+
+    name = "none"
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def _get(self, key):
+        return None
+
+    def stats(self):
+        return {"backend": self.name, "hits": self.hits, "misses": self.misses}
+
+
+class NullCache(CacheBackend):
+    """Never stores anything; every lookup is a miss."""
+
+
+class LRUCache(CacheBackend):
+    """In-process cache bounded by entry count and TTL.
+
+    Each gunicorn worker holds its own copy, which is fine for correctness
+    because keys carry the data version, but every worker renders a page
+    once before it can serve it from cache.
+    """
+
+    name = "lru"
+
+    def __init__(self, ttl=300, max_entries=256, clock=time.monotonic):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= self._clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, self._clock() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return dict(super().stats(), size=len(self._data))
+
+
+class RedisCache(CacheBackend):
+    """Cache shared by every worker and host through Redis.
+
+    Needs the optional ``redis`` package.
+    """
+
+    name = "redis"
+
+    def __init__(self, url, ttl=300, prefix="user-manager:"):
+        super().__init__(ttl)
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("The redis cache backend needs the 'redis' package.") from exc
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def _get(self, key):
+        value = self._client.get(self._prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value):
+        self._client.set(self._prefix + key, value.encode(), ex=self.ttl)
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + "*"):
+            self._client.delete(key)
+
+
+def create_cache(config):
+    """Build the backend selected by ``USERS_CACHE_BACKEND``."""
+    backend = config.get("USERS_CACHE_BACKEND", "lru")
+    ttl = config.get("USERS_CACHE_TTL", 300)
+    if backend == "lru":
+        return LRUCache(ttl=ttl, max_entries=config.get("USERS_CACHE_MAX_ENTRIES", 256))
+    if backend == "redis":
+        return RedisCache(config["USERS_CACHE_REDIS_URL"], ttl=ttl)
+    if backend == "none":
+        return NullCache(ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,176 @@
+"""Incremental change feed of the users table.
+
+Every user row carries the ``change_seq`` of the transaction that last
+wrote it and every delete leaves a :class:`~app.models.UserTombstone`
+(see ``CHANGE_TRACKING_DDL`` in :mod:`app.models`). A sync job reads the
+feed in ``(change_seq, kind, id)`` order, deletes before upserts within a
+sequence number, and resumes from the cursor of the last change it saw,
+so each sync costs as much as the churn since the previous one rather
+than the size of the table.
+
+The cursor also carries the table's epoch: after the database is
+recreated or restored the old positions mean nothing, and
+:func:`changes_since` raises :class:`FeedReset` so the client starts over.
+The same happens to a cursor from before the tombstones that
+:func:`prune_tombstones` has dropped, since the deletes it has not seen
+yet may be gone.
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from sqlalchemy import func, select, tuple_, update
+
+from app.models import TableVersion, User, UserTombstone, get_table_version, utcnow
+from app.pagination import decode_cursor, encode_cursor
+
+DELETE, UPSERT = 0, 1
+# (epoch, change_seq, kind, id)
+CURSOR_TYPES = (str, int, int, int)
+# Larger than any user id
+LAST_ID = 2**63 - 1
+
+
+class FeedReset(Exception):
+    """The cursor belongs to an earlier incarnation of the table."""
+
+
+@dataclass
+class ChangePage:
+    changes: list
+    next_cursor: str
+    has_more: bool
+    # Cursor right after each change, for consumers that resume mid-page
+    cursors: list = field(default_factory=list)
+
+
+def _feed_state(session):
+    # (epoch, pruned_seq) of the users table
+    row = session.execute(
+        select(TableVersion.epoch, TableVersion.pruned_seq).where(TableVersion.name == User.__tablename__)
+    ).first()
+    return (row.epoch, row.pruned_seq or 0) if row else ("", 0)
+
+
+def state_cursor(state, dialect_name):
+    """Cursor after every change up to the :class:`~app.models.TableState` ``state``."""
+    # PostgreSQL stamps rows with the version their statement bumps to,
+    # SQLite with the one the transaction bumps from (see
+    # CHANGE_TRACKING_DDL); LAST_ID sorts after every id of that version
+    seq = state.version if dialect_name == "postgresql" else state.version - 1
+    return encode_cursor([state.epoch, seq, UPSERT, LAST_ID])
+
+
+def head_cursor(session):
+    """Cursor after every change committed so far, to follow only new ones."""
+    return state_cursor(get_table_version(session), session.get_bind().dialect.name)
+
+
+def _after(columns, position):
+    """Rows whose ``columns`` sort strictly after ``position``."""
+    return tuple_(*columns) > tuple_(*position)
+
+
+def changes_since(session, cursor=None, limit=100):
+    """Return the next ``limit`` changes after ``cursor`` as a :class:`ChangePage`.
+
+    Without a cursor the feed starts at the beginning, which lists every
+    live user once. Raises ``ValueError`` for a malformed cursor.
+    """
+    epoch, pruned_seq = _feed_state(session)
+    seq, kind, last_id = -1, UPSERT, 0
+    if cursor:
+        cursor_epoch, seq, kind, last_id = decode_cursor(cursor, CURSOR_TYPES)
+        if cursor_epoch != epoch:
+            raise FeedReset(cursor_epoch)
+        if kind not in (DELETE, UPSERT):
+            raise ValueError("Invalid cursor")
+        # The tombstones below pruned_seq are gone: reset unless every
+        # delete still ahead of the cursor is at or above it
+        if (seq, kind) < (pruned_seq - 1, UPSERT):
+            raise FeedReset(cursor_epoch)
+
+    # (seq, DELETE, id) sorts before every upsert of seq, (seq, UPSERT, id)
+    # after every delete of seq
+    deleted_after = (
+        _after((UserTombstone.change_seq, UserTombstone.user_id), (seq, last_id))
+        if kind == DELETE else UserTombstone.change_seq > seq
+    )
+    upserted_after = (
+        _after((User.change_seq, User.id), (seq, last_id))
+        if kind == UPSERT else User.change_seq >= seq
+    )
+    deletes = session.execute(
+        select(UserTombstone.change_seq, UserTombstone.user_id)
+        .where(deleted_after)
+        .order_by(UserTombstone.change_seq, UserTombstone.user_id)
+        .limit(limit + 1)
+    ).all()
+    upserts = session.execute(
+        select(User.change_seq, User.id, User.name, User.email, User.role, User.created_at, User.updated_at)
+        .where(upserted_after)
+        .order_by(User.change_seq, User.id)
+        .limit(limit + 1)
+    ).all()
+
+    merged = sorted(
+        [((row.change_seq, DELETE, row.user_id), row) for row in deletes]
+        + [((row.change_seq, UPSERT, row.id), row) for row in upserts],
+        key=lambda item: item[0],
+    )
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+
+    changes, cursors = [], []
+    for (change_seq, change_kind, id), row in merged:
+        cursors.append(encode_cursor([epoch, change_seq, change_kind, id]))
+        if change_kind == DELETE:
+            changes.append({"op": "delete", "id": id})
+        else:
+            changes.append({
+                "op": "upsert",
+                "id": id,
+                "user": {
+                    "id": id,
+                    "name": row.name,
+                    "email": row.email,
+                    "role": row.role,
+                    "created_at": row.created_at.isoformat(),
+                    "updated_at": row.updated_at.isoformat(),
+                },
+            })
+    position = merged[-1][0] if merged else (seq, kind, last_id)
+    return ChangePage(changes, encode_cursor([epoch, *position]), has_more, cursors)
+
+
+def prune_tombstones(session, older_than_days, chunk_size):
+    """Drop the tombstones of users deleted more than ``older_than_days`` ago.
+
+    The newest expired ``change_seq`` becomes the table's ``pruned_seq``,
+    committed before any tombstone goes, and only the tombstones below it
+    are dropped: a cursor inside that sequence may still need the rest of
+    it, and an older cursor gets :class:`FeedReset` rather than a feed that
+    misses deletes. The tombstones go ``chunk_size`` per transaction.
+    Returns how many went.
+    """
+    cutoff = utcnow() - timedelta(days=older_than_days)
+    watermark = session.scalar(
+        select(func.max(UserTombstone.change_seq)).where(UserTombstone.deleted_at < cutoff)
+    )
+    if watermark is None:
+        return 0
+    session.execute(
+        update(TableVersion.__table__)
+        .where(TableVersion.name == User.__tablename__, TableVersion.pruned_seq < watermark)
+        .values(pruned_seq=watermark)
+    )
+    session.commit()
+
+    tombstones = UserTombstone.__table__
+    expired = select(UserTombstone.id).where(UserTombstone.change_seq < watermark).limit(chunk_size)
+    pruned = 0
+    while True:
+        count = session.execute(tombstones.delete().where(UserTombstone.id.in_(expired))).rowcount
+        session.commit()
+        pruned += count
+        if count < chunk_size:
+            return pruned
@@ -0,0 +1,124 @@
+"""``flask users``, ``flask db`` and ``flask worker`` commands."""
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.archive import compact_archive
+from app.bulk import rename_role, validate_role
+from app.changes import prune_tombstones
+from app.jobs import run_worker, work
+from app.models import (
+    db,
+    install_change_tracking,
+    install_search_extensions,
+    install_sqlite_fts,
+    install_user_archive,
+    install_user_counts,
+)
+from app.schema import upgrade_schema
+from app.transfer import (
+    FORMATS,
+    INVALID_ENCODING_ERROR,
+    ImportReport,
+    format_for,
+    import_users,
+    iter_export,
+    select_export_rows,
+)
+
+users_cli = AppGroup('users', help='Bulk user management.')
+
+@users_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, help='Rows per INSERT/COPY and transaction.')
+def import_users_command(path, fmt, batch_size):
+    """Import users from a CSV or JSON Lines file."""
+    report = ImportReport()
+    try:
+        with open(path, encoding='utf-8', newline='') as stream:
+            import_users(
+                db.session,
+                stream,
+                fmt or format_for(path),
+                batch_size=batch_size or current_app.config['USERS_IMPORT_BATCH_SIZE'],
+                report=report,
+            )
+    except UnicodeDecodeError:
+        # Batches before the bad bytes are already committed
+        db.session.rollback()
+        raise click.ClickException(
+            f"{INVALID_ENCODING_ERROR} {report.inserted} users were imported before it."
+        )
+    for line_number, message in report.errors:
+        click.echo(f"line {line_number}: {message}", err=True)
+    click.echo(f"Imported {report.inserted} users, {len(report.errors)} rejected.")
+
+@users_cli.command('export')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv', show_default=True)
+@click.option('--role', 'roles', multiple=True, help='Only export users with this role (repeatable).')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Defaults to stdout.')
+def export_users_command(fmt, roles, output):
+    """Export users as CSV or JSON Lines."""
+    rows = select_export_rows(db.session, roles=roles, batch_size=current_app.config['USERS_STREAM_BATCH_SIZE'])
+    for chunk in iter_export(rows, fmt, chunk_rows=current_app.config['USERS_EXPORT_CHUNK_ROWS']):
+        output.write(chunk)
+
+@users_cli.command('rename-role')
+@click.argument('old')
+@click.argument('new')
+def rename_role_command(old, new):
+    """Move every user with role OLD to role NEW."""
+    error = validate_role(new, 'new')
+    if error:
+        raise click.BadParameter(error, param_hint='NEW')
+    moved = rename_role(db.session, old, new.strip(), current_app.config['USERS_BULK_CHUNK_SIZE'])
+    click.echo(f"Moved {moved} users from '{old}' to '{new.strip()}'.")
+
+@users_cli.command('compact-archive')
+@click.option('--older-than-days', type=int, help='Defaults to USERS_ARCHIVE_RETENTION_DAYS.')
+@click.option('--export', 'output', type=click.File('w', encoding='utf-8'), help='Write purged users to this file first.')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv', show_default=True)
+def compact_archive_command(older_than_days, output, fmt):
+    """Purge users, and change feed tombstones, deleted longer ago than the retention period."""
+    if older_than_days is None:
+        older_than_days = current_app.config['USERS_ARCHIVE_RETENTION_DAYS']
+    chunk_size = current_app.config['USERS_BULK_CHUNK_SIZE']
+    purged = compact_archive(db.session, older_than_days, chunk_size, export=output, fmt=fmt)
+    click.echo(f"Purged {purged} archived users deleted more than {older_than_days} days ago.")
+    pruned = prune_tombstones(db.session, older_than_days, chunk_size)
+    click.echo(f"Pruned {pruned} change feed tombstones; older cursors must sync again.")
+
+db_cli = AppGroup('db', help='Database schema management.')
+
+@db_cli.command('init')
+def init_db_command():
+    """Create all tables that do not exist yet."""
+    db.create_all()
+    click.echo("Database and tables verified/created successfully.")
+
+@db_cli.command('upgrade')
+def upgrade_db_command():
+    """Create missing tables, columns and indexes."""
+    with db.engine.begin() as connection:
+        install_search_extensions(connection)
+    changes = upgrade_schema(db.engine, db.metadata)
+    with db.engine.begin() as connection:
+        install_sqlite_fts(connection)
+        install_change_tracking(connection)
+        install_user_counts(connection)
+        install_user_archive(connection)
+    for change in changes:
+        click.echo(change)
+    click.echo(f"Schema is up to date ({len(changes)} changes applied).")
+
+@click.command('worker')
+@click.option('--processes', type=int, default=1, show_default=True, help='Worker processes to run.')
+@click.option('--poll-interval', type=float, help='Seconds between polls of an empty queue.')
+@click.option('--once', is_flag=True, help='Run queued jobs in this process, then exit.')
+def worker_command(processes, poll_interval, once):
+    """Run background jobs (bulk role changes, deletes and imports)."""
+    if once:
+        work(current_app._get_current_object(), poll_interval, once=True)
+    else:
+        run_worker(current_app._get_current_object(), processes, poll_interval)
@@ -0,0 +1,132 @@
+"""Response compression.
+
+HTML, JSON and the CSV/NDJSON exports are compressed with brotli when
+the client accepts it and the optional ``brotli`` package is installed,
+and with gzip otherwise. Responses smaller than ``COMPRESS_MIN_SIZE``
+bytes are sent as they are. Streamed responses (the full user list and
+the exports) are compressed chunk by chunk, flushing after every chunk so
+the client still sees rows as they are produced.
+
+``COMPRESS_LEVEL`` is the gzip level (1-9) and ``COMPRESS_BROTLI_QUALITY``
+the brotli quality (0-11); the defaults favour speed, since every
+response is compressed on the fly. Set ``COMPRESS_RESPONSES=0`` when a
+proxy in front of the app already compresses.
+
+A compressed body is a different byte sequence from the uncompressed
+one, so the strong ETags from :mod:`app.conditional` become weak ETags
+for clients that accept an encoding; If-None-Match uses weak comparison,
+so revalidation still ends in a 304.
+"""
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/html",
+    "text/css",
+    "text/csv",
+    "text/plain",
+    "application/json",
+    "application/x-ndjson",
+)
+
+
+def negotiate(accept_encodings):
+    """Return the encoding to use for ``accept_encodings``, or None."""
+    candidates = ("br", "gzip") if brotli is not None else ("gzip",)
+    best = max(candidates, key=accept_encodings.quality)
+    return best if accept_encodings.quality(best) > 0 else None
+
+
+class _Gzip:
+    def __init__(self, level):
+        # wbits 16 + MAX_WBITS writes the gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _compressor(encoding, config):
+    if encoding == "br":
+        return _Brotli(config["COMPRESS_BROTLI_QUALITY"])
+    return _Gzip(config["COMPRESS_LEVEL"])
+
+
+def _compress_stream(chunks, compressor):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _weaken_etag(response):
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response):
+    """``after_request`` hook compressing ``response`` when worthwhile."""
+    config = current_app.config
+    encoding = negotiate(request.accept_encodings)
+    if response.status_code == 304:
+        # Same validator as the compressed 200 the client has stored
+        if encoding is not None:
+            _weaken_etag(response)
+        return response
+    if (
+        response.mimetype not in COMPRESSIBLE_TYPES
+        or response.direct_passthrough
+        or response.status_code < 200
+        or response.status_code == 204
+        or "Content-Encoding" in response.headers
+        or "Content-Range" in response.headers
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, _compressor(encoding, config))
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < config["COMPRESS_MIN_SIZE"]:
+            return response
+        compressor = _compressor(encoding, config)
+        response.set_data(compressor.compress(data) + compressor.finish())
+    response.headers["Content-Encoding"] = encoding
+    _weaken_etag(response)
+    return response
+
+
+def install_compression(app):
+    app.after_request(compress_response)
@@ -0,0 +1,45 @@
+"""Conditional GET helpers (ETag / Last-Modified).
+
+Views compute a cheap validator first (a table version or a row's
+``updated_at``) and call :func:`not_modified` before running the real
+query or rendering anything.
+"""
+import hashlib
+
+from flask import current_app, request
+
+
+def make_etag(*parts):
+    """Strong ETag value derived from everything the response depends on."""
+    return hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def add_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Let clients and proxies store the page but revalidate on every use
+    response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    """Return a 304 response when the request's validators still match.
+
+    If-Modified-Since is only consulted when the client sent no
+    If-None-Match, as RFC 9110 requires. If-None-Match uses weak
+    comparison, so the weak ETags of compressed responses (see
+    :mod:`app.compression`) match too.
+    """
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        matched = (
+            since is not None
+            and last_modified is not None
+            and last_modified.replace(microsecond=0) <= since.replace(tzinfo=None)
+        )
+    if not matched:
+        return None
+    return add_validators(current_app.response_class(status=304), etag, last_modified)
@@ -0,0 +1,116 @@
+"""Settings read from the environment by :func:`app.create_app`."""
+import os
+
+from app.database import engine_options, pgbouncer_mode
+
+
+def load_config(env=os.environ):
+    """Return the app settings for ``env`` as a plain dict."""
+    config = {}
+
+    # Detect if we are running tests
+    if env.get("FLASK_TESTING") == "1":
+        # Use in-memory SQLite database for tests
+        config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        config["TESTING"] = True
+    elif env.get("DATABASE_URL"):
+        # A complete URL wins over the DB_* parts (e.g. an SQLite file for benchmarks)
+        config["SQLALCHEMY_DATABASE_URI"] = env["DATABASE_URL"]
+        if env["DATABASE_URL"].startswith("postgresql"):
+            config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(env)
+    else:
+        # Database configuration from environment
+        config["SQLALCHEMY_DATABASE_URI"] = (
+            f"postgresql+psycopg2://{env.get('DB_USER')}:{env.get('DB_PASSWORD')}"
+            f"@{env.get('DB_HOST')}:{env.get('DB_PORT')}/{env.get('DB_NAME')}"
+        )
+        # Pool sizing, timeouts and PgBouncer mode (see app/database.py)
+        config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(env)
+
+    # Read replicas for GET requests (see app/routing.py); never used by
+    # the test database
+    config["DB_REPLICA_URLS"] = [] if config.get("TESTING") else [
+        url.strip() for url in env.get("DB_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    config["DB_REPLICA_CHECK_INTERVAL"] = float(env.get("DB_REPLICA_CHECK_INTERVAL", "5"))
+    config["DB_REPLICA_MAX_LAG"] = float(env.get("DB_REPLICA_MAX_LAG", "5"))
+    config["DB_STICKY_SECONDS"] = int(env.get("DB_STICKY_SECONDS", "5"))
+
+    config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    config["DB_STATEMENT_TIMEOUT_MS"] = int(env.get("DB_STATEMENT_TIMEOUT_MS", "5000"))
+    config["DB_PGBOUNCER"] = pgbouncer_mode(env)
+
+    # User list pagination
+    config["USERS_PER_PAGE"] = int(env.get("USERS_PER_PAGE", "50"))
+    config["USERS_MAX_PER_PAGE"] = int(env.get("USERS_MAX_PER_PAGE", "500"))
+    # Rows fetched per round trip and bytes per chunk when streaming the full list
+    config["USERS_STREAM_BATCH_SIZE"] = int(env.get("USERS_STREAM_BATCH_SIZE", "1000"))
+    config["USERS_STREAM_CHUNK_SIZE"] = int(env.get("USERS_STREAM_CHUNK_SIZE", "16384"))
+    # Rows inserted per statement and transaction by bulk imports
+    config["USERS_IMPORT_BATCH_SIZE"] = int(env.get("USERS_IMPORT_BATCH_SIZE", "1000"))
+    # Users written per statement and transaction by set-based bulk
+    # deletes and role changes (see app/bulk.py)
+    config["USERS_BULK_CHUNK_SIZE"] = int(env.get("USERS_BULK_CHUNK_SIZE", "1000"))
+    # Days deleted users stay in users_archive before `flask users
+    # compact-archive` purges them (see app/archive.py)
+    config["USERS_ARCHIVE_RETENTION_DAYS"] = int(env.get("USERS_ARCHIVE_RETENTION_DAYS", "365"))
+    # Group commit of /add (see app/group_commit.py): milliseconds to
+    # collect concurrent creates into one transaction (0 disables) and the
+    # most users per transaction
+    config["USERS_GROUP_COMMIT_MS"] = float(env.get("USERS_GROUP_COMMIT_MS", "0"))
+    config["USERS_GROUP_COMMIT_MAX_BATCH"] = int(env.get("USERS_GROUP_COMMIT_MAX_BATCH", "100"))
+    # Rows serialized per chunk of an export response
+    config["USERS_EXPORT_CHUNK_ROWS"] = int(env.get("USERS_EXPORT_CHUNK_ROWS", "1000"))
+    # User counts from planner statistics instead of the counter table
+    # (PostgreSQL only; see app/summary.py)
+    config["USERS_COUNT_APPROXIMATE"] = env.get("USERS_COUNT_APPROXIMATE", "0") == "1"
+    # Background jobs run by `flask worker` (see app/jobs.py): rows per
+    # chunk and transaction, seconds a worker may go without a checkpoint
+    # before another one takes its job over, seconds between polls of an
+    # empty queue and runs of a job before it is given up
+    config["JOBS_CHUNK_SIZE"] = int(env.get("JOBS_CHUNK_SIZE", "1000"))
+    config["JOBS_LEASE_SECONDS"] = int(env.get("JOBS_LEASE_SECONDS", "60"))
+    config["JOBS_POLL_INTERVAL"] = float(env.get("JOBS_POLL_INTERVAL", "1"))
+    config["JOBS_MAX_ATTEMPTS"] = int(env.get("JOBS_MAX_ATTEMPTS", "3"))
+    # Uploads to /import larger than this are imported by a background job
+    config["USERS_IMPORT_INLINE_MAX_BYTES"] = int(env.get("USERS_IMPORT_INLINE_MAX_BYTES", str(1024 * 1024)))
+    # Live updates at /events (see app/events.py). Every open list page
+    # holds a request for as long as its stream lasts, so they are only on
+    # by default with workers that serve many requests at once; a sync
+    # worker would be taken by a single tab
+    worker_class = env.get("GUNICORN_WORKER_CLASS", "sync")
+    config["SSE_ENABLED"] = env.get(
+        "SSE_ENABLED", "1" if worker_class in ("gevent", "gthread") else "0"
+    ) == "1"
+    # Seconds between checks for writes where LISTEN is unavailable,
+    # changes kept in memory per worker, changes read per query, seconds
+    # between keepalives and seconds before a stream is closed (the
+    # browser reconnects), by default well within gunicorn's worker timeout
+    config["SSE_POLL_INTERVAL"] = float(env.get("SSE_POLL_INTERVAL", "1"))
+    config["SSE_BUFFER_SIZE"] = int(env.get("SSE_BUFFER_SIZE", "1000"))
+    config["SSE_FETCH_SIZE"] = int(env.get("SSE_FETCH_SIZE", "500"))
+    config["SSE_KEEPALIVE_SECONDS"] = float(env.get("SSE_KEEPALIVE_SECONDS", "15"))
+    worker_timeout = int(env.get("GUNICORN_TIMEOUT", "30"))
+    config["SSE_MAX_STREAM_SECONDS"] = float(
+        env.get("SSE_MAX_STREAM_SECONDS", str(max(worker_timeout - 5, 1)))
+    )
+    # Maximum number of items accepted by /api/users/batch
+    config["API_MAX_BATCH_SIZE"] = int(env.get("API_MAX_BATCH_SIZE", "1000"))
+    # Rendered user list cache: "lru" (per worker), "redis" (shared) or "none"
+    config["USERS_CACHE_BACKEND"] = env.get("USERS_CACHE_BACKEND", "lru")
+    config["USERS_CACHE_TTL"] = int(env.get("USERS_CACHE_TTL", "300"))
+    config["USERS_CACHE_MAX_ENTRIES"] = int(env.get("USERS_CACHE_MAX_ENTRIES", "256"))
+    config["USERS_CACHE_REDIS_URL"] = env.get("USERS_CACHE_REDIS_URL", "redis://localhost:6379/0")
+    # gzip/brotli compression of HTML and JSON responses (see app/compression.py)
+    config["COMPRESS_RESPONSES"] = env.get("COMPRESS_RESPONSES", "1") == "1"
+    config["COMPRESS_MIN_SIZE"] = int(env.get("COMPRESS_MIN_SIZE", "500"))
+    config["COMPRESS_LEVEL"] = int(env.get("COMPRESS_LEVEL", "6"))
+    config["COMPRESS_BROTLI_QUALITY"] = int(env.get("COMPRESS_BROTLI_QUALITY", "4"))
+    # Per-request timing breakdown in a Server-Timing response header
+    config["SERVER_TIMING"] = env.get("SERVER_TIMING", "1") == "1"
+    # Development SQL profiler: slow query log with EXPLAIN and N+1 warnings
+    config["SQL_PROFILER"] = env.get("SQL_PROFILER", "0") == "1"
+    config["SQL_SLOW_QUERY_MS"] = int(env.get("SQL_SLOW_QUERY_MS", "100"))
+    config["SQL_EXPLAIN"] = env.get("SQL_EXPLAIN", "1") == "1"
+    config["SQL_N_PLUS_ONE_THRESHOLD"] = int(env.get("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+    return config
@@ -0,0 +1,155 @@
+"""Engine configuration and connection pool instrumentation.
+
+Pool sizing has to be planned against PostgreSQL's ``max_connections``:
+every gunicorn worker owns one pool, so the worst case is
+``workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)`` connections per host. The
+defaults (5 + 5 with 3 workers) stay well under the 100 allowed by
+``postgresql.conf.j2``.
+"""
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+def _flag(value):
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+def pgbouncer_mode(env):
+    return _flag(env.get("DB_PGBOUNCER", "0"))
+
+
+class PoolStats:
+    """Checkout wait times of one pool, shared by all its threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_total, 6),
+                "wait_seconds_max": round(self.wait_max, 6),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that measures how long each checkout waited."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep the running totals
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def engine_options(env):
+    """Build ``SQLALCHEMY_ENGINE_OPTIONS`` for PostgreSQL from ``env``.
+
+    With ``DB_PGBOUNCER`` set, PgBouncer in transaction pooling mode does
+    the pooling, so the app opens a connection per transaction, skips the
+    pre-ping round trip and passes no startup ``options`` (PgBouncer rejects
+    them). psycopg2 never uses server-side prepared statements, which
+    transaction pooling cannot support, so nothing else has to change.
+    """
+    connect_args = {
+        "connect_timeout": int(env.get("DB_CONNECT_TIMEOUT", "5")),
+        "application_name": env.get("DB_APPLICATION_NAME", "user-manager"),
+    }
+    if pgbouncer_mode(env):
+        return {"poolclass": NullPool, "connect_args": connect_args}
+
+    statement_timeout = int(env.get("DB_STATEMENT_TIMEOUT_MS", "5000"))
+    if statement_timeout:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": int(env.get("DB_POOL_SIZE", "5")),
+        "max_overflow": int(env.get("DB_MAX_OVERFLOW", "5")),
+        "pool_timeout": float(env.get("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(env.get("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _flag(env.get("DB_POOL_PRE_PING", "1")),
+        "connect_args": connect_args,
+    }
+
+
+def install_statement_timeout(engine, timeout_ms):
+    """Apply ``statement_timeout`` to every transaction with SET LOCAL.
+
+    Used in PgBouncer mode, where a session-level setting would leak to
+    whichever client gets the server connection next.
+    """
+    if not timeout_ms or engine.dialect.name != "postgresql":
+        return
+
+    @event.listens_for(engine, "begin")
+    def _set_statement_timeout(connection):
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+def pool_status(engine):
+    """Occupancy and wait statistics of ``engine``'s pool."""
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.as_dict())
+    return status
+
+
+def dispose_engines(app):
+    """Drop pooled connections inherited from a parent process.
+
+    Call in a forked worker (gunicorn ``post_fork`` with ``preload_app``)
+    before it touches the database. ``close=False`` leaves the sockets to
+    the parent instead of closing them under its feet.
+    """
+    from app.models import db
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    router = app.extensions.get("db_router")
+    if router is not None:
+        engines.extend(router.engines.values())
+    for engine in engines:
+        engine.dispose(close=False)
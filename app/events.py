@@ -0,0 +1,259 @@
+"""Live user list updates as Server-Sent Events at ``/events``.
+
+The events are the change feed of :mod:`app.changes`: ``upsert`` with
+the user's fields and ``delete`` with its id, each with the feed cursor
+as its event id, so a browser that reconnects with ``Last-Event-ID``
+picks up exactly where it stopped. A ``reset`` event means the database
+was recreated and the page has to be reloaded.
+
+Each worker process runs one :class:`ChangeHub` thread that reads new
+changes once for all of its open streams and keeps the latest
+``SSE_BUFFER_SIZE`` of them in memory. It waits for writes with
+PostgreSQL ``LISTEN`` on :data:`~app.models.CHANGES_CHANNEL`, which a
+trigger notifies on every commit, whichever worker or process wrote.
+On SQLite, and behind PgBouncer in transaction mode where ``LISTEN``
+does not work, it polls the users table version every
+``SSE_POLL_INTERVAL`` seconds instead. An idle stream holds no database
+connection; only a stream that fell behind the buffer reads the feed
+itself to catch up.
+
+Every open stream occupies a request for as long as it lasts, so serve
+it with gevent workers (``GUNICORN_WORKER_CLASS=gevent``); a sync worker
+would be blocked by a single browser tab. ``SSE_ENABLED`` is therefore
+off by default unless the worker class is gevent or gthread, and the
+list pages then do not open a stream at all. Streams end after
+``SSE_MAX_STREAM_SECONDS``, below gunicorn's worker timeout, and the
+browser reconnects on its own, which spreads them over the workers again.
+"""
+import json
+import logging
+import os
+import select
+import threading
+import time
+
+from flask import Blueprint, Response, abort, current_app, request, stream_with_context
+
+from app.changes import CURSOR_TYPES, FeedReset, changes_since, head_cursor
+from app.models import CHANGES_CHANNEL, db, get_table_version
+from app.pagination import decode_cursor
+
+logger = logging.getLogger(__name__)
+
+events = Blueprint('events', __name__)
+
+# Milliseconds the browser waits before reconnecting
+RECONNECT_MS = 2000
+
+
+class ChangeHub:
+    """Reads the change feed once per worker and hands it to every stream."""
+
+    def __init__(self, app, poll_interval, buffer_size, fetch_size):
+        self.app = app
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.fetch_size = fetch_size
+        self._condition = threading.Condition()
+        self._pid = None
+        self._reset()
+
+    def _reset(self, head=None):
+        # (position, cursor, change) after the position _start, in feed order
+        self._buffer = []
+        self._start = _position(head)
+        self._head = head
+
+    def wait(self, cursor, timeout):
+        """Changes after ``cursor``, waiting up to ``timeout`` for the first.
+
+        Returns a list of ``(cursor, change)``, empty after a timeout, or
+        None when the buffer does not reach back to ``cursor``.
+        """
+        self._ensure_thread()
+        try:
+            position = _position(cursor)
+        except (TypeError, ValueError):
+            return None
+        with self._condition:
+            if not self._after(position):
+                self._condition.wait(timeout)
+            if not self._after(position):
+                return []
+            if self._start is None or position[0] != self._start[0] or position < self._start:
+                return None
+            return [(entry_cursor, change) for entry_position, entry_cursor, change in self._buffer
+                    if entry_position > position]
+
+    def _after(self, position):
+        """Whether the hub knows of changes after ``position``."""
+        head = _position(self._head)
+        return head is not None and (head[0] != position[0] or head > position)
+
+    def head(self):
+        self._ensure_thread()
+        with self._condition:
+            return self._head
+
+    def _ensure_thread(self):
+        # Threads do not survive gunicorn's fork: one per worker process
+        if self._pid == os.getpid():
+            return
+        with self._condition:
+            if self._pid != os.getpid():
+                self._reset()
+                threading.Thread(target=self._run, name="change-hub", daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    self._follow()
+                except Exception:
+                    logger.exception("Change hub lost the database, retrying")
+                    time.sleep(self.poll_interval)
+                finally:
+                    db.session.remove()
+
+    def _follow(self):
+        with self._condition:
+            head = self._head
+        if head is None:
+            head = head_cursor(db.session)
+            db.session.close()
+            self._publish([], head)
+        engine = db.engine
+        if engine.dialect.name == "postgresql" and not self.app.config["DB_PGBOUNCER"]:
+            self._listen(engine)
+        else:
+            self._poll()
+
+    def _poll(self):
+        version = None
+        while True:
+            state = get_table_version(db.session).token
+            db.session.close()
+            if state != version:
+                version = state
+                self._fetch()
+            time.sleep(self.poll_interval)
+
+    def _listen(self, engine):
+        # A connection of its own, kept out of the pool for good
+        connection = engine.raw_connection()
+        connection.detach()
+        driver = connection.driver_connection
+        try:
+            driver.autocommit = True
+            with driver.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANGES_CHANNEL}")
+            # Writes committed before LISTEN took effect
+            self._fetch()
+            while True:
+                # The timeout doubles as a safety net for a lost notification
+                if select.select([driver], [], [], self.poll_interval * 30) != ([], [], []):
+                    driver.poll()
+                    driver.notifies.clear()
+                self._fetch()
+        finally:
+            connection.close()
+
+    def _fetch(self):
+        with self._condition:
+            cursor = self._head
+        try:
+            while True:
+                page = changes_since(db.session, cursor, self.fetch_size)
+                if page.changes:
+                    self._publish(list(zip(page.cursors, page.changes)), page.next_cursor)
+                cursor = page.next_cursor
+                if not page.has_more:
+                    break
+        except FeedReset:
+            head = head_cursor(db.session)
+            with self._condition:
+                self._reset(head)
+                self._condition.notify_all()
+        finally:
+            db.session.close()
+
+    def _publish(self, entries, head):
+        with self._condition:
+            if self._start is None:
+                self._start = _position(head)
+            self._buffer.extend((_position(cursor), cursor, change) for cursor, change in entries)
+            overflow = len(self._buffer) - self.buffer_size
+            if overflow > 0:
+                self._start = self._buffer[overflow - 1][0]
+                del self._buffer[:overflow]
+            self._head = head
+            self._condition.notify_all()
+
+
+def _position(cursor):
+    """``(epoch, change_seq, kind, id)`` of a feed cursor, comparable in feed order."""
+    return tuple(decode_cursor(cursor, CURSOR_TYPES)) if cursor is not None else None
+
+
+def _event(name, data, id=None):
+    lines = [f"event: {name}"]
+    if id is not None:
+        lines.append(f"id: {id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _stream(hub, cursor, config):
+    deadline = time.monotonic() + config["SSE_MAX_STREAM_SECONDS"]
+    yield f"retry: {RECONNECT_MS}\n\n"
+    while time.monotonic() < deadline:
+        entries = hub.wait(cursor, min(config["SSE_KEEPALIVE_SECONDS"], deadline - time.monotonic()))
+        if entries is None:
+            # Fell behind the hub's buffer (or reconnected after a long
+            # while): catch up from the database
+            try:
+                page = changes_since(db.session, cursor, config["SSE_FETCH_SIZE"])
+            except (FeedReset, TypeError, ValueError):
+                yield _event("reset", {})
+                return
+            finally:
+                db.session.close()
+            entries = list(zip(page.cursors, page.changes))
+            if not entries:
+                # The hub has yet to see a reset the database already had
+                time.sleep(hub.poll_interval)
+        if not entries:
+            # Comment line: keeps proxies from closing an idle stream
+            yield ": keepalive\n\n"
+        for cursor, change in entries:
+            yield _event(change["op"], change, id=cursor)
+
+
+@events.get('/events')
+def user_events():
+    """Server-Sent Events for every write to the users table."""
+    if not current_app.config["SSE_ENABLED"]:
+        abort(404)
+    hub = current_app.extensions["change_hub"]
+    cursor = request.headers.get("Last-Event-ID") or request.args.get("since")
+    if not cursor:
+        cursor = hub.head() or head_cursor(db.session)
+        db.session.close()
+    response = Response(
+        stream_with_context(_stream(hub, cursor, current_app.config)), mimetype="text/event-stream"
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    # nginx would otherwise buffer the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def install_change_hub(app):
+    app.extensions["change_hub"] = ChangeHub(
+        app,
+        app.config["SSE_POLL_INTERVAL"],
+        app.config["SSE_BUFFER_SIZE"],
+        app.config["SSE_FETCH_SIZE"],
+    )
+    app.register_blueprint(events)
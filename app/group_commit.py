@@ -0,0 +1,118 @@
+"""Group commit for single-user creates.
+
+Every ``/add`` normally pays for its own transaction, and every commit
+waits for PostgreSQL to flush its WAL record to disk; during a signup
+burst those flushes queue up behind each other. With
+``USERS_GROUP_COMMIT_MS`` set, each worker process hands its creates to a
+background thread instead. The thread collects whatever arrives within
+the window (up to ``USERS_GROUP_COMMIT_MAX_BATCH`` users), inserts them
+with one multi-row INSERT (COPY on PostgreSQL) and commits once, so a
+burst of N signups costs one flush instead of N.
+
+Each request still gets its own outcome: a duplicate email or an
+oversized value only fails that user, through the same row-by-row retry
+the bulk import uses (:func:`app.transfer.insert_batch`).
+
+The window only fills up when a worker has several requests in flight,
+that is with gevent or threaded workers; a sync worker serves one request
+at a time and just waits out the window. ``benchmarks/bench_group_commit.py``
+measures the effect of the window on insert throughput.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy.exc import OperationalError
+
+from app.models import GENERIC_ERROR, db
+from app.transfer import ImportReport, insert_batch
+
+logger = logging.getLogger(__name__)
+
+# Tries of a batch that hits a transient database error
+FLUSH_ATTEMPTS = 3
+
+
+class GroupCommitter:
+    """Collects the creates of one worker process and commits them together."""
+
+    def __init__(self, app, window_ms, max_batch):
+        self.app = app
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def create(self, values):
+        """Insert one user; returns None or the error message for this user."""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((values, future))
+        return future.result()
+
+    def _ensure_thread(self):
+        # The app may be built before gunicorn forks, and a thread does not
+        # survive a fork: start one in each worker process
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, name="group-commit", daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        pending = self._queue
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.flush(batch)
+
+    def flush(self, batch):
+        """Insert ``batch`` of ``(values, future)`` in one transaction."""
+        rows = list(enumerate(values for values, _ in batch))
+        with self.app.app_context():
+            try:
+                for attempt in range(1, FLUSH_ATTEMPTS + 1):
+                    report = ImportReport()
+                    try:
+                        # Signups rarely collide: skip the lookup of
+                        # existing emails that bulk imports start with
+                        insert_batch(db.session, rows, report, lookup=False)
+                        db.session.commit()
+                        break
+                    except OperationalError:
+                        # Deadlock, lock timeout or lost connection: a
+                        # transient error should not fail a whole batch
+                        db.session.rollback()
+                        if attempt == FLUSH_ATTEMPTS:
+                            raise
+            except Exception:
+                db.session.rollback()
+                logger.exception("Group commit of %s users failed", len(batch))
+                for _, future in batch:
+                    future.set_result(GENERIC_ERROR)
+                return
+            finally:
+                db.session.remove()
+        errors = dict(report.errors)
+        for index, (_, future) in enumerate(batch):
+            future.set_result(errors.get(index))
+
+
+def install_group_commit(app):
+    app.extensions["group_commit"] = GroupCommitter(
+        app, app.config["USERS_GROUP_COMMIT_MS"], app.config["USERS_GROUP_COMMIT_MAX_BATCH"]
+    )
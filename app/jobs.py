@@ -0,0 +1,414 @@
+"""Background jobs for bulk operations on users.
+
+Requests that would touch many rows (role changes or deletes by filter,
+large imports) enqueue a :class:`~app.models.Job` row and return its id
+at once. ``flask worker`` runs a pool of processes that claim queued jobs
+from the same database, so there is no broker to operate:
+
+* a job is claimed with a single UPDATE, using ``FOR UPDATE SKIP LOCKED``
+  on PostgreSQL so that workers never wait on each other's jobs, and
+  leased to its worker for ``JOBS_LEASE_SECONDS``;
+* handlers work in chunks of ``JOBS_CHUNK_SIZE`` rows. Every chunk
+  commits in one transaction with the job's progress and checkpoint and
+  renews the lease, so a job resumes after the last committed chunk when
+  its worker dies and the lease runs out;
+* a job is retried that way, or after a database error, up to
+  ``JOBS_MAX_ATTEMPTS`` times; any other exception from a handler fails
+  it for good, since running it again would fail the same way.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from datetime import timedelta
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.exc import OperationalError
+
+from app.bulk import count_matches, iter_delete, iter_set_role, validate_filters, validate_role
+from app.models import Job, utcnow
+from app.transfer import (
+    FORMATS,
+    ImportReport,
+    insert_batch,
+    iter_import_batches,
+    read_records,
+)
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+# Rejected import lines kept in a job's checkpoint and result
+MAX_REPORTED_ERRORS = 100
+
+_handlers = {}
+
+
+class JobInterrupted(Exception):
+    """The job has to stop before its next chunk."""
+
+
+class LeaseLost(JobInterrupted):
+    """Another worker took the job over after our lease expired."""
+
+
+class JobCancelled(JobInterrupted):
+    """The job was cancelled while it ran."""
+
+
+class WorkerStopping(JobInterrupted):
+    """The worker was asked to shut down."""
+
+
+def job_kind(name, validate):
+    """Register a handler for jobs of kind ``name``.
+
+    ``validate(params)`` returns an error message or None; the handler is
+    called as ``handler(context, params, state)`` and returns the result.
+    """
+    def register(handler):
+        _handlers[name] = (handler, validate)
+        return handler
+    return register
+
+
+def job_kinds():
+    return sorted(_handlers)
+
+
+def job_to_dict(job):
+    def timestamp(value):
+        return value.isoformat() if value is not None else None
+
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": job.params,
+        "progress": {"done": job.done, "total": job.total},
+        "result": job.result,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": timestamp(job.created_at),
+        "started_at": timestamp(job.started_at),
+        "finished_at": timestamp(job.finished_at),
+    }
+
+
+def enqueue(session, kind, params, payload=None):
+    """Validate ``params`` and add a queued job; raises ``ValueError``."""
+    if kind not in _handlers:
+        raise ValueError(f"Error: Unknown job kind '{kind}'.")
+    if not isinstance(params, dict):
+        raise ValueError("Error: Job params must be an object.")
+    error = _handlers[kind][1](params)
+    if error:
+        raise ValueError(error)
+    job = Job(kind=kind, params=params, payload=payload)
+    session.add(job)
+    session.flush()
+    return job
+
+
+def enqueue_if_large(session, kind, params, limit):
+    """Queue a ``set_role`` or ``delete_users`` job when it would write more than ``limit`` users.
+
+    Returns the job, or None when the change is small enough to make
+    within the request.
+    """
+    if count_matches(session, params["filters"], params.get("role")) <= limit:
+        return None
+    return enqueue(session, kind, params)
+
+
+def cancel(session, job):
+    """Cancel ``job`` unless it already finished; returns whether it did."""
+    cancelled = session.execute(
+        update(Job.__table__)
+        .where(Job.id == job.id, Job.status.in_(ACTIVE_STATUSES))
+        .values(status="cancelled", finished_at=utcnow(), lease_until=None, payload=None)
+    ).rowcount
+    session.commit()
+    session.refresh(job)
+    return bool(cancelled)
+
+
+# Claiming and running
+def claim_job(session, worker, lease_seconds):
+    """Lease the oldest queued (or abandoned) job to ``worker``, or return None."""
+    now = utcnow()
+    claimable = or_(
+        Job.status == "queued",
+        and_(Job.status == "running", Job.lease_until < now),
+    )
+    candidate = (
+        select(Job.id).where(claimable).order_by(Job.id).limit(1)
+        .with_for_update(skip_locked=True).scalar_subquery()
+    )
+    job_id = session.execute(
+        update(Job.__table__)
+        .where(Job.id == candidate, claimable)
+        .values(
+            status="running",
+            worker=worker,
+            lease_until=now + timedelta(seconds=lease_seconds),
+            attempts=Job.attempts + 1,
+            started_at=func.coalesce(Job.started_at, now),
+        )
+        .returning(Job.id)
+    ).scalar()
+    session.commit()
+    return session.get(Job, job_id) if job_id is not None else None
+
+
+class JobContext:
+    """What a handler needs to process its job chunk by chunk."""
+
+    def __init__(self, session, job, worker, lease_seconds, chunk_size, should_stop=lambda: False):
+        self.session = session
+        self.job = job
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.chunk_size = chunk_size
+        self.should_stop = should_stop
+        self.done = job.done
+        self._total = None
+
+    def set_total(self, total):
+        """Record the expected amount of work with the next checkpoint."""
+        self._total = total
+
+    def checkpoint(self, state, done):
+        """Commit the chunk just written with ``state`` and ``done`` more rows.
+
+        Raises :class:`JobInterrupted` (after rolling the chunk back if
+        the job is no longer ours) when the handler has to stop.
+        """
+        values = {
+            "state": state,
+            "done": Job.done + done,
+            "lease_until": utcnow() + timedelta(seconds=self.lease_seconds),
+        }
+        if self._total is not None:
+            values["total"] = self._total
+        owned = self.session.execute(
+            update(Job.__table__)
+            .where(Job.id == self.job.id, Job.worker == self.worker, Job.status == "running")
+            .values(**values)
+        ).rowcount
+        if not owned:
+            self.session.rollback()
+            status = self.session.scalar(select(Job.status).where(Job.id == self.job.id))
+            raise JobCancelled() if status == "cancelled" else LeaseLost()
+        self.session.commit()
+        self.done += done
+        if self.should_stop():
+            raise WorkerStopping()
+
+
+def _finish(session, job, worker, **values):
+    session.execute(
+        update(Job.__table__)
+        .where(Job.id == job.id, Job.worker == worker, Job.status == "running")
+        .values(finished_at=utcnow(), lease_until=None, payload=None, **values)
+    )
+    session.commit()
+
+
+def run_job(session, job, worker, config, should_stop=lambda: False):
+    """Run (or resume) a claimed ``job`` to completion or interruption."""
+    if job.attempts > config["JOBS_MAX_ATTEMPTS"]:
+        _finish(session, job, worker, status="failed", error=f"Gave up after {job.attempts - 1} attempts.")
+        return
+    handler = _handlers.get(job.kind, (None, None))[0]
+    if handler is None:
+        _finish(session, job, worker, status="failed", error=f"Unknown job kind '{job.kind}'.")
+        return
+
+    context = JobContext(
+        session, job, worker, config["JOBS_LEASE_SECONDS"], config["JOBS_CHUNK_SIZE"], should_stop
+    )
+    logger.info("Job %s (%s) started by %s, attempt %s", job.id, job.kind, worker, job.attempts)
+    try:
+        result = handler(context, job.params, job.state)
+    except WorkerStopping:
+        # Hand the job back right away; a shutdown is not a failed attempt
+        session.execute(
+            update(Job.__table__)
+            .where(Job.id == job.id, Job.worker == worker, Job.status == "running")
+            .values(status="queued", worker=None, lease_until=None, attempts=Job.attempts - 1)
+        )
+        session.commit()
+        logger.info("Job %s handed back at %s rows", job.id, context.done)
+    except JobInterrupted as exc:
+        logger.info("Job %s stopped: %s", job.id, type(exc).__name__)
+    except OperationalError:
+        # Lost connection, lock timeout and the like: the job itself is
+        # fine, so it goes back to the queue as a used attempt
+        session.rollback()
+        logger.exception("Job %s interrupted by a database error", job.id)
+        session.execute(
+            update(Job.__table__)
+            .where(Job.id == job.id, Job.worker == worker, Job.status == "running")
+            .values(status="queued", worker=None, lease_until=None)
+        )
+        session.commit()
+    except Exception as exc:
+        session.rollback()
+        logger.exception("Job %s failed", job.id)
+        _finish(session, job, worker, status="failed", error=str(exc) or type(exc).__name__)
+    else:
+        _finish(session, job, worker, status="succeeded", result=result)
+        logger.info("Job %s finished: %s", job.id, result)
+
+
+# Job kinds
+def _validate_set_role(params):
+    return validate_role(params.get("role")) or validate_filters(params.get("filters", {}), required=False)
+
+
+def _validate_delete(params):
+    return validate_filters(params.get("filters", {}))
+
+
+def _validate_import(params):
+    if params.get("format") not in FORMATS:
+        return f"Error: format must be one of {', '.join(FORMATS)}."
+    return None
+
+
+@job_kind("set_role", validate=_validate_set_role)
+def set_role(context, params, state):
+    """Give every user matching ``params["filters"]`` the role ``params["role"]``."""
+    role, filters = params["role"].strip(), params.get("filters", {})
+    if context.job.total is None:
+        context.set_total(count_matches(context.session, filters, role))
+    # Chunks of app.bulk: users written so far no longer match, so there
+    # is no position to checkpoint and a resumed job simply carries on
+    for count in iter_set_role(context.session, role, context.chunk_size, filters=filters):
+        context.checkpoint(None, count)
+    return {"updated": context.done}
+
+
+@job_kind("delete_users", validate=_validate_delete)
+def delete_users(context, params, state):
+    """Delete every user matching ``params["filters"]``."""
+    if context.job.total is None:
+        context.set_total(count_matches(context.session, params["filters"]))
+    for count in iter_delete(context.session, context.chunk_size, filters=params["filters"]):
+        context.checkpoint(None, count)
+    return {"deleted": context.done}
+
+
+@job_kind("import_users", validate=_validate_import)
+def import_users_job(context, params, state):
+    """Import the uploaded file in the job's payload, one batch per chunk."""
+    state = state or {"line": 0, "inserted": 0, "rejected": 0, "errors": []}
+
+    def records():
+        stream = io.StringIO(context.job.payload or "", newline="")
+        return read_records(stream, params["format"])
+
+    if state["line"] == 0:
+        context.set_total(sum(1 for _ in records()))
+
+    report = ImportReport(inserted=state["inserted"])
+    rejected, errors = state["rejected"], state["errors"]
+
+    def checkpoint(line, done):
+        nonlocal rejected, errors
+        rejected += len(report.errors)
+        errors = (errors + [list(error) for error in report.errors])[:MAX_REPORTED_ERRORS]
+        report.errors = []
+        context.checkpoint(
+            {"line": line, "inserted": report.inserted, "rejected": rejected, "errors": errors}, done
+        )
+
+    remaining = ((line, record) for line, record in records() if line > state["line"])
+    for batch, last_line in iter_import_batches(remaining, context.chunk_size, report):
+        inserted = report.inserted
+        insert_batch(context.session, batch, report)
+        # Every record read since the last checkpoint was either inserted
+        # or rejected
+        checkpoint(last_line, report.inserted - inserted + len(report.errors))
+    # Invalid records after the last batch count as done as well
+    if report.errors:
+        checkpoint(report.errors[-1][0], len(report.errors))
+    return {"inserted": report.inserted, "rejected": rejected, "errors": sorted(errors)}
+
+
+# Worker processes
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def work(app, poll_interval=None, once=False, should_stop=lambda: False):
+    """Claim and run jobs until ``should_stop()``; with ``once``, until none is left."""
+    from app.models import db
+
+    config = app.config
+    poll_interval = config["JOBS_POLL_INTERVAL"] if poll_interval is None else poll_interval
+    worker = worker_name()
+    with app.app_context():
+        while not should_stop():
+            try:
+                job = claim_job(db.session, worker, config["JOBS_LEASE_SECONDS"])
+                if job is not None:
+                    run_job(db.session, job, worker, config, should_stop)
+            except OperationalError:
+                # The database is unreachable or busy; an abandoned job is
+                # picked up again once its lease expires
+                logger.exception("Job worker %s lost the database", worker)
+                job = None
+            finally:
+                db.session.remove()
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll_interval)
+
+
+def _worker_process(app, poll_interval, stop):
+    from app.database import dispose_engines
+
+    # The pool's connections were opened by the parent
+    dispose_engines(app)
+    terminated = []
+    # Ctrl-C reaches the whole process group; the parent relays it as ``stop``
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: terminated.append(signum))
+    work(app, poll_interval, should_stop=lambda: bool(terminated) or stop.is_set())
+
+
+def run_worker(app, processes=1, poll_interval=None):
+    """Run ``processes`` worker processes until SIGINT or SIGTERM.
+
+    A worker that dies is replaced. On shutdown every worker finishes its
+    current chunk and hands its job back to the queue.
+    """
+    context = multiprocessing.get_context("fork")
+    stop = context.Event()
+
+    def start():
+        process = context.Process(target=_worker_process, args=(app, poll_interval, stop), daemon=True)
+        process.start()
+        return process
+
+    # Setting the event from the handler could deadlock with stop.wait()
+    signals = []
+    signal.signal(signal.SIGINT, lambda signum, frame: signals.append(signum))
+    signal.signal(signal.SIGTERM, lambda signum, frame: signals.append(signum))
+    pool = [start() for _ in range(processes)]
+    logger.info("Started %s job workers", processes)
+    while not signals:
+        for index, process in enumerate(pool):
+            if not process.is_alive():
+                logger.warning("Job worker %s exited with %s, restarting", process.pid, process.exitcode)
+                pool[index] = start()
+        time.sleep(1)
+    stop.set()
+    for process in pool:
+        process.join()
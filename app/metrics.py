@@ -0,0 +1,181 @@
+"""Per-request timing, Prometheus metrics and the Server-Timing header.
+
+Every request records its total time, the SQL statements it ran and how
+long they took, and the time spent rendering templates. The totals are
+exported at ``/metrics`` and, unless ``SERVER_TIMING`` is off, sent back
+in a ``Server-Timing`` header so they show up in the browser's devtools.
+
+Under gunicorn each worker keeps its own counters. With
+``PROMETHEUS_MULTIPROC_DIR`` set they are written to files in that
+directory instead and ``/metrics`` on any worker reports the sum over all
+of them; ``gunicorn.conf.py`` empties the directory on start and drops
+the files of dead workers.
+"""
+import os
+import time
+
+from flask import (
+    Blueprint,
+    before_render_template,
+    current_app,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.database import pool_status
+from app.models import db
+
+metrics = Blueprint('metrics', __name__)
+
+REQUESTS = Counter(
+    "http_requests", "Requests served.", ["method", "endpoint", "status"]
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to serve a request.", ["method", "endpoint"]
+)
+SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements",
+    "SQL statements run by one request.",
+    ["endpoint"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500),
+)
+SQL_DURATION = Histogram(
+    "http_request_sql_duration_seconds", "Time one request spent in SQL.", ["endpoint"]
+)
+TEMPLATE_DURATION = Histogram(
+    "http_request_template_duration_seconds",
+    "Time one request spent rendering templates.",
+    ["endpoint"],
+)
+
+# Pool figures are per worker; "livesum" adds up the workers still running
+POOL_GAUGES = {
+    name: Gauge(f"db_pool_{name}", description, multiprocess_mode="livesum")
+    for name, description in (
+        ("size", "Connections kept open by the pools."),
+        ("checked_out", "Connections in use."),
+        ("overflow", "Connections open beyond the pool size."),
+        ("checkouts", "Connections handed out since the workers started."),
+        ("timeouts", "Checkouts that gave up waiting since the workers started."),
+        ("wait_seconds_total", "Time spent waiting for a connection since the workers started."),
+    )
+}
+
+
+class RequestTiming:
+    """What one request spent its time on, in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self._template_started = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ", ".join((
+            f'db;dur={self.sql_seconds * 1000:.1f};desc="{self.sql_statements} queries"',
+            f"tpl;dur={self.template_seconds * 1000:.1f}",
+            f"total;dur={self.elapsed() * 1000:.1f}",
+        ))
+
+
+def current_timing():
+    """The :class:`RequestTiming` of the active request, if any."""
+    return g.get('request_timing') if has_request_context() else None
+
+
+# SQL and template timing hooks; they only count while a request is active
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    timing = current_timing()
+    if timing is not None:
+        timing.sql_statements += 1
+        timing.sql_seconds += elapsed
+
+
+@before_render_template.connect
+def _before_render(sender, **extra):
+    timing = current_timing()
+    if timing is not None:
+        timing._template_started = time.perf_counter()
+
+
+@template_rendered.connect
+def _after_render(sender, **extra):
+    timing = current_timing()
+    if timing is not None and timing._template_started is not None:
+        timing.template_seconds += time.perf_counter() - timing._template_started
+        timing._template_started = None
+
+
+@metrics.before_app_request
+def _start_timing():
+    g.request_timing = RequestTiming()
+
+
+@metrics.after_app_request
+def _add_server_timing(response):
+    timing = current_timing()
+    if timing is not None:
+        g.response_status = response.status_code
+        # Streamed bodies are produced after this point, so for those the
+        # header only covers the work done before the first byte
+        if current_app.config['SERVER_TIMING']:
+            response.headers['Server-Timing'] = timing.server_timing()
+    return response
+
+
+@metrics.teardown_app_request
+def _record_request(exc):
+    timing = current_timing()
+    if timing is None:
+        return
+    endpoint = request.endpoint or 'unmatched'
+    status = 500 if exc is not None else g.get('response_status', 500)
+    REQUESTS.labels(request.method, endpoint, status).inc()
+    REQUEST_DURATION.labels(request.method, endpoint).observe(timing.elapsed())
+    SQL_STATEMENTS.labels(endpoint).observe(timing.sql_statements)
+    SQL_DURATION.labels(endpoint).observe(timing.sql_seconds)
+    TEMPLATE_DURATION.labels(endpoint).observe(timing.template_seconds)
+    _record_pool()
+
+
+def _record_pool():
+    status = pool_status(db.engine)
+    for name, gauge in POOL_GAUGES.items():
+        if name in status:
+            gauge.set(status[name])
+
+
+@metrics.route('/metrics')
+def prometheus_metrics():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return current_app.response_class(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,444 @@
+import sqlite3
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event, func, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.routing import RoutingSession
+
+# Reads of GET requests may go to a replica (see app/routing.py)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+# pysqlite does not emit BEGIN before a SAVEPOINT, so releasing the first
+# savepoint of a transaction commits it. Let SQLAlchemy drive transactions
+# itself so nested transactions behave the same as on PostgreSQL. The
+# in_transaction check covers the single connection shared by every session
+# of an in-memory database.
+@event.listens_for(Engine, "connect")
+def _sqlite_disable_implicit_transactions(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.isolation_level = None
+
+@event.listens_for(Engine, "begin")
+def _sqlite_begin(connection):
+    if connection.dialect.name == "sqlite" and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN")
+
+# Messages shown for the database errors a user write can hit
+DATA_TOO_LONG_ERROR = "Error: Some data is too long for the database fields."
+DUPLICATE_EMAIL_ERROR = "Error: A user with that email already exists."
+GENERIC_ERROR = "Error: Something went wrong. Please try again."
+MISSING_FIELD_ERROR = "Error: Missing required field '{}'."
+CONFLICT_ERROR = "Error: Someone else changed this user. Review the current values and try again."
+
+def utcnow():
+    """Naive UTC timestamp, as stored by both SQLite and PostgreSQL here."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# Define model
+class User(db.Model):
+    __tablename__ = "users"
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    role = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+    # Bumped on every update; writes that carry a stale version are refused
+    version = db.Column(db.Integer, nullable=False, default=1)
+    # Position in the change feed, set by the triggers in CHANGE_TRACKING_DDL
+    change_seq = db.Column(db.BigInteger, nullable=False, server_default="0")
+
+    # Keyset pagination by name needs (name, id); email is already unique.
+    # Lookups by email are case-insensitive, so emails are unique that way
+    # too. Substring search uses trigram indexes on PostgreSQL and the
+    # users_fts table (below) on SQLite.
+    __table_args__ = (
+        db.Index("ix_users_name_id", "name", "id"),
+        db.Index("ix_users_role_id", "role", "id"),
+        db.Index("ix_users_created_at", "created_at"),
+        db.Index("ix_users_updated_at", "updated_at"),
+        db.Index("ix_users_change_seq_id", "change_seq", "id"),
+        db.Index("uq_users_email_lower", func.lower(email), unique=True),
+        db.Index(
+            "ix_users_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        db.Index(
+            "ix_users_email_trgm", "email",
+            postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+# Search support outside of what the model can declare
+POSTGRES_EXTENSIONS = ("pg_trgm",)
+
+# FTS5 trigram index over name and email, kept in sync by triggers
+SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "name, email, content='users', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts (rowid, name, email) VALUES (new.id, new.name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts (users_fts, rowid, name, email) "
+    "VALUES ('delete', old.id, old.name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF name, email ON users BEGIN "
+    "INSERT INTO users_fts (users_fts, rowid, name, email) "
+    "VALUES ('delete', old.id, old.name, old.email); "
+    "INSERT INTO users_fts (rowid, name, email) VALUES (new.id, new.name, new.email); END",
+)
+
+def install_search_extensions(connection):
+    """Create the PostgreSQL extensions the search indexes need."""
+    if connection.dialect.name == "postgresql":
+        for name in POSTGRES_EXTENSIONS:
+            connection.exec_driver_sql(f"CREATE EXTENSION IF NOT EXISTS {name}")
+
+def install_sqlite_fts(connection):
+    """Create the SQLite search index and fill it from existing rows."""
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in SQLITE_FTS_DDL:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+@event.listens_for(db.metadata, "before_create")
+def _before_create(target, connection, **kw):
+    install_search_extensions(connection)
+
+@event.listens_for(User.__table__, "after_create")
+def _after_create_users(target, connection, **kw):
+    install_sqlite_fts(connection)
+
+event.listen(
+    User.__table__, "before_drop", DDL("DROP TABLE IF EXISTS users_fts").execute_if(dialect="sqlite")
+)
+
+class TableVersion(db.Model):
+    """Change counter per table, bumped in the same transaction as writes.
+
+    Caches key their entries by ``(epoch, version)``. The epoch is random
+    per table creation, so a recreated or restored database never reuses
+    the versions of the old one.
+    """
+    __tablename__ = "table_versions"
+    name = db.Column(db.String(50), primary_key=True)
+    epoch = db.Column(db.String(32), nullable=False)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    # Tombstones up to this change_seq are gone, so the change feed can no
+    # longer serve cursors from before it (see app.changes.prune_tombstones)
+    pruned_seq = db.Column(db.BigInteger, nullable=False, default=0)
+
+TableState = namedtuple("TableState", ["token", "updated_at", "epoch", "version"], defaults=("", -1))
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def _seed_table_versions(target, connection, **kw):
+    connection.execute(
+        insert(target).values(
+            name=User.__tablename__, epoch=uuid.uuid4().hex, version=0, updated_at=utcnow()
+        )
+    )
+
+def bump_table_version(session, name=User.__tablename__):
+    """Record a change to ``name`` in the current transaction.
+
+    ORM flushes of ``User`` call this automatically; code that writes with
+    bulk INSERT/UPDATE/DELETE statements must call it itself.
+    """
+    bumped = session.connection().execute(
+        update(TableVersion.__table__)
+        .where(TableVersion.name == name)
+        .values(version=TableVersion.version + 1, updated_at=utcnow())
+    ).rowcount
+    if not bumped:
+        session.connection().execute(
+            insert(TableVersion.__table__).values(
+                name=name, epoch=uuid.uuid4().hex, version=1, updated_at=utcnow()
+            )
+        )
+
+def get_table_version(session, name=User.__tablename__):
+    """Return the :class:`TableState` of ``name``.
+
+    ``token`` is opaque and changes whenever the table is written;
+    ``updated_at`` is the time of the last write. ``epoch`` and
+    ``version`` are its parts, for the change feed.
+    """
+    row = session.execute(
+        select(TableVersion.epoch, TableVersion.version, TableVersion.updated_at)
+        .where(TableVersion.name == name)
+    ).first()
+    if row is None:
+        return TableState("0", None)
+    return TableState(f"{row.epoch}-{row.version}", row.updated_at, row.epoch, row.version)
+
+class UserTombstone(db.Model):
+    """A deleted user, kept so the change feed can report the delete."""
+    __tablename__ = "user_tombstones"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.BigInteger, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    __table_args__ = (db.Index("ix_user_tombstones_change_seq_user_id", "change_seq", "user_id"),)
+
+# PostgreSQL NOTIFY channel signalled by every committed write to users
+CHANGES_CHANNEL = "users_changed"
+
+# Every write to users stamps the rows it touches with the current users
+# table version, and every delete leaves a tombstone, whatever the write
+# path (ORM, bulk statements or COPY). Writers are serialized on the
+# table_versions row, so change_seq never goes backwards in commit order
+# and a feed reader can resume after the last (change_seq, id) it saw:
+# - PostgreSQL bumps the version before each statement, taking the row
+#   lock before any user row is written;
+# - SQLite has a single writer anyway and stamps rows with the version
+#   the transaction's bump_table_version call is about to replace.
+CHANGE_TRACKING_DDL = {
+    "postgresql": (
+        "CREATE OR REPLACE FUNCTION users_bump_version() RETURNS trigger AS $$ BEGIN "
+        "UPDATE table_versions SET version = version + 1, "
+        "updated_at = now() AT TIME ZONE 'utc' WHERE name = 'users'; "
+        "RETURN NULL; END $$ LANGUAGE plpgsql",
+        "CREATE OR REPLACE FUNCTION users_change_seq() RETURNS trigger AS $$ BEGIN "
+        "NEW.change_seq := COALESCE((SELECT version FROM table_versions WHERE name = 'users'), 0); "
+        "RETURN NEW; END $$ LANGUAGE plpgsql",
+        "CREATE OR REPLACE FUNCTION users_tombstone() RETURNS trigger AS $$ BEGIN "
+        "INSERT INTO user_tombstones (user_id, change_seq, deleted_at) VALUES (OLD.id, "
+        "COALESCE((SELECT version FROM table_versions WHERE name = 'users'), 0), "
+        "now() AT TIME ZONE 'utc'); RETURN OLD; END $$ LANGUAGE plpgsql",
+        "CREATE OR REPLACE TRIGGER users_bump_version BEFORE INSERT OR UPDATE OR DELETE ON users "
+        "FOR EACH STATEMENT EXECUTE FUNCTION users_bump_version()",
+        "CREATE OR REPLACE TRIGGER users_change_seq BEFORE INSERT OR UPDATE ON users "
+        "FOR EACH ROW EXECUTE FUNCTION users_change_seq()",
+        "CREATE OR REPLACE TRIGGER users_tombstone AFTER DELETE ON users "
+        "FOR EACH ROW EXECUTE FUNCTION users_tombstone()",
+        # Wakes the /events listeners; delivered on commit, once per transaction
+        f"CREATE OR REPLACE FUNCTION users_notify() RETURNS trigger AS $$ BEGIN "
+        f"PERFORM pg_notify('{CHANGES_CHANNEL}', ''); RETURN NULL; END $$ LANGUAGE plpgsql",
+        "CREATE OR REPLACE TRIGGER users_notify AFTER INSERT OR UPDATE OR DELETE ON users "
+        "FOR EACH STATEMENT EXECUTE FUNCTION users_notify()",
+    ),
+    "sqlite": (
+        "CREATE TRIGGER IF NOT EXISTS users_change_insert AFTER INSERT ON users BEGIN "
+        "UPDATE users SET change_seq = COALESCE("
+        "(SELECT version FROM table_versions WHERE name = 'users'), 0) WHERE id = new.id; END",
+        "CREATE TRIGGER IF NOT EXISTS users_change_update "
+        "AFTER UPDATE OF name, email, role, version, created_at, updated_at ON users BEGIN "
+        "UPDATE users SET change_seq = COALESCE("
+        "(SELECT version FROM table_versions WHERE name = 'users'), 0) WHERE id = new.id; END",
+        "CREATE TRIGGER IF NOT EXISTS users_tombstone AFTER DELETE ON users BEGIN "
+        "INSERT INTO user_tombstones (user_id, change_seq, deleted_at) VALUES (old.id, "
+        "COALESCE((SELECT version FROM table_versions WHERE name = 'users'), 0), "
+        "CURRENT_TIMESTAMP); END",
+    ),
+}
+
+def install_change_tracking(connection):
+    """Create the triggers behind the change feed (idempotent)."""
+    for statement in CHANGE_TRACKING_DDL.get(connection.dialect.name, ()):
+        connection.exec_driver_sql(statement)
+
+class UserRoleCount(db.Model):
+    """Number of users per role, kept current by USER_COUNTS_DDL."""
+    __tablename__ = "user_role_counts"
+    role = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+
+# Counters maintained in the writing transaction. PostgreSQL applies one
+# grouped delta per statement from the transition tables, so a COPY of a
+# million rows touches each role's counter once; SQLite has no statement
+# triggers and updates the counter per row. The counter rows cannot
+# deadlock: writers are already serialized on table_versions.
+_APPLY_ROLE_DELTAS = (
+    "INSERT INTO user_role_counts (role, count) SELECT role, sum(delta) FROM ({}) AS deltas "
+    "GROUP BY role HAVING sum(delta) <> 0 ON CONFLICT (role) DO UPDATE SET count = user_role_counts.count + EXCLUDED.count"
+)
+_SQLITE_ROLE_DELTA = (
+    "INSERT INTO user_role_counts (role, count) VALUES ({role}, {delta}) "
+    "ON CONFLICT (role) DO UPDATE SET count = count + {delta};"
+)
+USER_COUNTS_DDL = {
+    "postgresql": (
+        "CREATE OR REPLACE FUNCTION users_count_insert() RETURNS trigger AS $$ BEGIN "
+        + _APPLY_ROLE_DELTAS.format("SELECT role, 1 AS delta FROM inserted_rows")
+        + "; RETURN NULL; END $$ LANGUAGE plpgsql",
+        "CREATE OR REPLACE FUNCTION users_count_delete() RETURNS trigger AS $$ BEGIN "
+        + _APPLY_ROLE_DELTAS.format("SELECT role, -1 AS delta FROM deleted_rows")
+        + "; RETURN NULL; END $$ LANGUAGE plpgsql",
+        "CREATE OR REPLACE FUNCTION users_count_update() RETURNS trigger AS $$ BEGIN "
+        + _APPLY_ROLE_DELTAS.format(
+            "SELECT role, -1 AS delta FROM old_rows UNION ALL SELECT role, 1 FROM new_rows"
+        )
+        + "; RETURN NULL; END $$ LANGUAGE plpgsql",
+        "CREATE OR REPLACE TRIGGER users_count_insert AFTER INSERT ON users "
+        "REFERENCING NEW TABLE AS inserted_rows FOR EACH STATEMENT EXECUTE FUNCTION users_count_insert()",
+        "CREATE OR REPLACE TRIGGER users_count_delete AFTER DELETE ON users "
+        "REFERENCING OLD TABLE AS deleted_rows FOR EACH STATEMENT EXECUTE FUNCTION users_count_delete()",
+        "CREATE OR REPLACE TRIGGER users_count_update AFTER UPDATE ON users "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION users_count_update()",
+    ),
+    "sqlite": (
+        "CREATE TRIGGER IF NOT EXISTS users_count_insert AFTER INSERT ON users BEGIN "
+        + _SQLITE_ROLE_DELTA.format(role="new.role", delta=1) + " END",
+        "CREATE TRIGGER IF NOT EXISTS users_count_delete AFTER DELETE ON users BEGIN "
+        + _SQLITE_ROLE_DELTA.format(role="old.role", delta=-1) + " END",
+        "CREATE TRIGGER IF NOT EXISTS users_count_update AFTER UPDATE OF role ON users "
+        "WHEN old.role <> new.role BEGIN "
+        + _SQLITE_ROLE_DELTA.format(role="old.role", delta=-1) + " "
+        + _SQLITE_ROLE_DELTA.format(role="new.role", delta=1) + " END",
+    ),
+}
+
+def install_user_counts(connection):
+    """Create the counter triggers and recount the users (idempotent).
+
+    The recount scans the table once; it runs on ``flask db upgrade`` so
+    counters created on a populated table, or ones that drifted, start
+    out right.
+    """
+    for statement in USER_COUNTS_DDL.get(connection.dialect.name, ()):
+        connection.exec_driver_sql(statement)
+    if connection.dialect.name == "postgresql":
+        # Keep writers out until the counters match the rows again
+        connection.exec_driver_sql("LOCK TABLE users IN SHARE MODE")
+    counts = UserRoleCount.__table__
+    connection.execute(counts.delete())
+    connection.execute(counts.insert().from_select(
+        ["role", "count"], select(User.role, func.count()).group_by(User.role)
+    ))
+
+class ArchivedUser(db.Model):
+    """A deleted user, moved here by the trigger in USER_ARCHIVE_DDL.
+
+    Deleted users leave ``users`` for good instead of lingering there
+    behind a flag, so the active table, its indexes and every query on it
+    stay the size of the live set however much history piles up. ``id``
+    is the archive's own; ``user_id`` is the id the user had.
+    """
+    __tablename__ = "users_archive"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    role = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    __table_args__ = (
+        db.Index("ix_users_archive_deleted_at_id", "deleted_at", "id"),
+        db.Index("ix_users_archive_user_id", "user_id"),
+    )
+
+# Every delete from users copies the rows to users_archive in the same
+# transaction, whatever the write path; PostgreSQL does it with one
+# INSERT ... SELECT per statement from the transition table.
+_ARCHIVE_COLUMNS = "user_id, name, email, role, created_at, updated_at, deleted_at"
+USER_ARCHIVE_DDL = {
+    "postgresql": (
+        "CREATE OR REPLACE FUNCTION users_archive_delete() RETURNS trigger AS $$ BEGIN "
+        f"INSERT INTO users_archive ({_ARCHIVE_COLUMNS}) "
+        "SELECT id, name, email, role, created_at, updated_at, now() AT TIME ZONE 'utc' "
+        "FROM deleted_rows; RETURN NULL; END $$ LANGUAGE plpgsql",
+        "CREATE OR REPLACE TRIGGER users_archive_delete AFTER DELETE ON users "
+        "REFERENCING OLD TABLE AS deleted_rows FOR EACH STATEMENT EXECUTE FUNCTION users_archive_delete()",
+    ),
+    "sqlite": (
+        "CREATE TRIGGER IF NOT EXISTS users_archive_delete AFTER DELETE ON users BEGIN "
+        f"INSERT INTO users_archive ({_ARCHIVE_COLUMNS}) VALUES (old.id, old.name, old.email, "
+        "old.role, old.created_at, old.updated_at, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+    ),
+}
+
+def install_user_archive(connection):
+    """Create the trigger that archives deleted users (idempotent)."""
+    for statement in USER_ARCHIVE_DDL.get(connection.dialect.name, ()):
+        connection.exec_driver_sql(statement)
+
+@event.listens_for(db.metadata, "after_create")
+def _after_create(target, connection, **kw):
+    install_change_tracking(connection)
+    install_user_counts(connection)
+    install_user_archive(connection)
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_user_flush(session, flush_context):
+    changed = (session.new, session.dirty, session.deleted)
+    if any(isinstance(obj, User) for objects in changed for obj in objects):
+        bump_table_version(session)
+
+# Columns a user can set, in import/export order
+USER_FIELDS = ("name", "email", "role")
+
+def validate_user_fields(record, partial=False):
+    """Return ``(values, error_message)`` for the user fields in ``record``.
+
+    Values are stripped strings. Lengths are checked up front so SQLite,
+    which ignores VARCHAR lengths, reports the same error PostgreSQL would
+    raise as DataError. With ``partial`` only the fields present are checked.
+    """
+    values = {}
+    for name in USER_FIELDS:
+        if partial and name not in record:
+            continue
+        value = record.get(name)
+        value = str(value).strip() if value is not None else ""
+        if not value:
+            return None, MISSING_FIELD_ERROR.format(name)
+        if len(value) > User.__table__.c[name].type.length:
+            return None, DATA_TOO_LONG_ERROR
+        values[name] = value
+    return values, None
+
+# Read-only views select these columns as plain rows: no ORM objects are
+# built and nothing is added to the session identity map
+USER_ROW_COLUMNS = (User.id, User.name, User.email, User.role)
+
+def select_user_rows():
+    return db.select(*USER_ROW_COLUMNS)
+
+# Sort keys accepted by the user list, each backed by an index
+USER_SORT_KEYS = {
+    "id": (User.id,),
+    "name": (User.name, User.id),
+    "email": (User.email,),
+}
+
+class Job(db.Model):
+    """A long-running bulk operation, run in chunks by ``flask worker``.
+
+    ``state`` is the handler's checkpoint: it is committed together with
+    each chunk's writes, so a job picked up again after a crash resumes
+    right after the last chunk that made it to the database. A running job
+    is leased to one worker until ``lease_until``; every checkpoint renews
+    the lease and an expired one can be claimed by another worker.
+    """
+    __tablename__ = "jobs"
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    # Uploaded file of an import job: only its handler loads it, and it is
+    # cleared once the job is over
+    payload = db.orm.deferred(db.Column(db.Text))
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    state = db.Column(db.JSON)
+    done = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker = db.Column(db.String(100))
+    lease_until = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index("ix_jobs_status_id", "status", "id"),)
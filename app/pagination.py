@@ -0,0 +1,95 @@
+"""Keyset (cursor based) pagination helpers.
+
+Instead of ``OFFSET`` we remember the sort key of the last row we sent and
+ask the database for rows strictly after it. With an index on the sort
+columns every page costs the same, no matter how deep into the table it is.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import tuple_
+
+
+@dataclass
+class Page:
+    items: list
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+def encode_cursor(values):
+    """Serialize the sort key of a row into an opaque, URL safe token."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token, types):
+    """Inverse of :func:`encode_cursor`. Raises ``ValueError`` on bad input.
+
+    ``types`` are the Python types of the values, in order; anything else
+    (a list, an object, a bool for an int) never reaches the database.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Invalid cursor")
+    for value, type_ in zip(values, types):
+        if not isinstance(value, type_) or isinstance(value, bool):
+            raise ValueError("Invalid cursor")
+    return values
+
+
+def _types(columns):
+    return [column.type.python_type for column in columns]
+
+
+def _key(item, columns):
+    return [getattr(item, column.key) for column in columns]
+
+
+def keyset_page(session, stmt, columns, per_page, after=None, before=None):
+    """Return one :class:`Page` of the rows of ``stmt`` ordered by ``columns``.
+
+    ``columns`` must uniquely identify a row (end the tuple with the primary
+    key when the leading column is not unique), be part of the selected
+    columns and should be covered by an index. Pass the ``next_cursor`` of
+    a page as ``after`` to move forward, or its ``prev_cursor`` as ``before``
+    to move back.
+    """
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+
+    if before is not None:
+        values = decode_cursor(before, _types(columns))
+        bound = tuple_(*values) if len(columns) > 1 else values[0]
+        stmt = stmt.where(key < bound).order_by(*[c.desc() for c in columns])
+    else:
+        if after is not None:
+            values = decode_cursor(after, _types(columns))
+            bound = tuple_(*values) if len(columns) > 1 else values[0]
+            stmt = stmt.where(key > bound)
+        stmt = stmt.order_by(*columns)
+
+    # One extra row tells us whether there is another page in this direction
+    items = session.execute(stmt.limit(per_page + 1)).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    page = Page(items=items)
+    if before is not None:
+        items.reverse()
+        if items:
+            page.next_cursor = encode_cursor(_key(items[-1], columns))
+            if has_more:
+                page.prev_cursor = encode_cursor(_key(items[0], columns))
+    elif items:
+        if has_more:
+            page.next_cursor = encode_cursor(_key(items[-1], columns))
+        if after is not None:
+            page.prev_cursor = encode_cursor(_key(items[0], columns))
+    return page
@@ -0,0 +1,134 @@
+"""Opt-in SQL profiler for development and staging.
+
+With ``SQL_PROFILER=1`` every statement is timed through SQLAlchemy's
+cursor events:
+
+* statements slower than ``SQL_SLOW_QUERY_MS`` are logged with their
+  parameters and, for SELECTs, the plan from ``EXPLAIN`` (``EXPLAIN QUERY
+  PLAN`` on SQLite);
+* at the end of a request, a statement that ran ``SQL_N_PLUS_ONE_THRESHOLD``
+  times or more with the same SQL is logged as an N+1 candidate, which is
+  what a per-row query in a template loop looks like.
+
+:func:`query_budget` is independent of the setting and lets tests fail
+when a route starts running more statements than it should.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from app.models import db
+
+logger = logging.getLogger(__name__)
+
+# Not counted against budgets or N+1 checks: they come and go with the
+# driver (SQLite needs an explicit BEGIN here, psycopg2 sends it implicitly)
+TRANSACTION_CONTROL = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by :func:`query_budget` when a block runs too many statements."""
+
+
+def _counts(statement):
+    return not statement.lstrip().upper().startswith(TRANSACTION_CONTROL)
+
+
+class SQLProfiler:
+    """Slow query log and N+1 detector for one engine."""
+
+    def __init__(self, slow_ms=100, explain=True, repeat_threshold=5):
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.repeat_threshold = repeat_threshold
+
+    def install(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profiler_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['profiler_started'].pop()
+        if conn.info.get('profiler_explaining'):
+            return
+        if has_request_context() and _counts(statement):
+            g.setdefault('sql_profile', []).append(statement)
+        if elapsed * 1000 >= self.slow_ms:
+            plan = None
+            if self.explain and not executemany:
+                plan = self._explain(conn, statement, parameters)
+            logger.warning(
+                "Slow query (%.1f ms): %s\nParameters: %r%s",
+                elapsed * 1000, statement, parameters,
+                f"\nPlan:\n{plan}" if plan else "",
+            )
+
+    def _explain(self, conn, statement, parameters):
+        # Only SELECTs: EXPLAIN of a write can still fail, and on
+        # PostgreSQL a failed statement aborts the whole transaction
+        if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return None
+        prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+        conn.info['profiler_explaining'] = True
+        try:
+            rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+        finally:
+            conn.info['profiler_explaining'] = False
+        # The plan text is the last column on both SQLite and PostgreSQL
+        return "\n".join(str(row[-1]) for row in rows)
+
+    def check_request(self, exc=None):
+        """Log the statements the finished request repeated too often."""
+        statements = g.pop('sql_profile', [])
+        for statement, count in Counter(statements).items():
+            if count >= self.repeat_threshold:
+                logger.warning(
+                    "Possible N+1 in %s: %d x %s", request.endpoint, count, statement
+                )
+
+
+def install_profiler(app):
+    """Profile ``app``'s engine as configured by the ``SQL_*`` settings."""
+    profiler = SQLProfiler(
+        slow_ms=app.config['SQL_SLOW_QUERY_MS'],
+        explain=app.config['SQL_EXPLAIN'],
+        repeat_threshold=app.config['SQL_N_PLUS_ONE_THRESHOLD'],
+    )
+    with app.app_context():
+        profiler.install(db.engine)
+    app.teardown_request(profiler.check_request)
+    app.extensions['sql_profiler'] = profiler
+    return profiler
+
+
+@contextmanager
+def query_budget(engine, max_statements):
+    """Fail if the block runs more than ``max_statements`` on ``engine``.
+
+    Yields the list of statements seen so far, for closer assertions::
+
+        with query_budget(db.engine, 2):
+            client.get("/")
+    """
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if _counts(statement):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    if len(statements) > max_statements:
+        raise QueryBudgetExceeded(
+            f"{len(statements)} statements over a budget of {max_statements}:\n"
+            + "\n".join(statements)
+        )
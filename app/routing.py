@@ -0,0 +1,185 @@
+"""Read replica routing.
+
+With ``DB_REPLICA_URLS`` set, each replica gets its own engine (named
+``replica1``, ``replica2``, ... and sharing the primary's pool settings)
+and :class:`RoutingSession` picks the engine per statement:
+
+* SELECTs in GET and HEAD requests go to a replica, chosen round-robin
+  once per request so that all of a page's queries see the same snapshot;
+* everything else goes to the primary: writes, every statement of other
+  methods, the CLI, and reads after the request has written;
+* a client that wrote recently gets a cookie for ``DB_STICKY_SECONDS`` so
+  the page it is redirected to reads its own write from the primary;
+* a replica that fails its health check, or lags by more than
+  ``DB_REPLICA_MAX_LAG`` seconds, is skipped until the next check
+  ``DB_REPLICA_CHECK_INTERVAL`` seconds later. With no replica left,
+  reads go to the primary.
+
+Locally, point ``DB_REPLICA_URLS`` at a copy of an SQLite database or at a
+second PostgreSQL instance.
+"""
+import itertools
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.selectable import CompoundSelect
+
+STICKY_COOKIE = "db_primary"
+READ_ONLY_METHODS = ("GET", "HEAD")
+
+# Seconds the replica is behind; 0 when it has replayed everything it
+# received, which keeps an idle primary from looking like lag
+REPLICA_LAG_SQL = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def replica_lag(connection):
+    """Replication lag of ``connection``'s server in seconds."""
+    if connection.dialect.name != "postgresql":
+        return 0.0
+    return float(connection.exec_driver_sql(REPLICA_LAG_SQL).scalar() or 0)
+
+
+class _ReplicaState:
+    def __init__(self):
+        self.healthy = True
+        self.checked_at = None
+        self.lag = 0.0
+
+
+class ReplicaRouter:
+    """Round-robin over the replicas that passed their last health check.
+
+    ``engines`` maps replica names to their engines.
+    """
+
+    def __init__(self, engines, check_interval=5, max_lag=5):
+        self.engines = engines
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self._states = {key: _ReplicaState() for key in engines}
+        self._order = itertools.cycle(engines)
+        self._lock = threading.Lock()
+        for key, engine in engines.items():
+            event.listen(engine, "handle_error", self._on_error(key))
+
+    def _on_error(self, key):
+        def on_error(context):
+            if context.is_disconnect:
+                self.mark_down(key)
+        return on_error
+
+    def choose(self):
+        """Return the engine of the next healthy replica, or None."""
+        for _ in self.engines:
+            with self._lock:
+                key = next(self._order)
+            if self._is_healthy(key, self.engines[key]):
+                return self.engines[key]
+        return None
+
+    def _is_healthy(self, key, engine):
+        state = self._states[key]
+        now = time.monotonic()
+        with self._lock:
+            due = state.checked_at is None or now - state.checked_at >= self.check_interval
+            if due:
+                # Other threads keep the previous verdict while this one checks
+                state.checked_at = now
+        if due:
+            state.healthy, state.lag = self._check(engine)
+        return state.healthy
+
+    def _check(self, engine):
+        try:
+            with engine.connect() as connection:
+                lag = replica_lag(connection)
+        except Exception:
+            current_app.logger.warning("Replica %s is down, reading from the primary", engine.url)
+            return False, None
+        if lag > self.max_lag:
+            current_app.logger.warning(
+                "Replica %s is %.1f s behind, reading from the primary", engine.url, lag
+            )
+            return False, lag
+        return True, lag
+
+    def mark_down(self, key):
+        """Skip ``key`` until its next health check."""
+        state = self._states[key]
+        with self._lock:
+            state.healthy = False
+            state.checked_at = time.monotonic()
+
+    def status(self):
+        return {
+            key: {"healthy": state.healthy, "lag_seconds": state.lag}
+            for key, state in self._states.items()
+        }
+
+
+class RoutingSession(Session):
+    """Session that sends the reads of read-only requests to a replica.
+
+    Only plain SELECTs are routed; text statements and anything else that
+    could write stay on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or isinstance(clause, UpdateBase):
+                g.db_wrote = True
+            elif isinstance(clause, (Select, CompoundSelect)):
+                replica = self._replica_for_request()
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_for_request(self):
+        router = current_app.extensions.get("db_router")
+        if (
+            router is None
+            or request.method not in READ_ONLY_METHODS
+            or g.get("db_wrote")
+            or STICKY_COOKIE in request.cookies
+        ):
+            return None
+        if "db_replica" not in g:
+            g.db_replica = router.choose()
+        return g.db_replica
+
+
+def _set_sticky_cookie(response):
+    if g.get("db_wrote"):
+        seconds = current_app.config["DB_STICKY_SECONDS"]
+        response.set_cookie(STICKY_COOKIE, "1", max_age=seconds, httponly=True, samesite="Lax")
+    return response
+
+
+def install_replica_router(app):
+    """Route ``app``'s reads to the replicas in ``DB_REPLICA_URLS``.
+
+    Engines connect lazily, so this does not touch the replicas either.
+    """
+    engines = {}
+    for number, url in enumerate(app.config["DB_REPLICA_URLS"], start=1):
+        options = {}
+        if url.startswith("postgresql"):
+            options = app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+        engines[f"replica{number}"] = create_engine(url, **options)
+    router = ReplicaRouter(
+        engines,
+        check_interval=app.config["DB_REPLICA_CHECK_INTERVAL"],
+        max_lag=app.config["DB_REPLICA_MAX_LAG"],
+    )
+    app.after_request(_set_sticky_cookie)
+    app.extensions["db_router"] = router
+    return router
@@ -0,0 +1,88 @@
+"""Additive schema upgrades for ``flask db upgrade``.
+
+The app only ever adds tables, columns and indexes, so instead of a
+migration framework this compares the models with the live database and
+creates whatever is missing. It is idempotent and safe to run on every
+deploy.
+"""
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.schema import CreateColumn
+
+
+def _column_default(column):
+    default = column.default
+    if default is None or not default.is_scalar and not default.is_callable:
+        return None
+    return default.arg(None) if default.is_callable else default.arg
+
+
+def _add_column(connection, table, column):
+    """Add ``column`` to existing rows, backfilling its Python-side default.
+
+    NOT NULL columns are added as nullable first because existing rows have
+    no value yet; PostgreSQL then gets the constraint back after the
+    backfill. SQLite cannot alter a column, so there it stays nullable and
+    the ORM keeps filling it in.
+    """
+    nullable = column._copy()
+    nullable.nullable = True
+    ddl = CreateColumn(nullable).compile(dialect=connection.dialect)
+    connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+    value = _column_default(column)
+    if value is not None:
+        # Plain SQL: an UPDATE built from the table would also apply the
+        # onupdate defaults of other columns, which may not exist yet
+        backfill = text(f"UPDATE {table.name} SET {column.name} = :value")
+        connection.execute(backfill.bindparams(bindparam("value", value, type_=column.type)))
+    if not column.nullable and connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(
+            f"ALTER TABLE {table.name} ALTER COLUMN {column.name} SET NOT NULL"
+        )
+
+
+def _applies_to(item, dialect_name):
+    """False for items limited to other dialects with ``ddl_if``."""
+    ddl_if = getattr(item, "_ddl_if", None)
+    if ddl_if is None or ddl_if.dialect is None:
+        return True
+    dialects = (ddl_if.dialect,) if isinstance(ddl_if.dialect, str) else ddl_if.dialect
+    return dialect_name in dialects
+
+
+def _index_names(connection, inspector, table_name):
+    # The inspector skips expression indexes such as lower(email), so ask
+    # the catalogs directly where we know how
+    if connection.dialect.name == "sqlite":
+        query = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"
+    elif connection.dialect.name == "postgresql":
+        query = "SELECT indexname FROM pg_indexes WHERE tablename = :table"
+    else:
+        return {index["name"] for index in inspector.get_indexes(table_name)}
+    return set(connection.execute(text(query), {"table": table_name}).scalars())
+
+
+def upgrade_schema(engine, metadata):
+    """Bring the database up to ``metadata`` and describe what changed."""
+    changes = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        existing_tables = set(inspector.get_table_names())
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    _add_column(connection, table, column)
+                    changes.append(f"Added column {table.name}.{column.name}")
+            indexes = _index_names(connection, inspector, table.name)
+            for index in table.indexes:
+                if index.name not in indexes and _applies_to(index, connection.dialect.name):
+                    index.create(connection)
+                    changes.append(f"Created index {index.name}")
+
+        missing = [table for table in metadata.sorted_tables if table.name not in existing_tables]
+        metadata.create_all(connection, tables=missing)
+        changes.extend(f"Created table {table.name}" for table in missing)
+    return changes
@@ -0,0 +1,61 @@
+"""Server-side filtering of the user list.
+
+Every filter is backed by an index:
+
+* ``email``: exact, case-insensitive match on ``lower(email)``
+* ``role``: exact match on ``(role, id)``
+* ``prefix`` and ``q``: name or email starting with / containing the text,
+  through the ``pg_trgm`` GIN indexes on PostgreSQL or the ``users_fts``
+  FTS5 trigram table on SQLite. Both index substrings of three characters
+  or more; shorter patterns still work but fall back to a scan.
+"""
+from sqlalchemy import column, func, literal_column, or_, select, table
+
+from app.models import User
+
+FILTERS = ("email", "role", "prefix", "q")
+
+_users_fts = table("users_fts", column("rowid"))
+
+
+def _like(text, prefix_only):
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"{escaped}%" if prefix_only else f"%{escaped}%"
+    return or_(User.name.ilike(pattern, escape="\\"), User.email.ilike(pattern, escape="\\"))
+
+
+def _fts_match(text):
+    # A quoted phrase matches as a case-insensitive substring under the
+    # trigram tokenizer. LIKE on the FTS table would too, but FTS5 cannot
+    # use its index for LIKE ... ESCAPE or for an OR across columns.
+    phrase = '"{}"'.format(text.replace('"', '""'))
+    query = "{name email} : " + phrase
+    return User.id.in_(
+        select(_users_fts.c.rowid).where(literal_column("users_fts").op("MATCH")(query))
+    )
+
+
+def _text_match(dialect_name, text, prefix_only):
+    like = _like(text, prefix_only)
+    if dialect_name != "sqlite" or len(text) < 3:
+        return like
+    # The trigram index finds the candidates; LIKE then keeps the prefixes
+    return _fts_match(text) & like if prefix_only else _fts_match(text)
+
+
+def parse_filters(args):
+    """Pick the non-empty search parameters out of ``args``."""
+    return {name: args[name].strip() for name in FILTERS if args.get(name, "").strip()}
+
+
+def filter_users(stmt, dialect_name, filters):
+    """Add a WHERE clause to ``stmt`` for every filter in ``filters``."""
+    if "email" in filters:
+        stmt = stmt.where(func.lower(User.email) == filters["email"].lower())
+    if "role" in filters:
+        stmt = stmt.where(User.role == filters["role"])
+    if "prefix" in filters:
+        stmt = stmt.where(_text_match(dialect_name, filters["prefix"], prefix_only=True))
+    if "q" in filters:
+        stmt = stmt.where(_text_match(dialect_name, filters["q"], prefix_only=False))
+    return stmt
@@ -0,0 +1,98 @@
+// Live updates of the user list from the Server-Sent Events at /events.
+// Rows on the page are patched or removed in place; new users are added
+// when the page is the last one in id order, otherwise a notice offers a
+// reload. The counts header is refreshed from /api/users/summary.
+(function () {
+    "use strict";
+
+    var table = document.getElementById("users");
+    if (!table || !table.dataset.events || !window.EventSource) {
+        return;
+    }
+    var template = document.getElementById("user-row");
+    var summary = document.querySelector(".summary");
+    var notice = document.querySelector(".live-notice");
+    var summaryTimer = null;
+
+    function row(id) {
+        return table.querySelector('tr[data-id="' + id + '"]');
+    }
+
+    function flash(tr) {
+        tr.classList.remove("live-changed");
+        // Restart the animation
+        void tr.offsetWidth;
+        tr.classList.add("live-changed");
+    }
+
+    function fill(tr, user) {
+        // Cells in column order, after the selection checkbox
+        ["id", "name", "email", "role"].forEach(function (field, index) {
+            tr.cells[index + 1].textContent = user[field];
+        });
+    }
+
+    function newRow(user) {
+        var tr = template.content.firstElementChild.cloneNode(true);
+        tr.dataset.id = user.id;
+        tr.querySelector('input[name="id"]').value = user.id;
+        var link = tr.querySelector("a[data-href]");
+        link.href = link.dataset.href.replace(/0$/, user.id);
+        var form = tr.querySelector("form[data-action]");
+        form.action = form.dataset.action.replace(/0$/, user.id);
+        return tr;
+    }
+
+    function refreshSummary() {
+        if (!summary) {
+            return;
+        }
+        clearTimeout(summaryTimer);
+        // One request for a burst of changes
+        summaryTimer = setTimeout(function () {
+            fetch(table.dataset.summary, {headers: {Accept: "application/json"}})
+                .then(function (response) { return response.json(); })
+                .then(function (counts) {
+                    var text = counts.total + " users";
+                    Object.keys(counts.roles).forEach(function (role) {
+                        text += " · " + role + ": " + counts.roles[role];
+                    });
+                    summary.textContent = text;
+                })
+                .catch(function () {});
+        }, 500);
+    }
+
+    var source = new EventSource(table.dataset.events);
+
+    source.addEventListener("upsert", function (event) {
+        var user = JSON.parse(event.data).user;
+        var tr = row(user.id);
+        if (tr) {
+            fill(tr, user);
+            flash(tr);
+        } else if (table.hasAttribute("data-append")) {
+            tr = newRow(user);
+            fill(tr, user);
+            table.querySelector("tbody").appendChild(tr);
+            flash(tr);
+        } else if (notice) {
+            notice.hidden = false;
+        }
+        refreshSummary();
+    });
+
+    source.addEventListener("delete", function (event) {
+        var tr = row(JSON.parse(event.data).id);
+        if (tr) {
+            tr.remove();
+        }
+        refreshSummary();
+    });
+
+    // The database was recreated: the page no longer matches it
+    source.addEventListener("reset", function () {
+        source.close();
+        window.location.reload();
+    });
+})();
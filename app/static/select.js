@@ -0,0 +1,33 @@
+// Row selection for the bulk actions of the user list: the header
+// checkbox selects or clears every row on the page.
+(function () {
+    "use strict";
+
+    var table = document.getElementById("users");
+    var all = table && table.querySelector("input.select-all");
+    if (!all) {
+        return;
+    }
+
+    function boxes() {
+        return table.querySelectorAll('input[name="id"]');
+    }
+
+    all.addEventListener("change", function () {
+        boxes().forEach(function (box) {
+            box.checked = all.checked;
+        });
+    });
+
+    // Keep the header in step with the rows, including rows live.js adds
+    table.addEventListener("change", function (event) {
+        if (event.target.name !== "id") {
+            return;
+        }
+        var checked = Array.prototype.filter.call(boxes(), function (box) {
+            return box.checked;
+        });
+        all.checked = checked.length === boxes().length;
+        all.indeterminate = checked.length > 0 && !all.checked;
+    });
+})();
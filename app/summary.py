@@ -0,0 +1,58 @@
+"""User counts for dashboards and the user list header.
+
+Exact counts come from ``user_role_counts``, which triggers keep current
+(see ``USER_COUNTS_DDL`` in :mod:`app.models`), so reading them costs one
+row per role instead of a scan of the users table.
+
+On PostgreSQL the approximate mode reads the planner's statistics
+instead: ``pg_class.reltuples`` for the total and the most common values
+of ``users.role`` in ``pg_stats`` for the roles. It touches no user data
+at all and is as fresh as the last (auto)ANALYZE. Elsewhere, or before
+the table has ever been analyzed, it falls back to the exact counts.
+"""
+from sqlalchemy import select, text
+
+from app.models import User, UserRoleCount
+
+APPROXIMATE_TOTAL_SQL = text(
+    "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"
+)
+APPROXIMATE_ROLES_SQL = text(
+    "SELECT most_common_vals::text::text[], most_common_freqs FROM pg_stats "
+    "WHERE schemaname = current_schema() AND tablename = :table AND attname = 'role'"
+)
+
+
+def exact_summary(session):
+    rows = session.execute(
+        select(UserRoleCount.role, UserRoleCount.count)
+        .where(UserRoleCount.count > 0)
+        .order_by(UserRoleCount.role)
+    ).all()
+    roles = {row.role: row.count for row in rows}
+    return {"total": sum(roles.values()), "roles": roles, "approximate": False}
+
+
+def approximate_summary(session):
+    """Planner estimates on PostgreSQL; None where there are none."""
+    if session.get_bind().dialect.name != "postgresql":
+        return None
+    table = User.__tablename__
+    total = session.execute(APPROXIMATE_TOTAL_SQL, {"table": table}).scalar()
+    # -1 (PostgreSQL 14+) or 0 until the table is first analyzed
+    if total is None or total <= 0:
+        return None
+    stats = session.execute(APPROXIMATE_ROLES_SQL, {"table": table}).first()
+    roles = {}
+    if stats is not None and stats[0]:
+        roles = {role: round(freq * total) for role, freq in zip(*stats)}
+    return {"total": total, "roles": dict(sorted(roles.items())), "approximate": True}
+
+
+def user_summary(session, approximate=False):
+    """``{"total": n, "roles": {role: n}, "approximate": bool}``."""
+    if approximate:
+        summary = approximate_summary(session)
+        if summary is not None:
+            return summary
+    return exact_summary(session)
@@ -0,0 +1,240 @@
+"""Bulk import and export of users as CSV or JSON Lines files."""
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.models import (
+    DATA_TOO_LONG_ERROR,
+    DUPLICATE_EMAIL_ERROR,
+    USER_FIELDS,
+    USER_ROW_COLUMNS,
+    User,
+    bump_table_version,
+    select_user_rows,
+    utcnow,
+    validate_user_fields,
+)
+
+FORMATS = ("csv", "jsonl")
+MIMETYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+INVALID_RECORD_ERROR = "Error: The line is not a valid JSON object."
+INVALID_ENCODING_ERROR = "Error: The file is not valid UTF-8."
+
+
+@dataclass
+class ImportReport:
+    inserted: int = 0
+    # (line number, message) for every rejected record
+    errors: list = field(default_factory=list)
+
+
+def format_for(filename, default="csv"):
+    """Guess the file format from its extension."""
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+    return default
+
+
+def read_records(stream, fmt):
+    """Yield ``(line_number, record)`` from a text stream.
+
+    ``record`` is a dict, or ``None`` when the line could not be parsed.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else None
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _validate(record):
+    """Return ``(values, error_message)`` for one parsed record."""
+    if record is None:
+        return None, INVALID_RECORD_ERROR
+    return validate_user_fields(record)
+
+
+def _copy_rows(session, rows):
+    """Load ``rows`` with PostgreSQL's COPY, the fastest bulk insert path.
+
+    COPY skips the model's Python-side defaults, so they are written out
+    here.
+    """
+    columns = USER_FIELDS + ("created_at", "updated_at", "version")
+    now = utcnow()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[name] for name in USER_FIELDS] + [now, now, 1])
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {User.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _insert_rows(session, rows):
+    if session.get_bind().dialect.name == "postgresql":
+        _copy_rows(session, rows)
+    else:
+        # One executemany round trip for the whole batch
+        session.execute(User.__table__.insert(), rows)
+
+
+def insert_batch(session, batch, report, lookup=True):
+    """Insert one batch of ``(line_number, values)`` and record the outcome.
+
+    With ``lookup``, emails already in the table are found with one query
+    up front; without it (when duplicates are rare) the batch is inserted
+    straight away and falls back to row by row only on a conflict.
+    """
+    existing = set()
+    if lookup:
+        emails = [values["email"] for _, values in batch]
+        existing = set(session.scalars(select(User.email).where(User.email.in_(emails))))
+    rows = []
+    for line_number, values in batch:
+        if values["email"] in existing:
+            report.errors.append((line_number, DUPLICATE_EMAIL_ERROR))
+        else:
+            rows.append((line_number, values))
+    if not rows:
+        return
+
+    try:
+        with session.begin_nested():
+            _insert_rows(session, [values for _, values in rows])
+        bump_table_version(session)
+        report.inserted += len(rows)
+        return
+    except (DataError, IntegrityError):
+        pass
+
+    # Something slipped past validation (e.g. a concurrent insert of the same
+    # email): retry row by row so only the offending rows are rejected
+    for line_number, values in rows:
+        try:
+            with session.begin_nested():
+                session.execute(User.__table__.insert(), [values])
+            bump_table_version(session)
+            report.inserted += 1
+        except DataError:
+            report.errors.append((line_number, DATA_TOO_LONG_ERROR))
+        except IntegrityError:
+            report.errors.append((line_number, DUPLICATE_EMAIL_ERROR))
+
+
+def iter_import_batches(records, batch_size, report):
+    """Validate ``(line_number, record)`` pairs and group them into batches.
+
+    Yields ``(batch, last_line)``, where ``last_line`` is the line number of
+    the last record read so far, so a caller can resume after it. Rejected
+    records go to ``report.errors``.
+    """
+    batch = []
+    # Emails in the current batch; earlier batches are already committed, so
+    # repeats of those are caught by the lookup in insert_batch
+    seen = set()
+    line_number = 0
+
+    for line_number, record in records:
+        values, error = _validate(record)
+        if error is None and values["email"] in seen:
+            error = DUPLICATE_EMAIL_ERROR
+        if error is not None:
+            report.errors.append((line_number, error))
+            continue
+        seen.add(values["email"])
+        batch.append((line_number, values))
+
+        if len(batch) >= batch_size:
+            yield batch, line_number
+            batch = []
+            seen.clear()
+
+    if batch:
+        yield batch, line_number
+
+
+def import_users(session, stream, fmt, batch_size=1000, report=None):
+    """Stream users from ``stream`` into the database in batches.
+
+    Every batch is committed on its own, so memory use and transaction size
+    stay bounded by ``batch_size`` whatever the size of the file. Invalid
+    records are reported in the returned :class:`ImportReport` and never
+    abort the rest of the import. Pass ``report`` to still know what was
+    committed when reading the stream raises.
+    """
+    if report is None:
+        report = ImportReport()
+    for batch, _ in iter_import_batches(read_records(stream, fmt), batch_size, report):
+        insert_batch(session, batch, report)
+        session.commit()
+    report.errors.sort()
+    return report
+
+
+def select_export_rows(session, roles=None, batch_size=1000):
+    """Return a streaming result over the users to export, in id order.
+
+    ``yield_per`` makes PostgreSQL use a server-side cursor, so only one
+    batch of rows is held in memory at a time.
+    """
+    stmt = select_user_rows().order_by(User.id).execution_options(yield_per=batch_size)
+    if roles:
+        stmt = stmt.where(User.role.in_(roles))
+    return session.execute(stmt)
+
+
+def iter_export(rows, fmt, chunk_rows=1000, columns=None, header=True):
+    """Serialize ``rows`` and yield the output ``chunk_rows`` rows at a time.
+
+    ``columns`` names the values of each row (the user list columns by
+    default); ``header=False`` leaves out the CSV header, to append to an
+    earlier export.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    if columns is None:
+        columns = [column.key for column in USER_ROW_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if fmt == "csv" and header:
+        writer.writerow(columns)
+
+    count = 0
+    for row in rows:
+        if fmt == "csv":
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(dict(zip(columns, row))))
+            buffer.write("\n")
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
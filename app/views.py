@@ -0,0 +1,340 @@
+"""HTML views of the user manager."""
+import io
+
+from flask import (
+    Blueprint,
+    abort,
+    current_app,
+    g,
+    jsonify,
+    make_response,
+    render_template,
+    request,
+    redirect,
+    stream_template,
+    stream_with_context,
+    url_for,
+)
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.bulk import delete_users, set_role, validate_role
+from app.changes import state_cursor
+from app.conditional import add_validators, make_etag, not_modified
+from app.database import pool_status
+from app.jobs import enqueue, enqueue_if_large
+from app.models import (
+    CONFLICT_ERROR,
+    DATA_TOO_LONG_ERROR,
+    DUPLICATE_EMAIL_ERROR,
+    GENERIC_ERROR,
+    USER_SORT_KEYS,
+    User,
+    bump_table_version,
+    db,
+    get_table_version,
+    select_user_rows,
+)
+from app.pagination import keyset_page
+from app.search import filter_users, parse_filters
+from app.summary import user_summary
+from app.transfer import (
+    FORMATS,
+    INVALID_ENCODING_ERROR,
+    MIMETYPES,
+    format_for,
+    import_users,
+    iter_export,
+    select_export_rows,
+)
+
+users = Blueprint('users', __name__)
+
+def _buffered(chunks, size):
+    """Join the many tiny strings Jinja yields into chunks of ``size`` chars."""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+def _stream_index(filters):
+    # yield_per uses a server-side cursor on PostgreSQL, so only one batch
+    # of rows is held in memory while the template is being sent
+    stmt = filter_users(select_user_rows(), db.engine.dialect.name, filters)
+    stmt = stmt.order_by(User.id).execution_options(
+        yield_per=current_app.config['USERS_STREAM_BATCH_SIZE']
+    )
+    summary = _summary()
+    users = db.session.execute(stmt)
+    chunks = stream_template(
+        'index.html', users=users, page=None, sort='id', per_page=None, filters=filters,
+        summary=summary, live_append=not filters,
+    )
+    return current_app.response_class(
+        _buffered(chunks, current_app.config['USERS_STREAM_CHUNK_SIZE']), mimetype='text/html'
+    )
+
+@users.route('/')
+def index():
+    filters = parse_filters(request.args)
+    if request.args.get('stream') == '1':
+        return _stream_index(filters)
+
+    sort = request.args.get('sort', 'id')
+    if sort not in USER_SORT_KEYS:
+        abort(400)
+    per_page = request.args.get('per_page', current_app.config['USERS_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['USERS_MAX_PER_PAGE']))
+    after = request.args.get('after')
+    before = request.args.get('before')
+
+    # Writes bump the version, so neither the ETag nor the cache key is ever
+    # reused for different data
+    state = get_table_version(db.session)
+    search = sorted(filters.items())
+    etag = make_etag('index', state.token, sort, per_page, after, before, search)
+    response = not_modified(etag, state.updated_at)
+    if response is not None:
+        return response
+
+    cache = current_app.extensions['page_cache']
+    key = f"index:{state.token}:{sort}:{per_page}:{after}:{before}:{search}"
+    html = cache.get(key)
+    if html is None:
+        html = _render_index(sort, per_page, after, before, filters, state)
+        cache.set(key, html)
+    return add_validators(make_response(html), etag, state.updated_at)
+
+def _render_index(sort, per_page, after, before, filters, state):
+    try:
+        page = keyset_page(
+            db.session,
+            filter_users(select_user_rows(), db.engine.dialect.name, filters),
+            USER_SORT_KEYS[sort],
+            per_page,
+            after=after,
+            before=before,
+        )
+    except ValueError:
+        abort(400)
+    return render_template(
+        'index.html', users=page.items, page=page, sort=sort, per_page=per_page, filters=filters,
+        summary=_summary(),
+        # Live updates start right after the data on this page; new users
+        # are added to it only when it is the last page in id order
+        live_since=state_cursor(state, db.engine.dialect.name),
+        live_append=sort == 'id' and not filters and page.next_cursor is None,
+    )
+
+def _summary():
+    return user_summary(db.session, approximate=current_app.config['USERS_COUNT_APPROXIMATE'])
+
+@users.route('/stats/cache')
+def cache_stats():
+    return jsonify(current_app.extensions['page_cache'].stats())
+
+@users.route('/stats/pool')
+def pool_stats():
+    status = pool_status(db.engine)
+    router = current_app.extensions.get('db_router')
+    if router is not None:
+        status['replicas'] = {
+            key: {**pool_status(router.engines[key]), **health}
+            for key, health in router.status().items()
+        }
+    return jsonify(status)
+
+@users.route('/add', methods=['GET', 'POST'])
+def add_user():
+    error_message = None
+    if request.method == 'POST':
+        name = request.form['name']
+        email = request.form['email']
+        role = request.form['role']
+
+        committer = current_app.extensions.get('group_commit')
+        if committer is not None:
+            # Committed together with the creates of concurrent requests
+            error_message = committer.create({'name': name, 'email': email, 'role': role})
+            if error_message is None:
+                # Written by another session: set the sticky cookie of
+                # app/routing.py so the list shows the new user
+                g.db_wrote = True
+                return redirect(url_for('users.index'))
+            return render_template('add_user.html', error_message=error_message)
+
+        new_user = User(name=name, email=email, role=role)
+        db.session.add(new_user)
+        try:
+            db.session.commit()
+            return redirect(url_for('users.index'))
+        except DataError:
+            db.session.rollback()
+            error_message = DATA_TOO_LONG_ERROR
+        except IntegrityError:
+            db.session.rollback()
+            error_message = DUPLICATE_EMAIL_ERROR
+        except Exception:
+            db.session.rollback()
+            error_message = GENERIC_ERROR
+
+    return render_template('add_user.html', error_message=error_message)
+
+@users.route('/edit/<int:id>', methods=['GET', 'POST'])
+def edit_user(id):
+    if request.method == 'GET':
+        user = db.session.get(User, id)
+        if user is None:
+            abort(404)
+        # The version changes on every write, but an id (after the newest
+        # user is deleted) and a version (on restore) can come back for
+        # different data, so the last write's timestamp goes in too
+        etag = make_etag('user', id, user.version, user.updated_at.isoformat())
+        response = not_modified(etag, user.updated_at)
+        if response is None:
+            response = make_response(render_template('edit_user.html', user=user, error_message=None))
+            add_validators(response, etag, user.updated_at)
+        return response
+
+    values = {
+        'name': request.form['name'],
+        'email': request.form['email'],
+        'role': request.form['role'],
+    }
+    version = request.form.get('version', type=int)
+    # One UPDATE both checks and writes: no row comes back when the user is
+    # gone or, if the form carried a version, someone else saved in between
+    stmt = (
+        db.update(User)
+        .where(User.id == id)
+        .values(**values, version=User.version + 1)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    if version is not None:
+        stmt = stmt.where(User.version == version)
+    try:
+        if db.session.execute(stmt).scalar() is not None:
+            bump_table_version(db.session)
+            db.session.commit()
+            return redirect(url_for('users.index'))
+        db.session.rollback()
+        error_message = CONFLICT_ERROR
+    except DataError:
+        db.session.rollback()
+        error_message = DATA_TOO_LONG_ERROR
+    except IntegrityError:
+        db.session.rollback()
+        error_message = DUPLICATE_EMAIL_ERROR
+    except Exception:
+        db.session.rollback()
+        error_message = GENERIC_ERROR
+
+    if error_message != CONFLICT_ERROR:
+        # Show the submitted values again, not the stored ones
+        user = User(id=id, version=version, **values)
+        return render_template('edit_user.html', user=user, error_message=error_message)
+    # Only now is it worth a second query, to tell "gone" from "changed"
+    user = db.session.get(User, id)
+    if user is None:
+        abort(404)
+    return render_template('edit_user.html', user=user, error_message=error_message), 409
+
+@users.route('/delete/<int:id>', methods=['POST'])
+def delete_user(id):
+    # POST only, so link prefetchers and crawlers cannot delete anyone
+    deleted = db.session.execute(
+        db.delete(User).where(User.id == id).returning(User.id)
+    ).scalar()
+    if deleted is None:
+        db.session.rollback()
+        abort(404)
+    bump_table_version(db.session)
+    db.session.commit()
+    return redirect(url_for('users.index'))
+
+@users.route('/bulk', methods=['POST'])
+def bulk_users():
+    # The rows ticked on the list, or every user its search matches
+    filters = parse_filters(request.form)
+    if request.form.get('scope') == 'matching' and filters:
+        target = {'filters': filters}
+    else:
+        target = {'ids': request.form.getlist('id', type=int)}
+    chunk_size = current_app.config['USERS_BULK_CHUNK_SIZE']
+    action = request.form.get('action')
+    if action == 'set_role':
+        role = request.form.get('new_role', '')
+        if validate_role(role):
+            abort(400)
+        params = {**target, 'role': role.strip()}
+    elif action == 'delete':
+        params = target
+    else:
+        abort(400)
+    if 'filters' in target:
+        # Too many users to change within the request: `flask worker` does it
+        job = enqueue_if_large(db.session, 'delete_users' if action == 'delete' else action, params, chunk_size)
+        if job is not None:
+            db.session.commit()
+            return render_template('bulk_queued.html', job=job, filters=filters)
+    if action == 'delete':
+        delete_users(db.session, chunk_size, **target)
+    else:
+        set_role(db.session, params['role'], chunk_size, **target)
+    return redirect(url_for('users.index', **filters))
+
+@users.route('/import', methods=['GET', 'POST'])
+def import_users_file():
+    error_message = None
+    report = None
+    job = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if upload is None or not upload.filename:
+            error_message = "Error: Please choose a file to import."
+        else:
+            fmt = request.form.get('format') or format_for(upload.filename)
+            if fmt not in FORMATS:
+                abort(400)
+            if (request.content_length or 0) > current_app.config['USERS_IMPORT_INLINE_MAX_BYTES']:
+                # Too big to import within the request: `flask worker` takes it
+                try:
+                    payload = upload.read().decode('utf-8')
+                except UnicodeDecodeError:
+                    error_message = INVALID_ENCODING_ERROR
+                else:
+                    job = enqueue(db.session, 'import_users', {"format": fmt, "filename": upload.filename}, payload)
+                    db.session.commit()
+            else:
+                stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+                try:
+                    report = import_users(
+                        db.session,
+                        stream,
+                        fmt,
+                        batch_size=request.form.get('batch_size', current_app.config['USERS_IMPORT_BATCH_SIZE'], type=int),
+                    )
+                except UnicodeDecodeError:
+                    # Batches before the bad bytes are already committed
+                    db.session.rollback()
+                    error_message = INVALID_ENCODING_ERROR
+    return render_template('import_users.html', report=report, job=job, error_message=error_message)
+
+@users.route('/export.<fmt>')
+def export_users(fmt):
+    if fmt not in FORMATS:
+        abort(404)
+    rows = select_export_rows(
+        db.session,
+        roles=request.args.getlist('role'),
+        batch_size=current_app.config['USERS_STREAM_BATCH_SIZE'],
+    )
+    chunks = iter_export(rows, fmt, chunk_rows=current_app.config['USERS_EXPORT_CHUNK_ROWS'])
+    response = current_app.response_class(stream_with_context(chunks), mimetype=MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=users.{fmt}'
+    return response
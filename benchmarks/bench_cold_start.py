@@ -0,0 +1,47 @@
+"""Measure worker cold start: importing the package and calling create_app().
+
+Each run is a fresh interpreter, like a new gunicorn worker without
+preload. DB_HOST points at an unroutable address (TEST-NET-1), so any
+attempt to connect at startup would show up as a multi-second outlier.
+
+    python benchmarks/bench_cold_start.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SNIPPET = """
+import time
+started = time.perf_counter()
+from app import create_app
+create_app()
+print(time.perf_counter() - started)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    env = dict(os.environ, DB_HOST="192.0.2.1", DB_PORT="5432", DB_CONNECT_TIMEOUT="5")
+    env.pop("FLASK_TESTING", None)
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SNIPPET], cwd=ROOT, env=env,
+            check=True, capture_output=True, text=True,
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+
+    samples.sort()
+    print(f"runs={len(samples)} median={statistics.median(samples) * 1000:.1f}ms "
+          f"p95={samples[int(len(samples) * 0.95) - 1] * 1000:.1f}ms max={samples[-1] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Insert throughput of /add as the group commit window grows.
+
+Runs the HTTP load test from ``benchmarks/load.py`` with adds only, once
+per ``USERS_GROUP_COMMIT_MS`` value (0 commits every request on its own),
+and prints users inserted per second and latency percentiles for each
+window. A failed add still answers 200 with the error on the form, so
+throughput is counted from the rows that made it into the table.
+
+    python benchmarks/bench_group_commit.py --windows 0,1,2,5,10 --clients 64
+    python benchmarks/bench_group_commit.py --database-url postgresql+psycopg2://user:pw@db/bench
+
+A window only batches requests that are in flight in the same worker at
+the same time, so the workers are gevent workers by default. The gain
+comes from sharing the WAL flush of a commit, so measure it on PostgreSQL
+with ``synchronous_commit`` on; SQLite serializes writers anyway.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app import create_app  # noqa: E402
+from app.models import User, db  # noqa: E402
+from benchmarks.common import bench_config, write_results  # noqa: E402
+from benchmarks.load import run_size  # noqa: E402
+
+
+def count_users(database_url):
+    app = create_app(bench_config(database_url))
+    with app.app_context():
+        count = db.session.scalar(db.select(db.func.count()).select_from(User))
+        db.session.remove()
+        db.engine.dispose()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per run")
+    parser.add_argument("--windows", default="0,1,2,5,10,20", help="comma separated windows in milliseconds")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("GUNICORN_WORKERS", "3")))
+    parser.add_argument("--worker-class", default="gevent")
+    parser.add_argument("--max-batch", type=int, default=100, help="USERS_GROUP_COMMIT_MAX_BATCH")
+    parser.add_argument("--database-url", help="scratch database; a temporary SQLite file by default")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--gunicorn-arg", action="append", default=[], help="extra gunicorn option (repeatable)"
+    )
+    parser.add_argument("--output", default="bench-group-commit.json")
+    args = parser.parse_args()
+    args.mix = {"add": 1}
+
+    print(f"{'window ms':>9} {'inserts/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>6}")
+    runs = []
+    with tempfile.TemporaryDirectory() as scratch:
+        database_url = args.database_url or f"sqlite:///{os.path.join(scratch, 'group_commit.db')}"
+        for window in (float(value) for value in args.windows.split(",")):
+            # gunicorn inherits the environment of this process
+            os.environ["USERS_GROUP_COMMIT_MS"] = str(window)
+            os.environ["USERS_GROUP_COMMIT_MAX_BATCH"] = str(args.max_batch)
+            run = run_size(args, database_url, args.rows)
+            add = run["operations"]["add"]
+            inserted = count_users(database_url) - args.rows
+            run.update(
+                window_ms=window,
+                inserted=inserted,
+                inserts_per_s=round(inserted / args.duration, 1),
+                failed=add["count"] - inserted,
+            )
+            runs.append(run)
+            print(
+                f"{window:>9g} {run['inserts_per_s']:>9} {add['p50_ms']:>8} "
+                f"{add['p95_ms']:>8} {add['p99_ms']:>8} {run['failed'] + add['errors']:>6}"
+            )
+
+    write_results(args.output, {
+        "database": database_url.split(":", 1)[0],
+        "workers": args.workers,
+        "worker_class": args.worker_class,
+        "clients": args.clients,
+        "duration_s": args.duration,
+        "max_batch": args.max_batch,
+        "gunicorn_args": args.gunicorn_arg,
+        "runs": runs,
+    })
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
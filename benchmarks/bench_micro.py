@@ -0,0 +1,111 @@
+"""Micro-benchmarks of the hot paths, run with pytest-benchmark.
+
+Not collected by the normal test run; pass the file explicitly:
+
+    python -m pytest benchmarks/bench_micro.py --benchmark-only \\
+        --benchmark-json=bench-micro.json
+
+BENCH_ROWS sets the table size (default 10000). BENCH_DATABASE_URL runs
+against PostgreSQL (or any other scratch database) instead of a temporary
+SQLite file; its users are replaced by the seed data. Compare two saved
+runs with ``pytest-benchmark compare``.
+"""
+import itertools
+import os
+import sys
+
+import pytest
+from flask import render_template
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault("FLASK_TESTING", "1")
+
+from app import create_app  # noqa: E402
+from app.models import USER_SORT_KEYS, User, db, select_user_rows  # noqa: E402
+from app.pagination import encode_cursor, keyset_page  # noqa: E402
+from app.search import filter_users  # noqa: E402
+from benchmarks.common import bench_config, seed  # noqa: E402
+
+ROWS = int(os.environ.get("BENCH_ROWS", "10000"))
+PER_PAGE = 50
+
+_emails = itertools.count()
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    url = os.environ.get("BENCH_DATABASE_URL") or (
+        f"sqlite:///{tmp_path_factory.mktemp('bench') / 'bench.db'}"
+    )
+    # Every iteration should do the work, not hit the page cache
+    app = create_app(bench_config(url, USERS_CACHE_BACKEND="none"))
+    with app.app_context():
+        db.create_all()
+        seed(ROWS)
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def session(app):
+    yield db.session
+    db.session.rollback()
+
+
+def _new_user():
+    n = next(_emails)
+    return User(name=f"Bench {n}", email=f"bench{n}@example.org", role="user")
+
+
+# Model creation
+def test_build_users(benchmark):
+    benchmark(lambda: [_new_user() for _ in range(1000)])
+
+
+def test_insert_user(benchmark, session):
+    def insert():
+        session.add(_new_user())
+        session.commit()
+
+    benchmark(insert)
+
+
+# List queries
+def test_first_page_by_id(benchmark, session):
+    benchmark(lambda: keyset_page(session, select_user_rows(), USER_SORT_KEYS["id"], PER_PAGE))
+
+
+def test_deep_page_by_name(benchmark, session):
+    cursor = encode_cursor(("Heidi Tester", ROWS))
+    benchmark(lambda: keyset_page(
+        session, select_user_rows(), USER_SORT_KEYS["name"], PER_PAGE, after=cursor
+    ))
+
+
+def test_substring_search(benchmark, session):
+    stmt = filter_users(select_user_rows(), db.engine.dialect.name, {"q": f"tester{ROWS // 2}"})
+    benchmark(lambda: keyset_page(session, stmt, USER_SORT_KEYS["id"], PER_PAGE))
+
+
+def test_all_rows(benchmark, session):
+    benchmark(lambda: session.execute(select_user_rows()).all())
+
+
+# Rendering
+def test_render_index_page(benchmark, app, session):
+    page = keyset_page(session, select_user_rows(), USER_SORT_KEYS["id"], PER_PAGE)
+
+    def render():
+        with app.test_request_context("/"):
+            return render_template(
+                "index.html", users=page.items, page=page, sort="id", per_page=PER_PAGE, filters={}
+            )
+
+    benchmark(render)
+
+
+def test_index_request(benchmark, app):
+    client = app.test_client()
+    benchmark(lambda: client.get(f"/?per_page={PER_PAGE}"))
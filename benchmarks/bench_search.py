@@ -0,0 +1,70 @@
+"""Time the indexed user searches against a large table.
+
+Seeds the users table (an in-memory SQLite database unless
+``--database-url`` points at PostgreSQL) and fetches the first page of
+results for each kind of filter, reporting median and p95 latency.
+Every lookup should stay in single-digit milliseconds at a million rows.
+
+    python benchmarks/bench_search.py --rows 1000000
+    python benchmarks/bench_search.py --database-url postgresql+psycopg2://...
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault("FLASK_TESTING", "1")
+
+from app import create_app  # noqa: E402
+from app.models import USER_SORT_KEYS, db, select_user_rows  # noqa: E402
+from app.pagination import keyset_page  # noqa: E402
+from app.search import filter_users  # noqa: E402
+from benchmarks.common import ROLES, bench_config, seed  # noqa: E402
+
+
+def lookups(total):
+    middle = total // 2
+    return {
+        "email": {"email": f"USER{middle}@EXAMPLE{middle % 97}.COM"},
+        "prefix": {"prefix": f"user{middle}@"},
+        "substring": {"q": f"tester{middle}"},
+        "role": {"role": "auditor"},
+        "role+substring": {"role": ROLES[middle % len(ROLES)], "q": f"tester{middle}"},
+    }
+
+
+def time_lookup(filters, repeat, per_page):
+    stmt = filter_users(select_user_rows(), db.engine.dialect.name, filters)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        page = keyset_page(db.session, stmt, USER_SORT_KEYS["id"], per_page)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return len(page.items), statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--per-page", type=int, default=50)
+    parser.add_argument("--database-url", help="benchmark this database instead of SQLite")
+    args = parser.parse_args()
+
+    app = create_app(bench_config(args.database_url) if args.database_url else None)
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+        print(f"{'lookup':>15} {'rows':>5} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, filters in lookups(args.rows).items():
+            found, p50, p95 = time_lookup(filters, args.repeat, args.per_page)
+            print(f"{name:>15} {found:>5} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare full ORM entities with plain row projection on the user list.
+
+Seeds an in-memory SQLite database and, for every size, loads the whole
+table both ways and renders index.html from the result. Load and render
+time come from a plain run; peak allocations from a second run under
+tracemalloc (which is too slow to time against).
+
+    python benchmarks/bench_user_rows.py --sizes 10000,100000,1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault("FLASK_TESTING", "1")
+
+from flask import render_template  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.models import User, db, select_user_rows  # noqa: E402
+from benchmarks.common import seed  # noqa: E402
+
+app = create_app()
+
+LOADERS = {
+    "orm": lambda: User.query.all(),
+    "rows": lambda: db.session.execute(select_user_rows()).all(),
+}
+
+
+def run(load):
+    with app.test_request_context("/"):
+        started = time.perf_counter()
+        users = load()
+        loaded = time.perf_counter()
+        render_template(
+            "index.html", users=users, page=None, sort="id", per_page=None, filters={}
+        )
+        rendered = time.perf_counter()
+    db.session.remove()
+    return loaded - started, rendered - loaded
+
+
+def peak_allocations(load):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(load)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'mode':>5} {'load s':>8} {'render s':>9} {'peak MiB':>9}")
+    with app.app_context():
+        db.create_all()
+        for size in (int(s) for s in args.sizes.split(",")):
+            seed(size)
+            for mode, load in LOADERS.items():
+                load_s, render_s = run(load)
+                peak = peak_allocations(load) / 2**20
+                print(f"{size:>9} {mode:>5} {load_s:>8.3f} {render_s:>9.3f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
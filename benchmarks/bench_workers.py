@@ -0,0 +1,77 @@
+"""Compare sync and gevent gunicorn workers as concurrent clients grow.
+
+Runs the HTTP load test from ``benchmarks/load.py`` once per worker class
+and client count against the same dataset size, and prints throughput and
+p95 latency side by side.
+
+    python benchmarks/bench_workers.py --clients 1,4,16,64
+    python benchmarks/bench_workers.py --database-url postgresql+psycopg2://user:pw@db/bench
+
+Cooperative workers pay off when requests wait on the network, so run it
+against PostgreSQL, ideally on another host. SQLite queries run inside the
+worker process and block it either way, so there the numbers mostly show
+the cost of the gevent machinery.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.common import write_results  # noqa: E402
+from benchmarks.load import parse_mix, run_size  # noqa: E402
+
+WORKER_CLASSES = ("sync", "gevent")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per run")
+    parser.add_argument("--clients", default="1,4,16,64", help="comma separated client counts")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("GUNICORN_WORKERS", "3")))
+    parser.add_argument(
+        "--mix", type=parse_mix, default=parse_mix("index=90,add=5,edit=5"),
+        help="relative weights of index, add, edit and delete",
+    )
+    parser.add_argument("--database-url", help="scratch database; a temporary SQLite file by default")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--gunicorn-arg", action="append", default=[], help="extra gunicorn option (repeatable)"
+    )
+    parser.add_argument("--output", default="bench-workers.json")
+    args = parser.parse_args()
+
+    print(f"{'clients':>7} " + " ".join(f"{name + ' req/s':>13} {'p95 ms':>8}" for name in WORKER_CLASSES))
+    runs = []
+    with tempfile.TemporaryDirectory() as scratch:
+        database_url = args.database_url or f"sqlite:///{os.path.join(scratch, 'workers.db')}"
+        for clients in (int(count) for count in args.clients.split(",")):
+            line = f"{clients:>7}"
+            for worker_class in WORKER_CLASSES:
+                run_args = argparse.Namespace(**vars(args))
+                run_args.clients, run_args.worker_class = clients, worker_class
+                run = run_size(run_args, database_url, args.rows)
+                run.update(clients=clients, worker_class=worker_class)
+                runs.append(run)
+                total = run["total"]
+                line += f" {total['throughput_rps']:>13} {total['p95_ms']:>8}"
+            print(line)
+
+    write_results(args.output, {
+        "database": database_url.split(":", 1)[0],
+        "workers": args.workers,
+        "duration_s": args.duration,
+        "mix": args.mix,
+        "gunicorn_args": args.gunicorn_arg,
+        "runs": runs,
+    })
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Helpers shared by the benchmarks: app setup, seeding and result files."""
+import datetime
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.database import engine_options  # noqa: E402
+from app.models import User, db  # noqa: E402
+
+ROLES = ("user", "admin", "editor", "viewer", "auditor")
+FIRST_NAMES = ("Alice", "Bob", "Carol", "Dan", "Erin", "Frank", "Grace", "Heidi")
+
+
+def bench_config(database_url, **overrides):
+    """``create_app`` settings for a benchmark database.
+
+    ``database_url`` is a scratch database: seeding replaces its users.
+    """
+    config = {
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "SQLALCHEMY_ENGINE_OPTIONS": (
+            engine_options(os.environ) if database_url.startswith("postgresql") else {}
+        ),
+    }
+    config.update(overrides)
+    return config
+
+
+def seed(total, batch=10000):
+    """Replace the users table with ``total`` generated users."""
+    db.session.execute(db.delete(User))
+    for start in range(0, total, batch):
+        db.session.execute(
+            db.insert(User),
+            [
+                {
+                    "name": f"{FIRST_NAMES[i % len(FIRST_NAMES)]} Tester{i}",
+                    "email": f"user{i}@example{i % 97}.com",
+                    "role": ROLES[i % len(ROLES)],
+                }
+                for i in range(start, min(start + batch, total))
+            ],
+        )
+    db.session.commit()
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def summarize(latencies, elapsed=None):
+    """Count, p50/p95/p99 in ms and, given the run time, requests per second."""
+    ordered = sorted(latencies)
+    summary = {"count": len(ordered)}
+    for name, fraction in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+        value = percentile(ordered, fraction)
+        summary[name] = round(value * 1000, 3) if value is not None else None
+    if elapsed:
+        summary["throughput_rps"] = round(len(ordered) / elapsed, 1)
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(path, results):
+    """Write ``results`` with enough context to compare runs between commits."""
+    document = {
+        "commit": git_revision(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        **results,
+    }
+    with open(path, "w", encoding="utf-8") as output:
+        json.dump(document, output, indent=2)
+        output.write("\n")
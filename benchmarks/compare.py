@@ -0,0 +1,52 @@
+"""Compare two load test result files from benchmarks/load.py.
+
+    python benchmarks/compare.py bench-load-main.json bench-load.json
+
+Prints each latency percentile and throughput of the second run next to
+the first, with the relative change. Only dataset sizes and operations
+present in both files are compared.
+"""
+import argparse
+import json
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def change(old, new):
+    if old in (None, 0) or new is None:
+        return ""
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def rows_of(document):
+    return {run["rows"]: run for run in document["runs"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    print(f"baseline {baseline['commit']}  candidate {candidate['commit']}")
+
+    old_runs, new_runs = rows_of(baseline), rows_of(candidate)
+    print(f"{'rows':>9} {'operation':>10} {'metric':>15} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for rows in sorted(old_runs.keys() & new_runs.keys()):
+        old_ops = dict(old_runs[rows]["operations"], total=old_runs[rows]["total"])
+        new_ops = dict(new_runs[rows]["operations"], total=new_runs[rows]["total"])
+        for operation in [name for name in old_ops if name in new_ops]:
+            for metric in METRICS:
+                old, new = old_ops[operation].get(metric), new_ops[operation].get(metric)
+                print(
+                    f"{rows:>9} {operation:>10} {metric:>15} {old!s:>10} {new!s:>10} "
+                    f"{change(old, new):>8}"
+                )
+
+
+if __name__ == "__main__":
+    main()
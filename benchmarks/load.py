@@ -0,0 +1,242 @@
+"""HTTP load test of the app under gunicorn.
+
+For every dataset size, seeds the database, starts gunicorn with
+``gunicorn.conf.py`` and has concurrent clients replay a mix of index
+views, adds, edits and deletes for a fixed time. Latency percentiles and
+throughput per operation are written to a JSON file; compare two of them
+with ``benchmarks/compare.py``.
+
+    python benchmarks/load.py --rows 1000,100000,1000000 --output bench-load.json
+    python benchmarks/load.py --mix index=90,add=5,edit=5 --clients 16
+    python benchmarks/load.py --database-url postgresql+psycopg2://user:pw@localhost/bench
+    python benchmarks/load.py --worker-class gevent --clients 64
+
+Without ``--database-url`` a temporary SQLite file is used. The database
+is scratch space: its users are replaced by the seed data.
+"""
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app import create_app  # noqa: E402
+from app.models import User, db  # noqa: E402
+from app.pagination import encode_cursor  # noqa: E402
+from benchmarks.common import bench_config, seed, summarize, write_results  # noqa: E402
+
+OPERATIONS = ("index", "add", "edit", "delete")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = int(weight)
+    return mix
+
+
+class Dataset:
+    """The user ids the clients can edit and delete, shared between threads."""
+
+    def __init__(self, ids):
+        self._ids = ids
+        self._lock = threading.Lock()
+        self._added = 0
+
+    # Once every user is deleted, ids 0 are requested and answered with 404
+    def any_id(self):
+        with self._lock:
+            return random.choice(self._ids) if self._ids else 0
+
+    def take_id(self):
+        with self._lock:
+            if not self._ids:
+                return 0
+            index = random.randrange(len(self._ids))
+            self._ids[index], self._ids[-1] = self._ids[-1], self._ids[index]
+            return self._ids.pop()
+
+    def new_email(self):
+        with self._lock:
+            self._added += 1
+            return f"load{self._added}-{os.getpid()}@example.net"
+
+
+def request(connection, method, path, form=None):
+    body, headers = None, {}
+    if form is not None:
+        body = urllib.parse.urlencode(form)
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    if response.getheader("Connection", "").lower() == "close":
+        connection.close()
+    return response.status
+
+
+def run_operation(connection, name, dataset, max_id):
+    if name == "index":
+        cursor = encode_cursor((random.randint(1, max_id),))
+        return request(connection, "GET", f"/?per_page=50&after={cursor}")
+    if name == "add":
+        form = {"name": "Load Tester", "email": dataset.new_email(), "role": "user"}
+        return request(connection, "POST", "/add", form)
+    if name == "edit":
+        form = {"name": "Load Edited", "email": dataset.new_email(), "role": "editor"}
+        return request(connection, "POST", f"/edit/{dataset.any_id()}", form)
+    return request(connection, "POST", f"/delete/{dataset.take_id()}")
+
+
+def client(host, port, mix, dataset, max_id, deadline, results):
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    names, weights = zip(*mix.items())
+    while time.perf_counter() < deadline:
+        name = random.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            status = run_operation(connection, name, dataset, max_id)
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            status = None
+        elapsed = time.perf_counter() - started
+        with results["lock"]:
+            if status is None or status >= 500:
+                results["errors"][name] += 1
+            else:
+                results["latencies"][name].append(elapsed)
+    connection.close()
+
+
+def start_gunicorn(database_url, host, port, workers, worker_class, extra_args):
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_WORKER_CLASS=worker_class,
+    )
+    env.pop("FLASK_TESTING", None)
+    command = [
+        sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+        "-b", f"{host}:{port}", "--log-level", "warning", *extra_args, "app:create_app()",
+    ]
+    server = subprocess.Popen(command, cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=2)
+            if request(connection, "GET", "/") == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn did not come up within 30 seconds")
+
+
+def run_size(args, database_url, rows):
+    app = create_app(bench_config(database_url))
+    with app.app_context():
+        db.create_all()
+        seed(rows)
+        ids = list(db.session.scalars(db.select(User.id)))
+        db.session.remove()
+        db.engine.dispose()
+
+    server = start_gunicorn(
+        database_url, args.host, args.port, args.workers, args.worker_class, args.gunicorn_arg
+    )
+    try:
+        results = {
+            "lock": threading.Lock(),
+            "latencies": defaultdict(list),
+            "errors": defaultdict(int),
+        }
+        dataset, max_id = Dataset(ids), max(ids, default=1)
+        started = time.perf_counter()
+        deadline = started + args.duration
+        threads = [
+            threading.Thread(
+                target=client,
+                args=(args.host, args.port, args.mix, dataset, max_id, deadline, results),
+            )
+            for _ in range(args.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    operations = {}
+    for name in args.mix:
+        operations[name] = summarize(results["latencies"][name], elapsed)
+        operations[name]["errors"] = results["errors"][name]
+    everything = [value for values in results["latencies"].values() for value in values]
+    return {"rows": rows, "total": summarize(everything, elapsed), "operations": operations}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="1000,10000", help="comma separated dataset sizes")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per dataset size")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent HTTP clients")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("GUNICORN_WORKERS", "3")))
+    parser.add_argument(
+        "--worker-class", default=os.getenv("GUNICORN_WORKER_CLASS", "sync"), choices=("sync", "gevent")
+    )
+    parser.add_argument(
+        "--mix", type=parse_mix, default=parse_mix("index=70,add=10,edit=15,delete=5"),
+        help="relative weights of index, add, edit and delete",
+    )
+    parser.add_argument("--database-url", help="scratch database; a temporary SQLite file by default")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--gunicorn-arg", action="append", default=[], help="extra gunicorn option (repeatable)"
+    )
+    parser.add_argument("--output", default="bench-load.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        database_url = args.database_url or f"sqlite:///{os.path.join(scratch, 'load.db')}"
+        runs = []
+        for rows in (int(size) for size in args.rows.split(",")):
+            run = run_size(args, database_url, rows)
+            total = run["total"]
+            print(
+                f"{rows:>9} rows: {total['throughput_rps']:>8} req/s  "
+                f"p50 {total['p50_ms']} ms  p95 {total['p95_ms']} ms  p99 {total['p99_ms']} ms"
+            )
+            runs.append(run)
+
+    write_results(args.output, {
+        "database": database_url.split(":", 1)[0],
+        "workers": args.workers,
+        "worker_class": args.worker_class,
+        "clients": args.clients,
+        "duration_s": args.duration,
+        "mix": args.mix,
+        "gunicorn_args": args.gunicorn_arg,
+        "runs": runs,
+    })
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
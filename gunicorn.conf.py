@@ -0,0 +1,67 @@
+"""Gunicorn settings: gunicorn -c gunicorn.conf.py 'app:create_app()'
+
+GUNICORN_WORKER_CLASS picks the worker type. "sync" (the default) serves
+one request at a time per worker. "gevent" serves up to
+GUNICORN_WORKER_CONNECTIONS requests per worker, each in its own
+greenlet, and switches to another request whenever one waits on the
+network, PostgreSQL included. Every greenlet has its own Flask app
+context, and Flask-SQLAlchemy scopes sessions by app context, so each
+request still gets its own session.
+"""
+import glob
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+if worker_class == "gevent":
+    # Patch before the app is imported (preload_app builds it in the
+    # master), so sockets, locks and the pool's waits are cooperative and
+    # psycopg2 yields to other greenlets while a query runs
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    from psycogreen.gevent import patch_psycopg
+
+    patch_psycopg()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "3"))
+# Seconds a worker may go silent before the master restarts it; a sync
+# worker is silent for as long as one request takes. /events streams end
+# before this (SSE_MAX_STREAM_SECONDS, see app/config.py)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+# Concurrent requests per gevent worker. They share the worker's
+# connection pool, so size DB_POOL_SIZE + DB_MAX_OVERFLOW to match (or use
+# PgBouncer); requests beyond that wait up to DB_POOL_TIMEOUT for a
+# connection
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+# Import and build the app once in the master; workers fork from it
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+# Workers share Prometheus metrics through files in this directory. The
+# pool gauges open theirs when app.metrics is imported, and preload_app
+# imports the app before on_starting runs, so create it right away
+metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if metrics_dir:
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def on_starting(server):
+    # Samples left by a previous run would be added to the new ones
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from app.database import dispose_engines
+
+        # The wsgi callable was built in the master before forking
+        dispose_engines(worker.app.wsgi())
+
+
+def child_exit(server, worker):
+    if metrics_dir:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
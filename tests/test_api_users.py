@@ -0,0 +1,137 @@
+
+import os
+import sys
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    """
+    Configure the app for testing with an in-memory SQLite DB.
+    Create/drop tables around each test so your real users.db is untouched.
+    """
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def _create_user(name="Alice", email="alice@example.com", role="admin"):
+    with app.app_context():
+        u = User(name=name, email=email, role=role)
+        db.session.add(u)
+        db.session.commit()
+        return u.id
+
+
+def test_crud_round_trip():
+    client = app.test_client()
+
+    resp = client.post("/api/users", json={"name": "Alice", "email": "alice@example.com", "role": "admin"})
+    assert resp.status_code == 201
+    user = resp.get_json()
+    assert resp.headers["Location"].endswith(f"/api/users/{user['id']}")
+
+    assert client.get(f"/api/users/{user['id']}").get_json() == user
+
+    resp = client.patch(f"/api/users/{user['id']}", json={"role": "owner"})
+    assert resp.status_code == 200
+    assert resp.get_json()["role"] == "owner"
+
+    assert client.delete(f"/api/users/{user['id']}").status_code == 204
+    resp = client.get(f"/api/users/{user['id']}")
+    assert resp.status_code == 404
+    assert resp.get_json() == {"error": "Error: User not found."}
+
+
+def test_create_reports_validation_and_duplicates():
+    _create_user()
+    client = app.test_client()
+
+    resp = client.post("/api/users", json={"name": "Alice", "email": "alice@example.com", "role": "user"})
+    assert resp.status_code == 409
+    assert resp.get_json()["error"] == "Error: A user with that email already exists."
+
+    resp = client.post("/api/users", json={"name": "x" * 101, "email": "x@example.com", "role": "user"})
+    assert resp.status_code == 400
+
+    assert client.post("/api/users", data="nope").status_code == 400
+
+
+def test_list_is_paginated():
+    for i in range(3):
+        _create_user(name=f"User {i}", email=f"user{i}@example.com")
+    client = app.test_client()
+
+    first = client.get("/api/users?per_page=2").get_json()
+    assert [u["email"] for u in first["users"]] == ["user0@example.com", "user1@example.com"]
+    second = client.get(f"/api/users?per_page=2&after={first['next_cursor']}").get_json()
+    assert [u["email"] for u in second["users"]] == ["user2@example.com"]
+    assert second["next_cursor"] is None
+
+
+def test_batch_applies_items_independently():
+    alice = _create_user()
+    bob = _create_user(name="Bob", email="bob@example.com", role="user")
+    client = app.test_client()
+
+    resp = client.post("/api/users/batch", json={
+        "create": [
+            {"name": "Carol", "email": "carol@example.com", "role": "user"},
+            {"name": "Dup", "email": "bob@example.com", "role": "user"},
+        ],
+        "update": [{"id": alice, "role": "owner"}, {"id": 999, "role": "user"}],
+        "delete": [bob, 998],
+    })
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["committed"] is True
+    assert [r["status"] for r in body["results"]["create"]] == [201, 409]
+    assert [r["status"] for r in body["results"]["update"]] == [200, 404]
+    assert [r["status"] for r in body["results"]["delete"]] == [204, 404]
+
+    with app.app_context():
+        emails = sorted(db.session.scalars(db.select(User.email)))
+        assert emails == ["alice@example.com", "carol@example.com"]
+        assert db.session.get(User, alice).role == "owner"
+
+
+def test_batch_rejects_ids_that_are_not_integers():
+    alice = _create_user()
+    resp = app.test_client().post("/api/users/batch", json={
+        "update": [{"id": [alice], "role": "owner"}, {"id": alice, "role": "owner"}],
+        "delete": [[alice], "1", True],
+    })
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert [r["status"] for r in body["results"]["update"]] == [400, 200]
+    assert [r["status"] for r in body["results"]["delete"]] == [400, 400, 400]
+    with app.app_context():
+        assert db.session.get(User, alice).role == "owner"
+
+
+def test_atomic_batch_rolls_back_on_any_failure():
+    _create_user()
+    client = app.test_client()
+
+    resp = client.post("/api/users/batch", json={
+        "atomic": True,
+        "create": [
+            {"name": "Carol", "email": "carol@example.com", "role": "user"},
+            {"name": "Dup", "email": "alice@example.com", "role": "user"},
+        ],
+    })
+    assert resp.status_code == 409
+    assert resp.get_json()["committed"] is False
+    with app.app_context():
+        assert db.session.scalars(db.select(User.email)).all() == ["alice@example.com"]
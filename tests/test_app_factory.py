@@ -0,0 +1,60 @@
+import os, sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from app import create_app
+from app.models import db
+
+# Each test builds its own app on a temporary on-disk SQLite DB
+@pytest.fixture
+def factory_app(tmp_path):
+    db_path = tmp_path / "factory.db"
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}"})
+    app.db_path = db_path
+    return app
+
+# Test case for lazy initialization
+def test_create_app_does_not_touch_the_database(factory_app):
+    """Building the app must not connect or create the schema."""
+    assert not factory_app.db_path.exists()
+
+def test_db_init_creates_the_schema(factory_app):
+    result = factory_app.test_cli_runner().invoke(args=["db", "init"])
+    assert result.exit_code == 0
+    with factory_app.app_context():
+        tables = inspect(db.engine).get_table_names()
+    assert {"users", "table_versions"} <= set(tables)
+
+    # The app works against the freshly created schema
+    client = factory_app.test_client()
+    client.post("/add", data={"name": "Alice", "email": "alice@example.com", "role": "admin"})
+    assert "alice@example.com" in client.get("/").get_data(as_text=True)
+
+# Test case for additive upgrades of an older schema
+def test_db_upgrade_adds_missing_columns_and_indexes(factory_app):
+    engine = create_engine(f"sqlite:///{factory_app.db_path}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, "
+            "email VARCHAR(120) NOT NULL UNIQUE, role VARCHAR(50) NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO users (name, email, role) VALUES ('Bob', 'bob@example.com', 'user')"))
+    engine.dispose()
+
+    runner = factory_app.test_cli_runner()
+    result = runner.invoke(args=["db", "upgrade"])
+    assert result.exit_code == 0
+    assert "Added column users.updated_at" in result.output
+    assert "Created index ix_users_name_id" in result.output
+    assert "Created table table_versions" in result.output
+
+    with factory_app.app_context():
+        updated_at = db.session.execute(text("SELECT updated_at FROM users")).scalar_one()
+    assert updated_at is not None
+
+    # Running it again is a no-op
+    result = runner.invoke(args=["db", "upgrade"])
+    assert "(0 changes applied)" in result.output
@@ -0,0 +1,151 @@
+import os
+import sys
+
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+from app.jobs import work  # noqa: E402
+from app.models import Job, get_table_version  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    app.config["USERS_BULK_CHUNK_SIZE"] = 2
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+    app.config["USERS_BULK_CHUNK_SIZE"] = 1000
+
+
+def _create_users(count, role="user"):
+    db.session.add_all(
+        User(name=f"User {i}", email=f"user{i}@example.com", role=role) for i in range(count)
+    )
+    db.session.commit()
+
+
+def _roles():
+    db.session.expire_all()
+    return {u.id: u.role for u in db.session.scalars(db.select(User))}
+
+
+# Test cases for the set-based bulk operations
+def test_bulk_delete_by_ids_in_chunks():
+    _create_users(5)
+    version = get_table_version(db.session).version
+    resp = app.test_client().post("/api/users/bulk/delete", json={"ids": [1, 2, 3, 5, 99, 3]})
+    assert resp.status_code == 200
+    assert resp.get_json() == {"deleted": 4}
+    assert list(_roles()) == [4]
+    # One table version bump per chunk, so caches and the change feed see it
+    assert get_table_version(db.session).version == version + 2
+
+
+def test_bulk_set_role_by_filter_skips_users_that_already_have_it():
+    _create_users(3)
+    db.session.execute(db.update(User).where(User.id == 2).values(role="admin"))
+    db.session.commit()
+    client = app.test_client()
+
+    resp = client.post("/api/users/bulk/role", json={"filters": {"role": "user"}, "role": "admin"})
+    assert resp.get_json() == {"updated": 2}
+    assert set(_roles().values()) == {"admin"}
+    assert client.get("/api/users/summary").get_json()["roles"] == {"admin": 3}
+
+    resp = client.post("/api/users/bulk/role", json={"ids": [1, 3], "role": " staff "})
+    assert resp.get_json() == {"updated": 2}
+    assert _roles() == {1: "staff", 2: "admin", 3: "staff"}
+
+
+def test_bulk_change_by_filter_over_chunk_size_is_queued():
+    _create_users(5)
+    db.session.execute(db.update(User).where(User.id == 2).values(role="admin"))
+    db.session.commit()
+    client = app.test_client()
+
+    resp = client.post("/api/users/bulk/role", json={"filters": {"role": "user"}, "role": "admin"})
+    assert resp.status_code == 202
+    job = resp.get_json()
+    assert resp.headers["Location"].endswith(f"/api/jobs/{job['id']}")
+    assert job["kind"] == "set_role" and job["status"] == "queued"
+    assert set(_roles().values()) == {"user", "admin"}
+    work(app, once=True)
+    assert client.get(f"/api/jobs/{job['id']}").get_json()["status"] == "succeeded"
+    assert set(_roles().values()) == {"admin"}
+
+    resp = client.post("/api/users/bulk/delete", json={"filters": {"role": "admin"}})
+    assert resp.status_code == 202
+    assert resp.get_json()["kind"] == "delete_users"
+    work(app, once=True)
+    assert _roles() == {}
+
+
+def test_rename_role():
+    _create_users(2, role="intern")
+    db.session.add(User(name="Boss", email="boss@example.com", role="admin"))
+    db.session.commit()
+    client = app.test_client()
+    resp = client.post("/api/users/bulk/rename-role", json={"from": "intern", "to": "staff"})
+    assert resp.get_json() == {"updated": 2}
+    assert sorted(_roles().values()) == ["admin", "staff", "staff"]
+
+    db.session.add(User(name="Intern", email="intern@example.com", role="staff"))
+    db.session.commit()
+    resp = client.post("/api/users/bulk/rename-role", json={"from": "staff", "to": "team"})
+    assert resp.status_code == 202
+    work(app, once=True)
+    assert sorted(_roles().values()) == ["admin", "team", "team", "team"]
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/api/users/bulk/delete", {}),
+    ("/api/users/bulk/delete", {"ids": [1], "filters": {"role": "user"}}),
+    ("/api/users/bulk/delete", {"filters": {}}),
+    ("/api/users/bulk/delete", {"ids": ["1"]}),
+    ("/api/users/bulk/role", {"ids": [1]}),
+    ("/api/users/bulk/role", {"ids": [1], "role": "x" * 51}),
+    ("/api/users/bulk/rename-role", {"from": "user"}),
+])
+def test_bulk_rejects_invalid_requests(path, body):
+    _create_users(2)
+    resp = app.test_client().post(path, json=body)
+    assert resp.status_code == 400
+    assert resp.get_json()["error"].startswith("Error:")
+    assert _roles() == {1: "user", 2: "user"}
+
+
+def test_index_bulk_actions_on_selected_and_matching_users():
+    _create_users(4)
+    client = app.test_client()
+    html = client.get("/").get_data(as_text=True)
+    assert 'name="id" value="3" form="bulk"' in html
+
+    resp = client.post("/bulk", data={"action": "set_role", "new_role": "admin", "id": ["1", "3"]})
+    assert resp.status_code == 302
+    assert _roles() == {1: "admin", 2: "user", 3: "admin", 4: "user"}
+
+    resp = client.post("/bulk", data={"action": "delete", "role": "user", "scope": "matching"})
+    assert resp.status_code == 302
+    assert resp.headers["Location"].endswith("/?role=user")
+    assert _roles() == {1: "admin", 3: "admin"}
+
+    assert client.post("/bulk", data={"action": "set_role", "id": "1"}).status_code == 400
+
+
+def test_index_bulk_action_on_many_matching_users_is_queued():
+    _create_users(3)
+    client = app.test_client()
+    resp = client.post("/bulk", data={"action": "set_role", "new_role": "admin", "role": "user", "scope": "matching"})
+    assert resp.status_code == 200
+    assert 'href="/api/jobs/1"' in resp.get_data(as_text=True)
+    assert db.session.get(Job, 1).params == {"filters": {"role": "user"}, "role": "admin"}
+    assert set(_roles().values()) == {"user"}
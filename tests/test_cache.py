@@ -0,0 +1,82 @@
+
+import io
+import os
+import sys
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+from app.cache import LRUCache  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    """
+    Configure the app for testing with an in-memory SQLite DB.
+    Create/drop tables around each test so your real users.db is untouched.
+    """
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def _stats(client):
+    return client.get("/stats/cache").get_json()
+
+
+# ---------------------- LRU backend ---------------------- #
+
+def test_lru_expires_and_evicts():
+    now = [0.0]
+    cache = LRUCache(ttl=10, max_entries=2, clock=lambda: now[0])
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+    cache.set("c", "C")  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats() == {"backend": "lru", "hits": 1, "misses": 2, "size": 1}
+
+
+# ---------------------- Index caching ---------------------- #
+
+def test_index_is_served_from_cache_until_a_write():
+    client = app.test_client()
+    before = _stats(client)
+
+    client.get("/")
+    client.get("/")
+    after = _stats(client)
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+    client.post("/add", data={"name": "Alice", "email": "alice@example.com", "role": "admin"})
+    assert "alice@example.com" in client.get("/").get_data(as_text=True)
+    assert _stats(client)["misses"] - after["misses"] == 1
+
+
+def test_bulk_writes_invalidate_the_cache():
+    client = app.test_client()
+    client.get("/")
+
+    resp = client.post(
+        "/import",
+        data={"file": (io.BytesIO(b"name,email,role\nBob,bob@example.com,user\n"), "users.csv")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200
+    assert "bob@example.com" in client.get("/").get_data(as_text=True)
+
+    with app.app_context():
+        bob = db.session.scalars(db.select(User.id)).one()
+    assert client.delete(f"/api/users/{bob}").status_code == 204
+    assert "bob@example.com" not in client.get("/").get_data(as_text=True)
@@ -0,0 +1,125 @@
+import gzip
+import os
+import sys
+import zlib
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def _create_users(count):
+    with app.app_context():
+        db.session.add_all(
+            User(name=f"User {n}", email=f"user{n}@example.com", role="user") for n in range(count)
+        )
+        db.session.commit()
+
+
+def _brotli():
+    return pytest.importorskip("brotli")
+
+
+# Test cases for content negotiation
+def test_large_pages_shrink_about_tenfold_with_gzip():
+    _create_users(500)
+    client = app.test_client()
+    plain = client.get("/?per_page=500")
+    resp = client.get("/?per_page=500", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert gzip.decompress(resp.data) == plain.data
+    assert len(resp.data) * 8 < len(plain.data)
+
+
+def test_brotli_is_preferred_when_accepted():
+    brotli = _brotli()
+    _create_users(100)
+    client = app.test_client()
+    plain = client.get("/api/users?per_page=100")
+    resp = client.get("/api/users?per_page=100", headers={"Accept-Encoding": "gzip, br"})
+    assert resp.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(resp.data) == plain.data
+
+
+def test_small_and_unaccepted_responses_are_not_compressed():
+    client = app.test_client()
+    assert "Content-Encoding" not in client.get("/api/users", headers={"Accept-Encoding": "gzip"}).headers
+    _create_users(100)
+    assert "Content-Encoding" not in client.get("/").headers
+    assert "Content-Encoding" not in client.get("/", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_streamed_responses_are_compressed_chunk_by_chunk():
+    _create_users(300)
+    client = app.test_client()
+    plain = client.get("/export.csv")
+    resp = client.get("/export.csv", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in resp.headers
+    assert gzip.decompress(resp.data) == plain.data
+    assert plain.data.startswith(b"id,name,email,role")
+
+
+def test_compression_level_is_configurable(monkeypatch):
+    _create_users(200)
+    client = app.test_client()
+    sizes = {}
+    for level in (1, 9):
+        monkeypatch.setitem(app.config, "COMPRESS_LEVEL", level)
+        resp = client.get("/?per_page=200", headers={"Accept-Encoding": "gzip"})
+        sizes[level] = len(resp.data)
+        zlib.decompress(resp.data, 16 + zlib.MAX_WBITS)
+    assert sizes[9] < sizes[1]
+
+
+# Test case for validators of compressed responses
+def test_compressed_responses_revalidate_with_weak_etags():
+    _create_users(100)
+    client = app.test_client()
+    headers = {"Accept-Encoding": "gzip"}
+    resp = client.get("/", headers=headers)
+    etag = resp.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    cached = client.get("/", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+
+
+# Test cases for fingerprinted static files
+def test_static_urls_are_fingerprinted_and_immutable():
+    client = app.test_client()
+    page = client.get("/").get_data(as_text=True)
+    version = app.extensions["static_hashes"]["style.css"]
+    assert f"/static/style.css?v={version}" in page
+
+    resp = client.get(f"/static/style.css?v={version}")
+    assert resp.status_code == 200
+    assert resp.cache_control.immutable
+    assert resp.cache_control.max_age == 365 * 24 * 60 * 60
+    assert not resp.cache_control.no_cache
+    resp.close()
+
+
+def test_unversioned_static_urls_still_revalidate():
+    client = app.test_client()
+    for url in ("/static/style.css", "/static/style.css?v=outdated"):
+        resp = client.get(url)
+        assert not resp.cache_control.immutable
+        resp.close()
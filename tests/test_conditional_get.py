@@ -0,0 +1,99 @@
+
+import os
+import sys
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    """
+    Configure the app for testing with an in-memory SQLite DB.
+    Create/drop tables around each test so your real users.db is untouched.
+    """
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def _create_user(name="Alice", email="alice@example.com", role="admin"):
+    with app.app_context():
+        u = User(name=name, email=email, role=role)
+        db.session.add(u)
+        db.session.commit()
+        return u.id
+
+
+def test_index_revalidates_until_a_write():
+    client = app.test_client()
+    resp = client.get("/")
+    etag = resp.headers["ETag"]
+    assert resp.status_code == 200
+    assert "Last-Modified" in resp.headers
+    assert not etag.startswith("W/")
+
+    resp = client.get("/", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.get_data() == b""
+    assert resp.headers["ETag"] == etag
+
+    # Different query parameters are different representations
+    assert client.get("/?sort=name", headers={"If-None-Match": etag}).status_code == 200
+
+    _create_user()
+    resp = client.get("/", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+
+def test_index_honours_if_modified_since():
+    client = app.test_client()
+    last_modified = client.get("/").headers["Last-Modified"]
+    assert client.get("/", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+
+def test_edit_page_revalidates_per_row():
+    alice = _create_user()
+    bob = _create_user(name="Bob", email="bob@example.com", role="user")
+    client = app.test_client()
+    etag = client.get(f"/edit/{alice}").headers["ETag"]
+    assert client.get(f"/edit/{alice}", headers={"If-None-Match": etag}).status_code == 304
+
+    # A write to another row leaves this one's ETag alone
+    client.post(f"/edit/{bob}", data={"name": "Bob", "email": "bob@example.com", "role": "owner"})
+    assert client.get(f"/edit/{alice}", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post(f"/edit/{alice}", data={"name": "Alice", "email": "alice@example.com", "role": "owner"})
+    assert client.get(f"/edit/{alice}", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_edit_page_etag_is_not_reused_by_a_new_user_with_the_same_id():
+    _create_user(name="Bob", email="bob@example.com", role="user")
+    alice = _create_user()
+    client = app.test_client()
+    etag = client.get(f"/edit/{alice}").headers["ETag"]
+
+    # SQLite hands the highest id out again once its row is gone
+    client.post(f"/delete/{alice}")
+    assert _create_user(name="Carol", email="carol@example.com", role="user") == alice
+    resp = client.get(f"/edit/{alice}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert "Carol" in resp.get_data(as_text=True)
+
+
+def test_api_endpoints_revalidate():
+    alice = _create_user()
+    client = app.test_client()
+    for path in ("/api/users", f"/api/users/{alice}"):
+        etag = client.get(path).headers["ETag"]
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,70 @@
+import os, sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool
+from app.app import app
+from app.config import load_config
+from app.database import InstrumentedQueuePool, engine_options, pool_status
+
+# Test cases for environment driven engine options
+def test_engine_options_defaults():
+    options = engine_options({})
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == 5 and options["max_overflow"] == 5
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"]["options"] == "-c statement_timeout=5000"
+
+def test_engine_options_from_env():
+    options = engine_options({
+        "DB_POOL_SIZE": "2", "DB_MAX_OVERFLOW": "0", "DB_POOL_PRE_PING": "false",
+        "DB_STATEMENT_TIMEOUT_MS": "0",
+    })
+    assert options["pool_size"] == 2 and options["max_overflow"] == 0
+    assert options["pool_pre_ping"] is False
+    assert "options" not in options["connect_args"]
+
+def test_pgbouncer_mode_leaves_pooling_to_pgbouncer():
+    options = engine_options({"DB_PGBOUNCER": "1"})
+    assert options["poolclass"] is NullPool
+    assert "options" not in options["connect_args"]
+    assert "pool_size" not in options
+
+def test_database_url_overrides_the_db_parts():
+    config = load_config({"DATABASE_URL": "sqlite:////tmp/users.db", "DB_HOST": "db"})
+    assert config["SQLALCHEMY_DATABASE_URI"] == "sqlite:////tmp/users.db"
+    # PostgreSQL pool options would be rejected by SQLite
+    assert "SQLALCHEMY_ENGINE_OPTIONS" not in config
+
+    config = load_config({"DATABASE_URL": "postgresql+psycopg2://u:p@db:5432/users"})
+    assert config["SQLALCHEMY_ENGINE_OPTIONS"]["poolclass"] is InstrumentedQueuePool
+
+# Test case for pool instrumentation
+def test_pool_records_checkout_waits_and_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    held = engine.connect()
+    status = pool_status(engine)
+    assert status["checked_out"] == 1 and status["size"] == 1
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    held.close()
+
+    status = pool_status(engine)
+    assert status["checkouts"] == 1
+    assert status["timeouts"] == 1
+    assert status["wait_seconds_max"] >= 0.05
+
+    engine.dispose()
+    assert pool_status(engine)["timeouts"] == 1
+
+def test_pool_stats_endpoint():
+    resp = app.test_client().get("/stats/pool")
+    assert resp.status_code == 200
+    assert "pool" in resp.get_json()
@@ -3,6 +3,7 @@ import os
 import sys
 import re
 import pytest
+from sqlalchemy import event
 
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -98,3 +99,61 @@ def test_edit_user_404_when_not_found():
     client = app.test_client()
     resp = client.get("/edit/999999")
     assert resp.status_code == 404
+
+
+def _statements(run):
+    """Run ``run`` and return the SQL statements it sent to the database."""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def test_edit_user_post_writes_with_a_single_update():
+    user_id = _create_user()
+    client = app.test_client()
+
+    statements = _statements(lambda: client.post(
+        f"/edit/{user_id}",
+        data={"name": "Alice", "email": "alice@example.com", "role": "owner", "version": "1"},
+    ))
+    users = [s for s in statements if re.search(r"\busers\b", s) and "table_versions" not in s]
+    assert len(users) == 1 and users[0].startswith("UPDATE users")
+
+
+def test_edit_user_post_rejects_stale_version():
+    user_id = _create_user()
+    client = app.test_client()
+    form = {"name": "Alice", "email": "alice@example.com", "version": "1"}
+
+    first = client.post(f"/edit/{user_id}", data=dict(form, role="owner"))
+    assert first.status_code == 302
+
+    second = client.post(f"/edit/{user_id}", data=dict(form, role="viewer"))
+    assert second.status_code == 409
+    html = second.get_data(as_text=True)
+    assert "Someone else changed this user" in html
+    # The form is refilled with the stored values and the current version
+    assert 'value="owner"' in html
+    assert 'name="version" value="2"' in html
+
+    with app.app_context():
+        assert db.session.get(User, user_id).role == "owner"
+
+
+def test_edit_user_post_404_when_not_found():
+    client = app.test_client()
+    resp = client.post(
+        "/edit/999999",
+        data={"name": "Nobody", "email": "nobody@example.com", "role": "user", "version": "1"},
+    )
+    assert resp.status_code == 404
@@ -0,0 +1,79 @@
+
+import json
+import os
+import sys
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    """
+    Configure the app for testing with an in-memory SQLite DB.
+    Create/drop tables around each test so your real users.db is untouched.
+    """
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(name="Alice", email="alice@example.com", role="admin"),
+            User(name="Bob", email="bob@example.com", role="user"),
+            User(name="Carol", email="carol@example.com", role="user"),
+        ])
+        db.session.commit()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def test_export_csv_streams_in_chunks(monkeypatch):
+    monkeypatch.setitem(app.config, "USERS_EXPORT_CHUNK_ROWS", 2)
+    client = app.test_client()
+    resp = client.get("/export.csv")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.headers["Content-Type"].startswith("text/csv")
+    assert "attachment" in resp.headers["Content-Disposition"]
+
+    chunks = list(resp.response)
+    assert len(chunks) == 2
+    lines = b"".join(chunks).decode().splitlines()
+    assert lines[0] == "id,name,email,role"
+    assert lines[1:] == [
+        "1,Alice,alice@example.com,admin",
+        "2,Bob,bob@example.com,user",
+        "3,Carol,carol@example.com,user",
+    ]
+
+
+def test_export_jsonl_filters_by_role():
+    client = app.test_client()
+    resp = client.get("/export.jsonl?role=user")
+    assert resp.status_code == 200
+    records = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [r["email"] for r in records] == ["bob@example.com", "carol@example.com"]
+    assert records[0] == {"id": 2, "name": "Bob", "email": "bob@example.com", "role": "user"}
+
+
+def test_export_unknown_format_is_404():
+    assert app.test_client().get("/export.xml").status_code == 404
+
+
+def test_export_cli_round_trips_through_import(tmp_path):
+    path = tmp_path / "users.csv"
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["users", "export", "--role", "admin", "--output", str(path)])
+    assert result.exit_code == 0
+    assert path.read_text().splitlines() == ["id,name,email,role", "1,Alice,alice@example.com,admin"]
+
+    db.session.execute(db.delete(User))
+    db.session.commit()
+    result = runner.invoke(args=["users", "import", str(path)])
+    assert "Imported 1 users, 0 rejected." in result.output
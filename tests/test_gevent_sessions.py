@@ -0,0 +1,41 @@
+import os, sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+from app import create_app
+from app.models import User, db
+
+gevent = pytest.importorskip("gevent")
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'gevent.db'}"})
+    with app.app_context():
+        db.create_all()
+    return app
+
+# Test case for session scoping under the gevent worker
+def test_each_greenlet_gets_its_own_session(app):
+    """Interleaved requests must not share pending objects or transactions."""
+    def handle(n):
+        with app.app_context():
+            session = db.session()
+            session.add(User(name=f"Greenlet {n}", email=f"g{n}@example.com", role="user"))
+            # Let the other greenlets run between the add and the commit
+            gevent.sleep(0)
+            pending = sorted(user.email for user in session.new)
+            assert db.session() is session
+            session.commit()
+            db.session.remove()
+            return id(session), pending
+
+    greenlets = [gevent.spawn(handle, n) for n in range(5)]
+    gevent.joinall(greenlets, raise_error=True)
+    results = [greenlet.value for greenlet in greenlets]
+
+    assert len({session_id for session_id, _ in results}) == 5
+    assert [pending for _, pending in results] == [[f"g{n}@example.com"] for n in range(5)]
+    with app.app_context():
+        assert db.session.query(User).count() == 5
@@ -0,0 +1,87 @@
+import os
+import sys
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+from app.group_commit import GroupCommitter  # noqa: E402
+from app.models import DUPLICATE_EMAIL_ERROR  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+    app.extensions.pop("group_commit", None)
+
+
+def _values(name, email=None):
+    return {"name": name, "email": email or f"{name.lower()}@example.com", "role": "user"}
+
+
+def _emails():
+    db.session.expire_all()
+    return sorted(db.session.scalars(db.select(User.email)))
+
+
+# Test cases for group commit
+def test_flush_reports_each_user():
+    db.session.add(User(name="Old", email="old@example.com", role="user"))
+    db.session.commit()
+    batch = [
+        (_values("Alice"), Future()),
+        (_values("Old"), Future()),
+        (_values("Bob"), Future()),
+        (_values("Bobby", "bob@example.com"), Future()),
+    ]
+    GroupCommitter(app, 5, 100).flush(batch)
+
+    assert [future.result() for _, future in batch] == [None, DUPLICATE_EMAIL_ERROR, None, DUPLICATE_EMAIL_ERROR]
+    assert _emails() == ["alice@example.com", "bob@example.com", "old@example.com"]
+
+
+def test_concurrent_creates_share_a_transaction():
+    committer = GroupCommitter(app, 200, 100)
+    batches = []
+    flush = committer.flush
+    committer.flush = lambda batch: (batches.append(len(batch)), flush(batch))
+    results = {}
+
+    def create(name):
+        results[name] = committer.create(_values(name))
+
+    threads = [threading.Thread(target=create, args=(f"User{i}",)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(results.values()) == {None}
+    assert sum(batches) == 5
+    assert len(batches) < 5
+    assert len(_emails()) == 5
+
+
+def test_add_route_uses_group_commit():
+    app.extensions["group_commit"] = GroupCommitter(app, 1, 100)
+    client = app.test_client()
+    resp = client.post("/add", data=_values("Alice"))
+    assert resp.status_code == 302
+    assert _emails() == ["alice@example.com"]
+
+    resp = client.post("/add", data=_values("Alice"))
+    assert resp.status_code == 200
+    assert DUPLICATE_EMAIL_ERROR in resp.get_data(as_text=True)
+    assert _emails() == ["alice@example.com"]
@@ -0,0 +1,107 @@
+
+import io
+import os
+import sys
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    """
+    Configure the app for testing with an in-memory SQLite DB.
+    Create/drop tables around each test so your real users.db is untouched.
+    """
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def _emails():
+    with app.app_context():
+        return sorted(db.session.scalars(db.select(User.email)))
+
+
+def test_import_csv_upload_reports_bad_rows_and_keeps_the_rest():
+    """
+    A duplicate (in the DB and inside the file), an over-length name and a
+    missing role are rejected per line; every other row is inserted even
+    though they share batches with the bad ones.
+    """
+    with app.app_context():
+        db.session.add(User(name="Old", email="old@example.com", role="user"))
+        db.session.commit()
+
+    csv_data = "\n".join([
+        "name,email,role",
+        "Alice,alice@example.com,admin",
+        "Old Again,old@example.com,user",
+        f"{'x' * 101},long@example.com,user",
+        "Bob,bob@example.com,user",
+        "Alice Twin,alice@example.com,user",
+        "Carol,carol@example.com,",
+        "Dan,dan@example.com,user",
+    ])
+    client = app.test_client()
+    resp = client.post(
+        "/import",
+        data={"file": (io.BytesIO(csv_data.encode()), "users.csv"), "batch_size": "2"},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200
+    html = resp.get_data(as_text=True)
+    assert "Imported 3 users, 4 rejected." in html
+    assert "A user with that email already exists." in html
+    assert "Some data is too long" in html
+    assert "Missing required field &#39;role&#39;" in html
+
+    assert _emails() == [
+        "alice@example.com", "bob@example.com", "dan@example.com", "old@example.com"
+    ]
+
+
+def test_import_upload_that_is_not_utf8_is_reported():
+    resp = app.test_client().post(
+        "/import",
+        data={"file": (io.BytesIO("name,email,role\nJosé,jose@example.com,user\n".encode("latin-1")), "users.csv")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200
+    assert "Error: The file is not valid UTF-8." in resp.get_data(as_text=True)
+    assert _emails() == []
+
+
+def test_import_jsonl_cli(tmp_path):
+    path = tmp_path / "users.jsonl"
+    path.write_text(
+        '{"name": "Alice", "email": "alice@example.com", "role": "admin"}\n'
+        "not json\n"
+        '{"name": "Bob", "email": "bob@example.com", "role": "user"}\n'
+    )
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["users", "import", str(path), "--batch-size", "1"])
+    assert result.exit_code == 0
+    assert "Imported 2 users, 1 rejected." in result.output
+    assert "line 2: Error: The line is not a valid JSON object." in result.output
+    assert _emails() == ["alice@example.com", "bob@example.com"]
+
+
+def test_import_cli_reports_a_file_that_is_not_utf8(tmp_path):
+    rows = "".join(f"User {i},user{i}@example.com,user\n" for i in range(1000))
+    path = tmp_path / "users.csv"
+    path.write_bytes(("name,email,role\n" + rows + "José,jose@example.com,user\n").encode("latin-1"))
+    result = app.test_cli_runner().invoke(args=["users", "import", str(path), "--batch-size", "100"])
+    assert result.exit_code == 1
+    imported = len(_emails())
+    assert 0 < imported < 1000
+    assert f"Error: The file is not valid UTF-8. {imported} users were imported before it." in result.output
@@ -161,7 +161,7 @@ def test_delete_user_removes_and_redirects_then_absent_on_index():
     client = app.test_client()
 
     # Perform deletion and follow redirect back to index
-    resp = client.get(f"/delete/{user_id}", follow_redirects=True)
+    resp = client.post(f"/delete/{user_id}", follow_redirects=True)
     assert resp.status_code == 200
 
     html = resp.get_data(as_text=True)
@@ -182,9 +182,17 @@ def test_edit_404_when_user_not_found():
     assert resp.status_code == 404
 
 
+def test_delete_is_not_reachable_by_get():
+    user_id = _create_user(name="Bob", email="bob@example.com", role="user")
+    client = app.test_client()
+    assert client.get(f"/delete/{user_id}").status_code == 405
+    with app.app_context():
+        assert db.session.get(User, user_id) is not None
+
+
 def test_delete_404_when_user_not_found():
     client = app.test_client()
-    resp = client.get("/delete/999999")
+    resp = client.post("/delete/999999")
     assert resp.status_code == 404
 
 
@@ -198,7 +206,7 @@ def test_full_http_flow_add_edit_delete():
     - POST /add (Bob)
     - GET /edit/<alice_id> (prefilled)
     - POST /edit/<alice_id> (update)
-    - GET /delete/<bob_id> (remove)
+    - POST /delete/<bob_id> (remove)
     - GET index (final state)
     """
     client = app.test_client()
@@ -242,7 +250,7 @@ def test_full_http_flow_add_edit_delete():
     assert r.status_code in (301, 302)
 
     # Delete Bob
-    r = client.get(f"/delete/{bob_id}")
+    r = client.post(f"/delete/{bob_id}")
     assert r.status_code in (301, 302)
 
     # Final index reflects updates
@@ -0,0 +1,195 @@
+import io
+import os
+import sys
+from datetime import timedelta
+
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+from app.jobs import JobContext, LeaseLost, claim_job, run_job, work  # noqa: E402
+from app.models import Job, utcnow  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    app.config["JOBS_CHUNK_SIZE"] = 2
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+    app.config["JOBS_CHUNK_SIZE"] = 1000
+
+
+def _create_users(count, role="user"):
+    db.session.add_all(
+        User(name=f"User {i}", email=f"user{i}@example.com", role=role) for i in range(count)
+    )
+    db.session.commit()
+
+
+def _job(id):
+    db.session.expire_all()
+    return db.session.get(Job, id)
+
+
+# Test cases for queueing and running jobs
+def test_set_role_job_runs_in_chunks():
+    _create_users(5)
+    client = app.test_client()
+    resp = client.post("/api/jobs", json={"kind": "set_role", "params": {"filters": {"prefix": "User"}, "role": "admin"}})
+    assert resp.status_code == 202
+    job_id = resp.get_json()["id"]
+    assert resp.headers["Location"].endswith(f"/api/jobs/{job_id}")
+    assert resp.get_json()["status"] == "queued"
+
+    work(app, once=True)
+
+    body = client.get(f"/api/jobs/{job_id}").get_json()
+    assert body["status"] == "succeeded"
+    assert body["progress"] == {"done": 5, "total": 5}
+    assert body["result"] == {"updated": 5}
+    assert {u.role for u in db.session.scalars(db.select(User))} == {"admin"}
+
+
+def test_delete_job_requires_a_filter():
+    client = app.test_client()
+    resp = client.post("/api/jobs", json={"kind": "delete_users", "params": {"filters": {}}})
+    assert resp.status_code == 400
+    resp = client.post("/api/jobs", json={"kind": "drop_table", "params": {}})
+    assert resp.status_code == 400
+    assert db.session.scalar(db.select(db.func.count()).select_from(Job)) == 0
+
+
+def test_delete_job_resumes_after_lost_worker():
+    _create_users(5)
+    client = app.test_client()
+    job_id = client.post("/api/jobs", json={"kind": "delete_users", "params": {"filters": {"role": "user"}}}).get_json()["id"]
+
+    # A worker commits one chunk, then dies
+    job = claim_job(db.session, "dead-worker", 60)
+    context = JobContext(db.session, job, "dead-worker", 60, 2)
+    ids = db.session.scalars(db.select(User.id).order_by(User.id).limit(2)).all()
+    db.session.execute(User.__table__.delete().where(User.id.in_(ids)))
+    context.checkpoint({"last_id": ids[-1]}, len(ids))
+    db.session.execute(db.update(Job).where(Job.id == job_id).values(lease_until=utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+    work(app, once=True)
+
+    job = _job(job_id)
+    assert job.status == "succeeded"
+    assert job.attempts == 2
+    assert job.done == 5
+    assert db.session.scalar(db.select(db.func.count()).select_from(User)) == 0
+
+
+def test_checkpoint_after_lease_lost_rolls_back_chunk():
+    _create_users(2)
+    job_id = app.test_client().post(
+        "/api/jobs", json={"kind": "set_role", "params": {"role": "admin"}}
+    ).get_json()["id"]
+    job = claim_job(db.session, "slow-worker", 60)
+    db.session.execute(db.update(Job).where(Job.id == job_id).values(worker="other-worker"))
+    db.session.commit()
+
+    context = JobContext(db.session, job, "slow-worker", 60, 2)
+    db.session.execute(db.update(User).values(role="admin"))
+    with pytest.raises(LeaseLost):
+        context.checkpoint({"last_id": 2}, 2)
+    assert {u.role for u in db.session.scalars(db.select(User))} == {"user"}
+
+
+def test_cancel_job():
+    _create_users(3)
+    client = app.test_client()
+    job_id = client.post("/api/jobs", json={"kind": "set_role", "params": {"role": "admin"}}).get_json()["id"]
+    resp = client.post(f"/api/jobs/{job_id}/cancel")
+    assert resp.status_code == 200
+    assert resp.get_json()["status"] == "cancelled"
+    assert client.post(f"/api/jobs/{job_id}/cancel").status_code == 409
+
+    work(app, once=True)
+    assert {u.role for u in db.session.scalars(db.select(User))} == {"user"}
+    assert client.post("/api/jobs/999/cancel").status_code == 404
+
+
+def test_failing_job_is_not_retried():
+    client = app.test_client()
+    job_id = client.post("/api/jobs", json={"kind": "set_role", "params": {"role": "admin"}}).get_json()["id"]
+    job = claim_job(db.session, "worker", 60)
+    db.session.execute(db.update(Job).where(Job.id == job_id).values(kind="removed_kind"))
+    db.session.commit()
+    db.session.refresh(job)
+    run_job(db.session, job, "worker", app.config)
+
+    job = _job(job_id)
+    assert job.status == "failed"
+    assert "removed_kind" in job.error
+    assert claim_job(db.session, "worker", 60) is None
+
+
+def test_import_job_reports_rejected_lines():
+    _create_users(1)
+    data = "name,email,role\nAlice,alice@example.com,admin\nBob,user0@example.com,user\n,nobody@example.com,user\nCarol,carol@example.com,user\n"
+    client = app.test_client()
+    resp = client.post(
+        "/api/jobs/import",
+        data={"file": (io.BytesIO(data.encode()), "users.csv")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 202
+    job_id = resp.get_json()["id"]
+
+    work(app, once=True)
+
+    body = client.get(f"/api/jobs/{job_id}").get_json()
+    assert body["status"] == "succeeded"
+    assert body["progress"] == {"done": 4, "total": 4}
+    assert body["result"]["inserted"] == 2
+    assert body["result"]["rejected"] == 2
+    assert [line for line, _ in body["result"]["errors"]] == [3, 4]
+    # The upload is neither loaded with the job nor kept after it
+    job = _job(job_id)
+    assert "payload" not in job.__dict__
+    assert job.payload is None
+
+
+def test_import_job_counts_rejects_after_the_last_batch_as_done():
+    data = "name,email,role\nAlice,alice@example.com,admin\nBob,bob@example.com,user\n,nobody@example.com,user\n"
+    client = app.test_client()
+    job_id = client.post(
+        "/api/jobs/import",
+        data={"file": (io.BytesIO(data.encode()), "users.csv")},
+        content_type="multipart/form-data",
+    ).get_json()["id"]
+
+    work(app, once=True)
+
+    body = client.get(f"/api/jobs/{job_id}").get_json()
+    assert body["status"] == "succeeded"
+    assert body["progress"] == {"done": 3, "total": 3}
+    assert body["result"]["rejected"] == 1
+
+
+def test_large_upload_to_import_page_is_queued():
+    app.config["USERS_IMPORT_INLINE_MAX_BYTES"] = 10
+    try:
+        resp = app.test_client().post(
+            "/import",
+            data={"file": (io.BytesIO(b"name,email,role\nAlice,alice@example.com,admin\n"), "users.csv")},
+            content_type="multipart/form-data",
+        )
+    finally:
+        app.config["USERS_IMPORT_INLINE_MAX_BYTES"] = 1024 * 1024
+    assert resp.status_code == 200
+    assert b"job 1" in resp.data
+    assert _job(1).kind == "import_users"
+    assert db.session.scalar(db.select(db.func.count()).select_from(User)) == 0
@@ -0,0 +1,151 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+from app.changes import head_cursor  # noqa: E402
+from app.config import load_config  # noqa: E402
+from app.events import ChangeHub  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    app.config["SSE_ENABLED"] = True
+    hub = app.extensions["change_hub"]
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+    app.extensions["change_hub"] = hub
+    app.config["SSE_ENABLED"] = False
+
+
+@pytest.fixture
+def hub():
+    """A hub driven by the test instead of its background thread."""
+    hub = ChangeHub(app, poll_interval=0.01, buffer_size=3, fetch_size=2)
+    hub._pid = os.getpid()
+    hub._publish([], head_cursor(db.session))
+    app.extensions["change_hub"] = hub
+    return hub
+
+
+def _events(resp):
+    """Parse a finished SSE response into (event, id, data) tuples."""
+    events = []
+    for block in resp.get_data(as_text=True).split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], fields.get("id"), json.loads(fields["data"])))
+    return events
+
+
+def _stream(headers=None, **params):
+    saved = {name: app.config[name] for name in ("SSE_KEEPALIVE_SECONDS", "SSE_MAX_STREAM_SECONDS")}
+    app.config.update(SSE_KEEPALIVE_SECONDS=0.01, SSE_MAX_STREAM_SECONDS=0.05)
+    try:
+        resp = app.test_client().get("/events", query_string=params, headers=headers or {})
+        # The stream runs as the body is read
+        resp.get_data()
+        return resp
+    finally:
+        app.config.update(saved)
+
+
+def _add(name):
+    client = app.test_client()
+    client.post("/add", data={"name": name, "email": f"{name.lower()}@example.com", "role": "user"})
+    return db.session.scalar(db.select(User.id).where(User.name == name))
+
+
+# Test cases for the hub
+def test_hub_hands_out_changes_after_a_cursor(hub):
+    start = hub.head()
+    alice = _add("Alice")
+    bob = _add("Bob")
+    hub._fetch()
+
+    entries = hub.wait(start, timeout=0)
+    assert [(change["op"], change["id"]) for _, change in entries] == [("upsert", alice), ("upsert", bob)]
+    assert [change["id"] for _, change in hub.wait(entries[0][0], timeout=0)] == [bob]
+    assert hub.wait(hub.head(), timeout=0) == []
+
+
+def test_hub_reports_cursors_older_than_its_buffer(hub):
+    start = hub.head()
+    for name in ("A", "B", "C", "D"):
+        _add(name)
+    hub._fetch()
+    # Only the last three changes are kept
+    assert hub.wait(start, timeout=0) is None
+
+
+# Test cases for /events
+def test_stream_sends_changes_after_since(hub):
+    since = hub.head()
+    alice = _add("Alice")
+    bob = _add("Bob")
+    app.test_client().post(f"/delete/{alice}")
+    hub._fetch()
+
+    resp = _stream(since=since)
+    assert resp.mimetype == "text/event-stream"
+    assert resp.headers["Cache-Control"] == "no-cache"
+    events = _events(resp)
+    assert [(name, data["id"]) for name, _, data in events] == [("upsert", bob), ("delete", alice)]
+    assert events[0][2]["user"]["email"] == "bob@example.com"
+    # Every event carries its cursor, for Last-Event-ID
+    assert all(id for _, id, _ in events)
+
+
+def test_stream_catches_up_from_the_database_after_last_event_id(hub):
+    since = hub.head()
+    ids = [_add(name) for name in ("A", "B", "C", "D", "E")]
+    hub._fetch()
+
+    first = _events(_stream(since=since))
+    assert [data["id"] for _, _, data in first] == ids
+
+    resp = _stream(headers={"Last-Event-ID": first[1][1]})
+    assert [data["id"] for _, _, data in _events(resp)] == ids[2:]
+
+
+def test_stream_resets_on_a_foreign_cursor(hub):
+    resp = _stream(headers={"Last-Event-ID": "not-a-cursor"})
+    assert [name for name, _, _ in _events(resp)] == ["reset"]
+
+
+def test_index_links_the_stream_at_its_own_version():
+    _add("Alice")
+    html = app.test_client().get("/").get_data(as_text=True)
+    assert 'data-events="/events?since=' in html
+    assert "data-append" in html
+    assert 'tr data-id="1"' in html
+    html = app.test_client().get("/?role=admin").get_data(as_text=True)
+    assert "data-append" not in html
+
+
+def test_live_updates_are_off_without_a_concurrent_worker_class():
+    app.config["SSE_ENABLED"] = False
+    client = app.test_client()
+    assert client.get("/events").status_code == 404
+    html = client.get("/").get_data(as_text=True)
+    assert "data-events" not in html
+    assert "live.js" not in html
+
+
+def test_live_updates_default_follows_the_worker_class():
+    assert load_config({})["SSE_ENABLED"] is False
+    config = load_config({"GUNICORN_WORKER_CLASS": "gevent", "GUNICORN_TIMEOUT": "60"})
+    assert config["SSE_ENABLED"] is True
+    assert config["SSE_MAX_STREAM_SECONDS"] < 60
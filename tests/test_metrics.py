@@ -0,0 +1,89 @@
+import os
+import sys
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from prometheus_client import REGISTRY  # noqa: E402
+
+from app.app import app, db, User  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    """
+    Configure the app for testing with an in-memory SQLite DB.
+    Create/drop tables around each test so your real users.db is untouched.
+    """
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(name="Alice", email="alice@example.com", role="admin"))
+        db.session.commit()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def _server_timing(response):
+    parts = {}
+    for metric in response.headers["Server-Timing"].split(","):
+        name, *params = (p.strip() for p in metric.split(";"))
+        parts[name] = dict(p.split("=", 1) for p in params)
+    return parts
+
+
+def test_server_timing_header_breaks_down_the_request():
+    client = app.test_client()
+    timing = _server_timing(client.get("/edit/1"))
+
+    assert set(timing) == {"db", "tpl", "total"}
+    # The SELECT, plus BEGIN on SQLite where transactions are explicit
+    assert int(timing["db"]["desc"].strip('"').split()[0]) >= 1
+    assert float(timing["tpl"]["dur"]) > 0
+    assert float(timing["total"]["dur"]) >= float(timing["db"]["dur"])
+
+
+def test_server_timing_can_be_turned_off():
+    app.config["SERVER_TIMING"] = False
+    try:
+        assert "Server-Timing" not in app.test_client().get("/edit/1").headers
+    finally:
+        app.config["SERVER_TIMING"] = True
+
+
+def test_requests_are_recorded_per_endpoint():
+    client = app.test_client()
+    labels = {"endpoint": "users.edit_user"}
+    count = _sample("http_request_duration_seconds_count", method="GET", **labels)
+    statements = _sample("http_request_sql_statements_sum", **labels)
+    not_found = _sample("http_requests_total", method="GET", status="404", **labels)
+
+    client.get("/edit/1")
+    client.get("/edit/999")
+
+    assert _sample("http_request_duration_seconds_count", method="GET", **labels) == count + 2
+    assert _sample("http_request_sql_statements_sum", **labels) >= statements + 2
+    assert _sample("http_requests_total", method="GET", status="404", **labels) == not_found + 1
+    assert _sample("http_request_template_duration_seconds_count", **labels) > 0
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    client = app.test_client()
+    client.get("/")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_bucket{endpoint="users.index"' in body
+    assert "http_request_sql_duration_seconds_sum" in body
+    assert "db_pool_checked_out" in body
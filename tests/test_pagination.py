@@ -0,0 +1,97 @@
+
+import os
+import sys
+import re
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+from app.pagination import encode_cursor  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    """
+    Configure the app for testing with an in-memory SQLite DB.
+    Create/drop tables around each test so your real users.db is untouched.
+    """
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def _seed(names):
+    with app.app_context():
+        for name in names:
+            db.session.add(User(name=name, email=f"{name.lower()}@example.com", role="user"))
+        db.session.commit()
+
+
+def _emails(html):
+    return re.findall(r"<td>([^<]+@example\.com)</td>", html)
+
+
+def _link(html, label):
+    match = re.search(r'<a href="([^"]+)">[^<]*' + label, html)
+    return match.group(1).replace("&amp;", "&") if match else None
+
+
+def test_index_walks_forward_and_back_by_id():
+    _seed(["Eve", "Dan", "Carol", "Bob", "Alice"])
+    client = app.test_client()
+
+    html = client.get("/?per_page=2").get_data(as_text=True)
+    assert _emails(html) == ["eve@example.com", "dan@example.com"]
+    assert _link(html, "Previous") is None
+
+    html = client.get(_link(html, "Next")).get_data(as_text=True)
+    assert _emails(html) == ["carol@example.com", "bob@example.com"]
+
+    last = client.get(_link(html, "Next")).get_data(as_text=True)
+    assert _emails(last) == ["alice@example.com"]
+    assert _link(last, "Next") is None
+
+    back = client.get(_link(last, "Previous")).get_data(as_text=True)
+    assert _emails(back) == ["carol@example.com", "bob@example.com"]
+
+    first = client.get(_link(back, "Previous")).get_data(as_text=True)
+    assert _emails(first) == ["eve@example.com", "dan@example.com"]
+    assert _link(first, "Previous") is None
+
+
+def test_index_sorts_by_name():
+    _seed(["Carol", "Alice", "Bob"])
+    client = app.test_client()
+
+    html = client.get("/?sort=name&per_page=2").get_data(as_text=True)
+    assert _emails(html) == ["alice@example.com", "bob@example.com"]
+
+    html = client.get(_link(html, "Next")).get_data(as_text=True)
+    assert _emails(html) == ["carol@example.com"]
+
+
+def test_index_rejects_bad_sort_and_cursor():
+    client = app.test_client()
+    assert client.get("/?sort=password").status_code == 400
+    assert client.get("/?after=not-a-cursor").status_code == 400
+
+
+@pytest.mark.parametrize("path, values", [
+    ("/?after=", [{"a": 1}]),
+    ("/?after=", [True]),
+    ("/?sort=name&after=", [[1], 2]),
+    ("/?sort=name&before=", ["Alice", "2"]),
+    ("/api/users?after=", ["1"]),
+    ("/api/users/archived?after=", [None]),
+])
+def test_cursor_values_of_the_wrong_type_are_rejected(path, values):
+    _seed(["Alice"])
+    assert app.test_client().get(path + encode_cursor(values)).status_code == 400
@@ -0,0 +1,111 @@
+import os
+import sys
+import logging
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app import create_app  # noqa: E402
+from app.app import app, db, User  # noqa: E402
+from app.profiler import QueryBudgetExceeded, query_budget  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    """
+    Configure the app for testing with an in-memory SQLite DB.
+    Create/drop tables around each test so your real users.db is untouched.
+    """
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        for i in range(1, 21):
+            db.session.add(User(name=f"User {i}", email=f"user{i}@example.com", role="user"))
+        db.session.commit()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+# Statements each route may run (transaction control excluded). Raise a
+# budget only together with the change that needs it.
+BUDGETS = [
+    # The list pages include the counts header: one read of user_role_counts
+    ("get", "/", None, 3),
+    ("get", "/?q=user1&role=user", None, 3),
+    ("get", "/?stream=1", None, 2),
+    ("get", "/edit/1", None, 1),
+    ("post", "/edit/1", {"name": "A", "email": "a@example.com", "role": "user", "version": "1"}, 2),
+    ("post", "/delete/2", None, 2),
+    ("post", "/add", {"name": "B", "email": "b@example.com", "role": "user"}, 2),
+    ("get", "/api/users", None, 2),
+    ("get", "/api/users/3", None, 1),
+    ("get", "/api/users/summary", None, 2),
+    ("get", "/export.csv", None, 1),
+]
+
+
+@pytest.mark.parametrize("method, url, data, budget", BUDGETS)
+def test_route_stays_within_its_query_budget(method, url, data, budget):
+    client = app.test_client()
+    with query_budget(db.engine, budget):
+        response = getattr(client, method)(url, data=data)
+        response.get_data()
+    assert response.status_code < 400
+
+
+def test_query_budget_fails_with_the_statements():
+    with pytest.raises(QueryBudgetExceeded) as excinfo:
+        with query_budget(db.engine, 1):
+            for user_id in (1, 2):
+                db.session.get(User, user_id)
+    assert "2 statements over a budget of 1" in str(excinfo.value)
+    assert "FROM users" in str(excinfo.value)
+
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    profiled = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'profiled.db'}",
+        "SQL_PROFILER": True,
+        "SQL_SLOW_QUERY_MS": 0,
+        "SQL_N_PLUS_ONE_THRESHOLD": 3,
+    })
+    with profiled.app_context():
+        db.create_all()
+        for i in range(1, 4):
+            db.session.add(User(name=f"User {i}", email=f"user{i}@example.com", role="user"))
+        db.session.commit()
+
+    @profiled.route("/per-row")
+    def per_row():
+        # One query per user, as a lazy load in a template loop would do
+        ids = db.session.scalars(db.select(User.id)).all()
+        return ", ".join(db.session.get(User, i).name for i in ids)
+
+    return profiled
+
+
+def test_slow_queries_are_logged_with_their_plan(profiled_app, caplog):
+    with caplog.at_level(logging.WARNING, logger="app.profiler"):
+        profiled_app.test_client().get("/edit/1")
+    slow = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Slow query")]
+    assert any("FROM users" in message and "Plan:" in message for message in slow)
+
+
+def test_repeated_statements_are_flagged_as_n_plus_one(profiled_app, caplog):
+    with caplog.at_level(logging.WARNING, logger="app.profiler"):
+        assert profiled_app.test_client().get("/per-row").status_code == 200
+    flagged = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Possible N+1")]
+    assert len(flagged) == 1
+    assert "Possible N+1 in per_row: 3 x SELECT" in flagged[0]
+
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="app.profiler"):
+        profiled_app.test_client().get("/")
+    assert not any(r.getMessage().startswith("Possible N+1") for r in caplog.records)
@@ -0,0 +1,131 @@
+import os, sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+from sqlalchemy import create_engine, insert
+from app import create_app
+from app import routing
+from app.config import load_config
+from app.models import User, db
+from app.routing import STICKY_COOKIE
+
+def _database(path, *names):
+    """Create the schema in an SQLite file and fill it with ``names``."""
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in names:
+            conn.execute(insert(User), {"name": name, "email": f"{name.lower()}@example.com", "role": "user"})
+    engine.dispose()
+    return f"sqlite:///{path}"
+
+# Each database gets different users, so a page shows which one served it
+@pytest.fixture
+def make_app(tmp_path):
+    def make(*replicas, **config):
+        primary = _database(tmp_path / "primary.db", "Primary")
+        urls = [
+            _database(tmp_path / f"{name}.db", name.capitalize()) if name else str(url)
+            for name, url in replicas
+        ]
+        return create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": primary,
+            "DB_REPLICA_URLS": urls,
+            "USERS_CACHE_BACKEND": "none",
+            **config,
+        })
+    return make
+
+# Test case for routing reads of GET requests
+def test_get_requests_read_from_the_replica(make_app):
+    client = make_app(("replica", None)).test_client()
+    body = client.get("/").get_data(as_text=True)
+    assert "Replica" in body and "Primary" not in body
+    assert client.get("/api/users").get_json()["users"][0]["name"] == "Replica"
+
+def test_replicas_are_used_round_robin(make_app):
+    client = make_app(("first", None), ("second", None)).test_client()
+    pages = [client.get("/").get_data(as_text=True) for _ in range(4)]
+    assert ["First" in page for page in pages] == [True, False, True, False]
+    assert ["Second" in page for page in pages] == [False, True, False, True]
+
+# Test cases for writes and read-after-write
+def test_writes_go_to_the_primary_and_stick_for_the_client(make_app):
+    app = make_app(("replica", None))
+    client = app.test_client()
+    response = client.post("/add", data={"name": "Alice", "email": "alice@example.com", "role": "admin"})
+    assert response.status_code == 302
+    assert STICKY_COOKIE in response.headers["Set-Cookie"]
+    assert "max-age=5" in response.headers["Set-Cookie"].lower()
+
+    # The writer sees its own write on the page it is redirected to
+    body = client.get("/").get_data(as_text=True)
+    assert "Alice" in body and "Primary" in body
+    # Other clients keep reading the replica
+    assert "Replica" in app.test_client().get("/").get_data(as_text=True)
+    with app.app_context():
+        assert db.session.query(User).filter_by(email="alice@example.com").count() == 1
+
+def test_reads_without_a_request_use_the_primary(make_app):
+    app = make_app(("replica", None))
+    with app.app_context():
+        assert db.session.scalars(db.select(User.name)).all() == ["Primary"]
+
+def test_reads_in_write_requests_use_the_primary(make_app):
+    app = make_app(("replica", None))
+    with app.app_context():
+        db.session.add(User(name="Bob", email="bob@example.com", role="user"))
+        db.session.commit()
+        bob_id = db.session.scalar(db.select(User.id).filter_by(name="Bob"))
+    # A stale version makes the view read Bob back: 404 if that read hit the replica
+    response = app.test_client().post(
+        f"/edit/{bob_id}", data={"name": "Bobby", "email": "bob@example.com", "role": "user", "version": "99"}
+    )
+    assert response.status_code == 409
+
+# Test cases for health checks and fallback
+def test_a_replica_that_is_down_falls_back_to_the_primary(make_app, tmp_path):
+    app = make_app((None, f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"))
+    body = app.test_client().get("/").get_data(as_text=True)
+    assert "Primary" in body
+    assert app.extensions["db_router"].status()["replica1"]["healthy"] is False
+
+def test_a_lagging_replica_is_skipped(make_app, monkeypatch):
+    monkeypatch.setattr(routing, "replica_lag", lambda connection: 60.0)
+    app = make_app(("replica", None), DB_REPLICA_MAX_LAG=5)
+    assert "Primary" in app.test_client().get("/").get_data(as_text=True)
+
+def test_replicas_are_checked_again_after_the_interval(make_app, monkeypatch):
+    lag = [60.0]
+    monkeypatch.setattr(routing, "replica_lag", lambda connection: lag[0])
+    app = make_app(("replica", None), DB_REPLICA_CHECK_INTERVAL=0)
+    client = app.test_client()
+    assert "Primary" in client.get("/").get_data(as_text=True)
+    lag[0] = 0.0
+    assert "Replica" in client.get("/").get_data(as_text=True)
+
+def test_pool_stats_include_replica_health(make_app):
+    client = make_app(("replica", None)).test_client()
+    client.get("/")
+    assert client.get("/stats/pool").get_json()["replicas"]["replica1"]["healthy"] is True
+
+# Test cases for configuration
+def test_replica_urls_from_env():
+    config = load_config({
+        "DATABASE_URL": "sqlite:////tmp/primary.db",
+        "DB_REPLICA_URLS": "sqlite:////tmp/r1.db, sqlite:////tmp/r2.db",
+    })
+    assert config["DB_REPLICA_URLS"] == ["sqlite:////tmp/r1.db", "sqlite:////tmp/r2.db"]
+
+def test_postgresql_replicas_share_the_primary_pool_settings():
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "postgresql+psycopg2://u:p@primary/users",
+        "SQLALCHEMY_ENGINE_OPTIONS": {"pool_size": 3, "max_overflow": 1},
+        "DB_REPLICA_URLS": ["postgresql+psycopg2://u:p@replica/users"],
+    })
+    engine = app.extensions["db_router"].engines["replica1"]
+    assert engine.pool.size() == 3 and engine.url.host == "replica"
@@ -0,0 +1,105 @@
+import os
+import sys
+import re
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    """
+    Configure the app for testing with an in-memory SQLite DB.
+    Create/drop tables around each test so your real users.db is untouched.
+    """
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client():
+    with app.app_context():
+        db.session.add_all([
+            User(name="Alice Smith", email="Alice@Example.com", role="admin"),
+            User(name="Bob Stone", email="bob@example.com", role="user"),
+            User(name="Carol Smithers", email="carol@test.org", role="user"),
+            User(name="Dan 100%", email="dan@example.com", role="user"),
+        ])
+        db.session.commit()
+    return app.test_client()
+
+
+def _names(html):
+    return re.findall(r"<td>([^<@]+)</td>\s*<td>[^<]+@", html)
+
+
+def _link(html, label):
+    match = re.search(r'<a href="([^"]+)">[^<]*' + label, html)
+    return match.group(1).replace("&amp;", "&") if match else None
+
+
+def test_exact_email_match_ignores_case(client):
+    html = client.get("/?email=alice@example.COM").get_data(as_text=True)
+    assert _names(html) == ["Alice Smith"]
+
+
+def test_prefix_matches_name_or_email(client):
+    assert _names(client.get("/?prefix=bob").get_data(as_text=True)) == ["Bob Stone"]
+    assert _names(client.get("/?prefix=car").get_data(as_text=True)) == ["Carol Smithers"]
+
+
+def test_substring_search_uses_the_fulltext_index(client):
+    html = client.get("/?q=smith").get_data(as_text=True)
+    assert _names(html) == ["Alice Smith", "Carol Smithers"]
+    assert _names(client.get("/?q=test.org").get_data(as_text=True)) == ["Carol Smithers"]
+
+
+def test_search_treats_wildcards_literally(client):
+    assert _names(client.get("/?q=100%25").get_data(as_text=True)) == ["Dan 100%"]
+    assert _names(client.get("/?q=b_b").get_data(as_text=True)) == []
+
+
+def test_role_filter_combines_with_search(client):
+    assert _names(client.get("/?role=user").get_data(as_text=True)) == [
+        "Bob Stone", "Carol Smithers", "Dan 100%"
+    ]
+    assert _names(client.get("/?role=user&q=smith").get_data(as_text=True)) == ["Carol Smithers"]
+
+
+def test_pagination_links_keep_the_filters(client):
+    html = client.get("/?role=user&per_page=2").get_data(as_text=True)
+    assert _names(html) == ["Bob Stone", "Carol Smithers"]
+    html = client.get(_link(html, "Next")).get_data(as_text=True)
+    assert _names(html) == ["Dan 100%"]
+
+
+def test_index_is_updated_after_edits(client):
+    assert _names(client.get("/?q=stone").get_data(as_text=True)) == ["Bob Stone"]
+    with app.app_context():
+        user = User.query.filter_by(email="bob@example.com").one()
+        user.name = "Bob Rock"
+        db.session.commit()
+    assert _names(client.get("/?q=stone").get_data(as_text=True)) == []
+    assert _names(client.get("/?q=rock").get_data(as_text=True)) == ["Bob Rock"]
+
+
+def test_api_list_accepts_the_same_filters(client):
+    data = client.get("/api/users?q=smith&role=admin").get_json()
+    assert [user["name"] for user in data["users"]] == ["Alice Smith"]
+
+
+def test_duplicate_email_check_ignores_case(client):
+    response = client.post("/add", data={"name": "Other", "email": "ALICE@example.com", "role": "user"})
+    assert response.status_code == 200
+    with app.app_context():
+        assert User.query.count() == 4
@@ -0,0 +1,53 @@
+
+import os
+import sys
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    """
+    Configure the app for testing with an in-memory SQLite DB.
+    Create/drop tables around each test so your real users.db is untouched.
+    """
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def test_stream_mode_sends_every_user_in_chunks(monkeypatch):
+    """
+    /?stream=1 ignores the page size and streams the full table,
+    fetching rows in small batches and sending several body chunks.
+    """
+    monkeypatch.setitem(app.config, "USERS_PER_PAGE", 2)
+    monkeypatch.setitem(app.config, "USERS_STREAM_BATCH_SIZE", 3)
+    monkeypatch.setitem(app.config, "USERS_STREAM_CHUNK_SIZE", 256)
+    with app.app_context():
+        for i in range(10):
+            db.session.add(User(name=f"User {i}", email=f"user{i}@example.com", role="user"))
+        db.session.commit()
+
+    client = app.test_client()
+    resp = client.get("/?stream=1")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.headers["Content-Type"].startswith("text/html")
+
+    chunks = list(resp.response)
+    assert len(chunks) > 1
+    html = "".join(c.decode() if isinstance(c, bytes) else c for c in chunks)
+    for i in range(10):
+        assert f"user{i}@example.com" in html
+    assert "Next &raquo;" not in html
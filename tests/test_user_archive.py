@@ -0,0 +1,98 @@
+import os
+import sys
+from datetime import timedelta
+
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+from app.models import ArchivedUser, utcnow  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def _create_users(count):
+    db.session.add_all(
+        User(name=f"User {i}", email=f"user{i}@example.com", role="user") for i in range(count)
+    )
+    db.session.commit()
+
+
+def _archived():
+    db.session.expire_all()
+    return db.session.scalars(db.select(ArchivedUser).order_by(ArchivedUser.id)).all()
+
+
+# Test cases for archiving deleted users
+def test_every_delete_path_archives_the_user():
+    _create_users(5)
+    client = app.test_client()
+    client.post("/delete/1")
+    client.delete("/api/users/2")
+    client.post("/api/users/bulk/delete", json={"ids": [3, 4]})
+
+    archived = _archived()
+    assert [a.user_id for a in archived] == [1, 2, 3, 4]
+    assert archived[0].email == "user0@example.com"
+    assert archived[0].deleted_at >= archived[0].created_at
+    assert db.session.scalars(db.select(User.id)).all() == [5]
+
+
+def test_restore_archived_user():
+    _create_users(2)
+    client = app.test_client()
+    client.post("/delete/1")
+    archived_id = client.get("/api/users/archived?email=USER0@example.com").get_json()["users"][0]["id"]
+
+    resp = client.post(f"/api/users/archived/{archived_id}/restore")
+    assert resp.status_code == 201
+    assert resp.get_json() == {"id": 1, "name": "User 0", "email": "user0@example.com", "role": "user"}
+    assert _archived() == []
+    assert client.get("/api/users/summary").get_json()["total"] == 2
+    assert client.post(f"/api/users/archived/{archived_id}/restore").status_code == 404
+
+
+def test_restore_refuses_a_taken_email():
+    _create_users(1)
+    client = app.test_client()
+    client.post("/delete/1")
+    client.post("/api/users", json={"name": "New", "email": "user0@example.com", "role": "user"})
+    resp = client.post(f"/api/users/archived/{_archived()[0].id}/restore")
+    assert resp.status_code == 409
+    assert len(_archived()) == 1
+
+
+def test_compact_archive_purges_and_exports_old_users(tmp_path):
+    _create_users(3)
+    app.test_client().post("/api/users/bulk/delete", json={"ids": [1, 2, 3]})
+    db.session.execute(
+        db.update(ArchivedUser).where(ArchivedUser.user_id < 3).values(deleted_at=utcnow() - timedelta(days=40))
+    )
+    db.session.commit()
+    app.config["USERS_BULK_CHUNK_SIZE"] = 1
+    try:
+        export = tmp_path / "old.csv"
+        result = app.test_cli_runner().invoke(
+            args=["users", "compact-archive", "--older-than-days", "30", "--export", str(export)]
+        )
+    finally:
+        app.config["USERS_BULK_CHUNK_SIZE"] = 1000
+    assert result.exit_code == 0, result.output
+    assert "Purged 2 archived users" in result.output
+    lines = export.read_text().splitlines()
+    assert lines[0] == "user_id,name,email,role,created_at,updated_at,deleted_at"
+    assert [line.split(",")[0] for line in lines[1:]] == ["1", "2"]
+    assert [a.user_id for a in _archived()] == [3]
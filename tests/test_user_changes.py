@@ -0,0 +1,159 @@
+import os
+import sys
+from datetime import timedelta
+
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db, User  # noqa: E402
+from app.changes import CURSOR_TYPES  # noqa: E402
+from app.models import UserTombstone, utcnow  # noqa: E402
+from app.pagination import decode_cursor, encode_cursor  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def _create_users(*names):
+    client = app.test_client()
+    for name in names:
+        client.post("/api/users", json={"name": name, "email": f"{name.lower()}@example.com", "role": "user"})
+
+
+def _sync(client, since=None, per_page=100):
+    """Follow the feed to its end; return all changes and the last cursor."""
+    changes = []
+    while True:
+        query = {"per_page": per_page, **({"since": since} if since else {})}
+        body = client.get("/api/users/changes", query_string=query).get_json()
+        changes.extend(body["changes"])
+        since = body["next_cursor"]
+        if not body["has_more"]:
+            return changes, since
+
+
+# Test cases for the initial sync
+def test_feed_without_cursor_lists_every_user_in_pages():
+    _create_users("Alice", "Bob", "Carol")
+    client = app.test_client()
+    first = client.get("/api/users/changes?per_page=2").get_json()
+    assert [c["user"]["name"] for c in first["changes"]] == ["Alice", "Bob"]
+    assert first["has_more"] is True
+
+    changes, _ = _sync(client, first["next_cursor"], per_page=2)
+    assert [(c["op"], c["user"]["name"]) for c in changes] == [("upsert", "Carol")]
+    assert changes[0]["user"]["created_at"] and changes[0]["user"]["updated_at"]
+
+
+# Test cases for incremental syncs
+def test_feed_returns_only_the_changes_since_the_cursor():
+    _create_users("Alice", "Bob", "Carol")
+    client = app.test_client()
+    _, cursor = _sync(client)
+    with app.app_context():
+        alice, bob = (db.session.scalar(db.select(User.id).filter_by(name=n)) for n in ("Alice", "Bob"))
+
+    client.patch(f"/api/users/{alice}", json={"role": "admin"})
+    client.delete(f"/api/users/{bob}")
+    _create_users("Dave")
+
+    changes, _ = _sync(client, cursor)
+    assert [(c["op"], c["id"]) for c in changes[:2]] == [("upsert", alice), ("delete", bob)]
+    assert changes[0]["user"]["role"] == "admin"
+    assert changes[2]["op"] == "upsert" and changes[2]["user"]["name"] == "Dave"
+    assert len(changes) == 3
+
+
+def test_bulk_and_form_writes_are_in_the_feed():
+    _create_users("Alice", "Bob", "Carol")
+    client = app.test_client()
+    _, cursor = _sync(client)
+    with app.app_context():
+        ids = dict(db.session.execute(db.select(User.name, User.id)).all())
+
+    client.post(f"/edit/{ids['Alice']}", data={"name": "Alice B", "email": "alice@example.com", "role": "user"})
+    client.post(f"/delete/{ids['Bob']}")
+    client.post("/api/users/batch", json={"delete": [ids["Carol"]]})
+
+    changes, _ = _sync(client, cursor)
+    assert sorted((c["op"], c["id"]) for c in changes) == sorted(
+        [("upsert", ids["Alice"]), ("delete", ids["Bob"]), ("delete", ids["Carol"])]
+    )
+    with app.app_context():
+        assert db.session.query(UserTombstone).count() == 2
+
+
+def test_sequence_numbers_follow_commit_order():
+    _create_users("Alice", "Bob")
+    client = app.test_client()
+    with app.app_context():
+        alice = db.session.scalar(db.select(User.id).filter_by(name="Alice"))
+    # Updating the older row again moves it behind the newer one
+    client.patch(f"/api/users/{alice}", json={"role": "admin"})
+    changes, _ = _sync(client)
+    assert [c["user"]["name"] for c in changes] == ["Bob", "Alice"]
+
+
+def test_idle_feed_keeps_the_cursor_and_revalidates():
+    _create_users("Alice")
+    client = app.test_client()
+    _, cursor = _sync(client)
+    resp = client.get(f"/api/users/changes?since={cursor}")
+    assert resp.get_json() == {"changes": [], "next_cursor": cursor, "has_more": False}
+
+    cached = client.get(f"/api/users/changes?since={cursor}", headers={"If-None-Match": resp.headers["ETag"]})
+    assert cached.status_code == 304
+
+
+# Test cases for bad cursors
+def test_cursor_from_another_database_is_rejected_with_410():
+    _create_users("Alice")
+    client = app.test_client()
+    _, cursor = _sync(client)
+    stale = encode_cursor(["another-epoch", *decode_cursor(cursor, CURSOR_TYPES)[1:]])
+    assert client.get(f"/api/users/changes?since={stale}").status_code == 410
+
+
+def test_cursor_from_before_pruned_tombstones_is_rejected_with_410():
+    _create_users("Alice", "Bob", "Carol", "Dan")
+    client = app.test_client()
+    _, old_cursor = _sync(client)
+    with app.app_context():
+        ids = dict(db.session.execute(db.select(User.name, User.id)).all())
+    client.post(f"/delete/{ids['Alice']}")
+    client.post(f"/delete/{ids['Bob']}")
+    _, cursor = _sync(client)
+    client.post(f"/delete/{ids['Carol']}")
+    with app.app_context():
+        db.session.execute(
+            db.update(UserTombstone).where(UserTombstone.user_id.in_([ids["Alice"], ids["Bob"]]))
+            .values(deleted_at=utcnow() - timedelta(days=40))
+        )
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["users", "compact-archive", "--older-than-days", "30"])
+    assert result.exit_code == 0, result.output
+    # Bob's delete, the newest expired one, stays for cursors that stop in it
+    assert "Pruned 1 change feed tombstones" in result.output
+    assert client.get(f"/api/users/changes?since={old_cursor}").status_code == 410
+    changes, _ = _sync(client, cursor)
+    assert changes == [{"op": "delete", "id": ids["Carol"]}]
+    changes, _ = _sync(client)
+    assert [c["user"]["name"] for c in changes if c["op"] == "upsert"] == ["Dan"]
+
+
+def test_invalid_cursor_is_rejected():
+    client = app.test_client()
+    assert client.get("/api/users/changes?since=garbage").status_code == 400
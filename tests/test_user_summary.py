@@ -0,0 +1,95 @@
+import io
+import os
+import sys
+import pytest
+
+# Ensure we can import "app" from the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.app import app, db  # noqa: E402
+from app.models import UserRoleCount  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _setup_app_ctx():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def _create_user(name, role):
+    client = app.test_client()
+    resp = client.post("/api/users", json={"name": name, "email": f"{name.lower()}@example.com", "role": role})
+    return resp.get_json()["id"]
+
+
+def _summary(client=None, **params):
+    return (client or app.test_client()).get("/api/users/summary", query_string=params).get_json()
+
+
+# Test cases for the maintained counters
+def test_counters_follow_every_write_path():
+    alice = _create_user("Alice", "admin")
+    bob = _create_user("Bob", "user")
+    _create_user("Carol", "user")
+    assert _summary() == {"total": 3, "roles": {"admin": 1, "user": 2}, "approximate": False}
+
+    client = app.test_client()
+    client.post(f"/edit/{bob}", data={"name": "Bob", "email": "bob@example.com", "role": "admin"})
+    client.post(f"/delete/{alice}")
+    client.post("/import", data={"file": (io.BytesIO(b"name,email,role\nDan,dan@example.com,viewer\n"), "u.csv")})
+    assert _summary() == {"total": 3, "roles": {"admin": 1, "user": 1, "viewer": 1}, "approximate": False}
+
+    client.post("/api/users/batch", json={"delete": [bob]})
+    assert _summary()["roles"] == {"user": 1, "viewer": 1}
+
+
+def test_rolled_back_writes_leave_the_counters_alone():
+    _create_user("Alice", "admin")
+    resp = app.test_client().post("/api/users/batch", json={
+        "create": [{"name": "Bob", "email": "bob@example.com", "role": "user"},
+                   {"name": "Dup", "email": "alice@example.com", "role": "user"}],
+        "atomic": True,
+    })
+    assert resp.status_code == 409
+    assert _summary()["total"] == 1
+
+
+def test_upgrade_recounts_drifted_counters():
+    _create_user("Alice", "admin")
+    with app.app_context():
+        db.session.execute(db.update(UserRoleCount).values(count=99))
+        db.session.commit()
+    result = app.test_cli_runner().invoke(args=["db", "upgrade"])
+    assert result.exit_code == 0
+    assert _summary()["roles"] == {"admin": 1}
+
+
+# Test cases for the endpoint and the list header
+def test_summary_revalidates_until_a_write():
+    _create_user("Alice", "admin")
+    client = app.test_client()
+    resp = client.get("/api/users/summary")
+    etag = resp.headers["ETag"]
+    assert client.get("/api/users/summary", headers={"If-None-Match": etag}).status_code == 304
+    _create_user("Bob", "user")
+    assert client.get("/api/users/summary", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_approximate_mode_falls_back_to_counters_without_planner_stats():
+    _create_user("Alice", "admin")
+    assert _summary(approximate=1) == {"total": 1, "roles": {"admin": 1}, "approximate": False}
+
+
+def test_index_header_shows_the_counts():
+    _create_user("Alice", "admin")
+    _create_user("Bob", "user")
+    body = app.test_client().get("/?role=user").get_data(as_text=True)
+    assert "2 users" in body
+    assert "admin: 1" in body and "user: 1" in body